@@ -1,11 +1,11 @@
 # ==================================================================================
 # ГЛАВНЫЙ ФАЙЛ, ТОЧКА ВХОДА В ПРИЛОЖЕНИЕ.
-# Его единственная задача - импортировать класс GUI из src/gui.py и запустить его.
+# Без аргументов запускает окно (src/gui.py), с аргументами - пакетный режим (src/cli.py).
 # ==================================================================================
 
+import multiprocessing
 import sys
 import os
-from src.gui import VulnerabilityAnalyzerApp
 
 
 def get_base_path():
@@ -22,9 +22,26 @@ def get_base_path():
 
 
 if __name__ == "__main__":
+    # В собранном .exe процессы-исполнители (match_workers, пакетный режим, полный каталог)
+    # запускаются повторным вызовом программы с аргументами multiprocessing: они должны
+    # уйти в исполнителя здесь, до разбора аргументов командной строки
+    multiprocessing.freeze_support()
+
     # Определяем базовый путь для работы приложения
     base_path = get_base_path()
 
+    # Пакетный режим: python main.py analyze|update-journal [...]
+    # Окно при этом не импортируется вовсе, customtkinter не нужен.
+    if len(sys.argv) > 1:
+        from src import cli
+        sys.exit(cli.main(sys.argv[1:], base_path))
+
+    # Замер времени импортов и открытия окна (выводится в лог на вкладке "Анализ")
+    from src import startup_profile
+    startup_profile.install()
+
+    from src.gui import VulnerabilityAnalyzerApp
+
     # Создаем экземпляр нашего приложения, передавая ему базовый путь
     app = VulnerabilityAnalyzerApp(base_path)
 
@@ -0,0 +1,363 @@
+# ==================================================================================
+# МОДУЛЬ 12: ЛОКАЛЬНАЯ СЛУЖБА АНАЛИЗА
+# Долгоживущий процесс (python main.py serve), который один раз загружает ППТС и ЖП,
+# держит индексы движка в памяти и отвечает на запросы по HTTP на localhost:
+#   GET  /status                  - что загружено и когда
+#   GET  /match?product=...       - совпадения в ППТС для строки продукта
+#   POST /analyze                 - анализ ТСУ с формированием res_tmp_report.xlsx
+# Служба читает и пишет только файлы из своего [Paths] (и параметров serve): /analyze с
+# другими путями отклоняется, так что другой процесс не может через нее прочитать или
+# перезаписать произвольный файл. Пока ППТС и ЖП не загружены, запросы получают 503.
+# Кэш оценок слов движка ограничен [Service] word_cache_limit и при превышении очищается.
+# Исходные файлы (ППТС, ЖП, config.ini) отслеживаются и перезагружаются при изменении.
+# Клиентская часть (try_remote_analysis, request_match) используется окном и CLI:
+# если служба запущена и работает с теми же файлами/настройками, анализ выполняет она.
+# ==================================================================================
+
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import config_handler
+from src.result_records import ResultRecord
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Как часто проверять изменение исходных файлов
+WATCH_INTERVAL_SECONDS = 2.0
+
+# Сколько ждать ответа службы, прежде чем считать, что она не запущена
+PING_TIMEOUT_SECONDS = 0.3
+
+# Сколько слов держать в кэше оценок движка (word_cache): служба живет долго, и каждое
+# новое слово из /match и /analyze добавляет в кэш список оценок по словарю ППТС
+DEFAULT_WORD_CACHE_LIMIT = 100000
+
+REFERENCE_PATH_KEYS = ['ppts_local', 'ppts_general', 'journal']
+
+
+def service_address(config: Any) -> Tuple[str, int]:
+    """Адрес службы из секции [Service] (по умолчанию 127.0.0.1:8765)."""
+    host = config.get('Service', 'host', fallback=DEFAULT_HOST) or DEFAULT_HOST
+    port = config.getint('Service', 'port', fallback=DEFAULT_PORT)
+    return host, port
+
+
+def word_cache_limit(config: Any) -> int:
+    """[Service] word_cache_limit (0 - без ограничения)."""
+    return config.getint('Service', 'word_cache_limit', fallback=DEFAULT_WORD_CACHE_LIMIT)
+
+
+def _config_as_dict(config: Any) -> Dict[str, Dict[str, str]]:
+    """Все секции конфига (кроме путей и самой службы) - для сверки настроек клиента и службы."""
+    return {
+        section: dict(config.items(section))
+        for section in config.sections() if section not in ('Paths', 'Service')
+    }
+
+
+def _normalized_paths(paths: Dict[str, str]) -> Dict[str, str]:
+    from src import pipeline
+
+    return {key: os.path.normcase(os.path.abspath(paths.get(key) or '')) for key in pipeline.PATH_KEYS}
+
+
+# ----------------------------------------------------------------------------------
+# Серверная часть
+# ----------------------------------------------------------------------------------
+
+class WarmReference:
+    """Держит загруженные ППТС/ЖП с индексами и перезагружает их при изменении файлов."""
+
+    def __init__(self, config_dir: str, path_overrides: Optional[Dict[str, str]] = None,
+                 log: Callable[[str], None] = print):
+        self.config_dir = config_dir
+        self.path_overrides = path_overrides or {}
+        self.log = log
+        self._lock = threading.Lock()
+        self._stamps: Dict[str, Tuple[float, int]] = {}
+        self.config = None
+        self.paths: Dict[str, str] = {}
+        self.reference: Optional[Dict[str, Any]] = None
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+
+    def _read_config(self) -> Tuple[Any, Dict[str, str]]:
+        from src import pipeline
+
+        config = config_handler.load_config(self.config_dir)
+        paths = {key: config.get('Paths', key, fallback='') for key in pipeline.PATH_KEYS}
+        paths.update({k: v for k, v in self.path_overrides.items() if v})
+        return config, paths
+
+    def _file_stamps(self, paths: Dict[str, str]) -> Dict[str, Tuple[float, int]]:
+        watched = [paths.get(key, '') for key in REFERENCE_PATH_KEYS]
+        watched.append(os.path.join(self.config_dir, config_handler.CONFIG_FILE_NAME))
+        stamps = {}
+        for path in watched:
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime, stat.st_size)
+            except OSError:
+                stamps[path] = (0.0, -1)
+        return stamps
+
+    def reload(self):
+        """Загружает ППТС и ЖП заново и атомарно подменяет текущие данные."""
+        from src import pipeline
+
+        config, paths = self._read_config()
+        stamps = self._file_stamps(paths)
+        started = time.perf_counter()
+        # Прежние данные - основа для обновления индекса ППТС по изменениям (ppts_update)
+        reference = pipeline.load_reference_data(paths, config, self.log, self.reference)
+        load_seconds = time.perf_counter() - started
+
+        with self._lock:
+            self.config, self.paths, self.reference = config, paths, reference
+            self._stamps = stamps
+            self.loaded_at = time.time()
+            self.load_seconds = load_seconds
+        self.log(f"Служба: ППТС ({pipeline.ppts_row_count(reference)} строк) и ЖП ({len(reference['journal_df'])} строк) "
+                 f"загружены за {load_seconds:.2f} с.")
+
+    def has_changed(self) -> bool:
+        with self._lock:
+            paths, stamps = self.paths, self._stamps
+        return self._file_stamps(paths) != stamps
+
+    def snapshot(self) -> Tuple[Any, Dict[str, str], Dict[str, Any]]:
+        with self._lock:
+            return self.config, self.paths, self.reference
+
+    def trim_word_cache(self):
+        """Очищает кэш оценок слов, если он превысил [Service] word_cache_limit."""
+        config, _, reference = self.snapshot()
+        if reference is None:
+            return
+        limit = word_cache_limit(config)
+        word_cache = reference['ppts_index']['word_cache']
+        if limit and len(word_cache) > limit:
+            self.log(f"Служба: кэш оценок слов ({len(word_cache)}) превысил предел {limit}, очищен.")
+            word_cache.clear()
+
+    def start_watcher(self, interval: float = WATCH_INTERVAL_SECONDS) -> threading.Thread:
+        """Фоновый поток: раз в interval секунд проверяет файлы и перезагружает данные."""
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.has_changed():
+                        self.log("Служба: исходные файлы изменились, перезагрузка...")
+                        self.reload()
+                except Exception as e:
+                    self.log(f"Служба: ошибка перезагрузки данных: {e}")
+
+        thread = threading.Thread(target=watch, daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Any]:
+        from src import pipeline
+
+        config, paths, reference = self.snapshot()
+        return {
+            'ok': reference is not None,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'paths': {key: paths.get(key, '') for key in REFERENCE_PATH_KEYS},
+            'ppts_rows': pipeline.ppts_row_count(reference) if reference else 0,
+            'journal_rows': len(reference['journal_df']) if reference else 0,
+            'vocabulary': len(reference['ppts_index']['words']) if reference else 0,
+            'cached_words': len(reference['ppts_index']['word_cache']) if reference else 0,
+            'word_cache_limit': word_cache_limit(config) if config is not None else DEFAULT_WORD_CACHE_LIMIT,
+        }
+
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "VulnerabilityAnalyzerService/1.0"
+
+    def _send_json(self, code: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.warm.log(f"Служба: {self.address_string()} {format % args}")
+
+    def _send_not_ready(self):
+        self._send_json(503, {'ok': False, 'error': 'not_ready',
+                              'message': "Служба еще не загрузила ППТС и ЖП, повторите запрос позже."})
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(parsed.query)
+        warm: WarmReference = self.server.warm
+
+        if parsed.path == '/status':
+            self._send_json(200, warm.status())
+        elif parsed.path == '/match':
+            from src import comparison_engine
+
+            product = query.get('product', [''])[0]
+            config, _, reference = warm.snapshot()
+            if reference is None:
+                self._send_not_ready()
+                return
+            started = time.perf_counter()
+            matches = comparison_engine.find_best_matches(
+                product, reference['ppts_df'], config, reference['ppts_index']
+            )
+            warm.trim_word_cache()
+            self._send_json(200, {'ok': True, 'product': product, 'matches': matches,
+                                  'elapsed_ms': (time.perf_counter() - started) * 1000})
+        else:
+            self._send_json(404, {'ok': False, 'error': 'not_found'})
+
+    def do_POST(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path != '/analyze':
+            self._send_json(404, {'ok': False, 'error': 'not_found'})
+            return
+
+        from src import pipeline
+
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length).decode('utf-8') or '{}')
+        warm: WarmReference = self.server.warm
+        config, paths, reference = warm.snapshot()
+        if reference is None:
+            self._send_not_ready()
+            return
+
+        # Служба работает только со своими файлами: ТСУ, ППТС, ЖП и папка отчета - из ее [Paths]
+        if _normalized_paths(request.get('paths', {})) != _normalized_paths(paths):
+            self._send_json(409, {'ok': False, 'error': 'paths_mismatch'})
+            return
+        if request.get('config') != _config_as_dict(config):
+            self._send_json(409, {'ok': False, 'error': 'config_mismatch'})
+            return
+
+        log_lines: List[str] = []
+        with self.server.analysis_lock:
+            summary = pipeline.run_analysis(
+                paths=paths, config=config,
+                responsible=request.get('responsible', pipeline.DEFAULT_RESPONSIBLE),
+                publication=request.get('publication', pipeline.DEFAULT_PUBLICATION),
+                log=log_lines.append, reference=reference, use_service=False,
+                retain_raw_scores=bool(request.get('retain_raw_scores'))
+            )
+        warm.trim_word_cache()
+        results = summary.pop('results', [])
+        if request.get('include_results'):
+            summary['results'] = [item.to_dict() for item in results]
+        summary['log'] = log_lines
+        self._send_json(200, summary)
+
+
+def serve(config_dir: str, path_overrides: Optional[Dict[str, str]] = None,
+          host: Optional[str] = None, port: Optional[int] = None, log: Callable[[str], None] = print):
+    """Запускает службу и обслуживает запросы до остановки процесса (Ctrl+C)."""
+    warm = WarmReference(config_dir, path_overrides, log)
+    warm.reload()
+    warm.start_watcher()
+
+    default_host, default_port = service_address(warm.config)
+    address = (host or default_host, port or default_port)
+    server = ThreadingHTTPServer(address, _ServiceRequestHandler)
+    server.daemon_threads = True
+    server.warm = warm
+    server.analysis_lock = threading.Lock()
+
+    log(f"Служба анализа запущена на http://{address[0]}:{address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("Служба анализа остановлена.")
+    finally:
+        server.server_close()
+
+
+# ----------------------------------------------------------------------------------
+# Клиентская часть (используется окном и CLI, не требует pandas)
+# ----------------------------------------------------------------------------------
+
+def _request(config: Any, method: str, path: str, payload: Optional[Dict] = None,
+             timeout: Optional[float] = None) -> Tuple[int, Dict[str, Any]]:
+    host, port = service_address(config)
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(f"http://{host}:{port}{path}", data=data, method=method,
+                                     headers={'Content-Type': 'application/json; charset=utf-8'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode('utf-8') or '{}')
+
+
+def is_running(config: Any) -> bool:
+    """Проверяет, отвечает ли служба на /status."""
+    try:
+        code, status = _request(config, 'GET', '/status', timeout=PING_TIMEOUT_SECONDS)
+    except (OSError, ValueError):
+        return False
+    return code == 200 and bool(status.get('ok'))
+
+
+def request_match(config: Any, product: str) -> Optional[List[Dict[str, Any]]]:
+    """Совпадения для строки продукта от службы или None, если служба недоступна."""
+    if not is_running(config):
+        return None
+    code, response = _request(config, 'GET', '/match?' + urllib.parse.urlencode({'product': product}))
+    return response.get('matches') if code == 200 else None
+
+
+def try_remote_analysis(
+        paths: Dict[str, str], config: Any, responsible: str, publication: str,
+        log: Callable[[str], None] = print, retain_raw_scores: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Передает анализ запущенной службе.
+
+    Returns:
+        Сводку запуска (как у pipeline.run_analysis) или None,
+        если служба выключена в [Service], не запущена, еще загружает данные или работает
+        с другими файлами/настройками.
+    """
+    if not config.getboolean('Service', 'use_service', fallback=True) or not is_running(config):
+        return None
+
+    log("Анализ выполняется запущенной службой (ППТС и ЖП уже загружены)...")
+    payload = {
+        'paths': paths, 'config': _config_as_dict(config),
+        'responsible': responsible, 'publication': publication, 'include_results': True,
+        'retain_raw_scores': retain_raw_scores
+    }
+    try:
+        code, summary = _request(config, 'POST', '/analyze', payload)
+    except (OSError, ValueError) as e:
+        log(f"Служба недоступна ({e}), анализ выполняется локально.")
+        return None
+
+    if code == 409:
+        log("Служба работает с другими файлами или настройками, анализ выполняется локально.")
+        return None
+    if code == 503:
+        log("Служба еще загружает ППТС и ЖП, анализ выполняется локально.")
+        return None
+    for line in summary.pop('log', []):
+        log(line)
+    summary['backend'] = 'service'
+    summary['results'] = [ResultRecord.from_dict(item) for item in summary.get('results', [])]
+    return summary
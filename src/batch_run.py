@@ -0,0 +1,214 @@
+# ==================================================================================
+# МОДУЛЬ 24: ПАКЕТНЫЙ ЗАПУСК ПО НЕСКОЛЬКИМ ИСТОЧНИКАМ
+# Режим python main.py batch --source "БДУ ФСТЭК=bdu.xlsx" --source "NVD=nvd.xlsx":
+#   - ППТС и ЖП загружаются и индексируются один раз на все ТСУ;
+#   - строки всех ТСУ объединяются, одинаковые (CVE, продукт) из разных источников
+#     анализируются один раз (решение зависит только от CVE и продукта), остальные
+#     поля строки (№, CVSS, ссылка) берутся из своего источника;
+#   - сопоставление с ППТС идет одним этапом по объединению (при match_workers > 1 -
+#     в нескольких процессах), отчеты по источникам и сводный пишутся параллельно
+#     в процессах-исполнителях (отчет - самый долгий этап после сопоставления);
+#   - отчеты: res_tmp_report_<источник>_<дата_время>.xlsx на каждый источник и
+#     res_tmp_report_batch_<дата_время>.xlsx со всеми строками и своей "Публикацией".
+# ==================================================================================
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+COMBINED_REPORT_STEM = "batch"
+
+
+def parse_sources(values: List[str]) -> List[Tuple[str, str]]:
+    """Аргументы --source вида 'Источник публикации=путь к ТСУ' -> [(источник, путь), ...]."""
+    sources = []
+    for value in values:
+        publication, separator, path = value.partition('=')
+        if not separator or not publication.strip() or not path.strip():
+            raise ValueError(f"Источник должен иметь вид 'Публикация=путь к ТСУ': {value!r}")
+        sources.append((publication.strip(), path.strip()))
+    return sources
+
+
+def duplicate_key(record: Dict[str, Any]) -> Tuple[Any, Any]:
+    """Строки с одинаковыми CVE и продуктом получают одинаковое решение и совпадения."""
+    return record.get('cve'), record.get('product')
+
+
+def unique_rows(frames: List[Any]) -> Any:
+    """Объединение ТСУ без повторов (CVE, продукт); порядок - по первому появлению."""
+    import pandas as pd
+
+    combined = pd.concat([df.astype(object) for df in frames], ignore_index=True)
+    return combined.drop_duplicates(subset=['cve', 'product'], keep='first').reset_index(drop=True)
+
+
+def report_paths(output_folder: str, publications: List[str]) -> List[str]:
+    """
+    Имена отчетов по источникам и сводного (последний): res_tmp_report_<источник>_<дата_время>.xlsx.
+    Отчеты пишутся только в конце, поэтому уникальность проверяется и среди уже выбранных имен.
+    """
+    from src import watch_folder
+
+    chosen: List[str] = []
+    for stem in publications + [COMBINED_REPORT_STEM]:
+        stem = re.sub(r'\W+', '_', stem).strip('_') or 'source'
+        path = watch_folder.unique_report_path(output_folder, f"{stem}.xlsx")
+        base, counter = os.path.splitext(path)[0], 2
+        while path in chosen:
+            path = f"{base}_{counter}.xlsx"
+            counter += 1
+        chosen.append(path)
+    return chosen
+
+
+def _write_report(task: Dict[str, Any]) -> str:
+    """Исполнитель: один отчет (вызывается и в процессе-исполнителе, и в основном процессе)."""
+    from src import report_generator
+
+    report_generator.generate_report(
+        processed_data_list=task['results'], output_path=task['output_path'], config=task['config'],
+        responsible_person=task['responsible'], publication_source=task['publication'],
+        row_publications=task.get('row_publications')
+    )
+    return task['output_path']
+
+
+def write_reports(tasks: List[Dict[str, Any]], workers: int):
+    """Пишет отчеты параллельно в workers процессах (при workers = 1 - по очереди)."""
+    if workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            _write_report(task)
+        return
+    # В собранном .exe исполнители запускаются повторным вызовом main.py - их перехватывает
+    # multiprocessing.freeze_support() в main.py
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        list(pool.map(_write_report, tasks))
+
+
+def run_batch(
+        sources: List[Tuple[str, str]], paths: Dict[str, str], config: Any,
+        responsible: Optional[str] = None, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Анализ нескольких ТСУ с общими ППТС/ЖП.
+
+    Args:
+        sources: [(источник публикации, путь к ТСУ), ...].
+        paths: Пути к ППТС, ЖП и папке отчетов (ключ 'vulnerabilities' не используется).
+
+    Returns:
+        Сводка: 'output_path' (сводный отчет), 'sources' (по каждому источнику - отчет, строки,
+        статусы), 'counts' (в т.ч. unique_rows/duplicate_rows), 'timings', 'stages' и 'results'.
+    """
+    from src import comparison_engine, data_loader, incremental, pipeline, run_metrics, run_stages, shared_index
+
+    summary: Dict[str, Any] = {'ok': False, 'output_path': None, 'counts': {}, 'timings': {}, 'results': []}
+    started = time.perf_counter()
+    output_folder = paths.get('output_folder', '')
+    if not sources or not output_folder or not all(paths.get(key) for key in ('ppts_local', 'ppts_general', 'journal')):
+        log("Ошибка: Укажите хотя бы один источник ТСУ, пути к ППТС, ЖП и папку отчетов.")
+        summary['error'] = 'missing_paths'
+        return summary
+
+    recorder = run_stages.StageRecorder(run_stages.profile_prefix(config, output_folder, 'batch'))
+    config_rules = pipeline.parse_config_rules(config)
+
+    with recorder.stage('load') as record:
+        stage_start = time.perf_counter()
+        frames = [data_loader.load_vulnerabilities(path) for _, path in sources]
+        load_seconds = {'vulnerabilities': time.perf_counter() - stage_start}
+        reference_frames = pipeline.load_reference_frames(paths, config, log)
+        load_seconds.update(reference_frames['load_seconds'])
+        record['rows'] = sum(len(df) for df in frames)
+    with recorder.stage('index', pipeline.ppts_row_count(reference_frames)):
+        reference = pipeline.build_reference_indexes(reference_frames, config, log)
+
+    for (publication, path), df in zip(sources, frames):
+        if df.empty:
+            log(f"Пакетный запуск: ТСУ {publication} ({path}) пуста или не прочитана, источник пропущен.")
+    loaded = [(source, df) for source, df in zip(sources, frames) if not df.empty]
+    if not loaded:
+        log("Ошибка: Все таблицы с уязвимостями пусты.")
+        summary['timings'].update(recorder.timings())
+        summary['error'] = 'empty_vulnerabilities'
+        return summary
+
+    unique_df = unique_rows([df for _, df in loaded])
+    total_rows = sum(len(df) for _, df in loaded)
+    log(f"Пакетный запуск: {len(loaded)} ТСУ, {total_rows} строк, без повторов (CVE, продукт): {len(unique_df)}.")
+
+    engine_before = comparison_engine.engine_stats(reference['ppts_index'])
+    matching_report: Dict[str, Any] = {}
+    analyzed = pipeline.analyze_vulnerabilities(
+        unique_df, reference, config, config_rules, recorder=recorder, matching_report=matching_report
+    )
+    pipeline._log_matching_report(matching_report, recorder, log)
+    engine_after = comparison_engine.engine_stats(reference['ppts_index'])
+    by_key = {(item.cve, item.product): item for item in analyzed}
+
+    output_paths = report_paths(output_folder, [publication for (publication, _), _ in loaded])
+    tasks = []
+    source_summaries = []
+    combined_results: List[Any] = []
+    combined_publications: List[str] = []
+    for ((publication, path), df), output_path in zip(loaded, output_paths):
+        results = [incremental.reuse_result(by_key[duplicate_key(record)], record, retain_raw_scores=False)
+                   for record in (row._asdict() for row in df.astype(object).itertuples())]
+        tasks.append({'results': results, 'output_path': output_path, 'config': config,
+                      'responsible': responsible or pipeline.DEFAULT_RESPONSIBLE, 'publication': publication})
+        source_summaries.append({'publication': publication, 'vulnerabilities': path, 'output_path': output_path,
+                                 'rows': len(results), 'statuses': pipeline.count_statuses(results)})
+        combined_results.extend(results)
+        combined_publications.extend([publication] * len(results))
+
+    combined_path = output_paths[-1]
+    tasks.append({'results': combined_results, 'output_path': combined_path, 'config': config,
+                  'responsible': responsible or pipeline.DEFAULT_RESPONSIBLE, 'publication': '',
+                  'row_publications': combined_publications})
+    with recorder.stage('report', len(combined_results) * 2):
+        write_reports(tasks, shared_index.worker_count(config))
+
+    summary['timings'].update(recorder.timings())
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {
+        'vulnerabilities': total_rows, 'unique_rows': len(unique_df), 'duplicate_rows': total_rows - len(unique_df),
+        'ppts': pipeline.ppts_row_count(reference), 'journal': len(reference['journal_df']),
+        'statuses': pipeline.count_statuses(combined_results)
+    }
+    summary.update({'ok': True, 'backend': 'local', 'output_path': combined_path, 'sources': source_summaries,
+                    'results': combined_results, 'stages': recorder.stages, 'matching': matching_report})
+    for source in source_summaries:
+        log(f"Пакетный запуск: {source['publication']}: {source['rows']} строк -> {source['output_path']}")
+    log(f"Сводный отчет сохранен в {combined_path}")
+    pipeline._report_stages(recorder, os.path.splitext(combined_path)[0] + pipeline.TIMINGS_FILE_SUFFIX, summary, log)
+
+    metric_paths = dict(paths, **{f"vulnerabilities_{i}": path for i, ((_, path), _) in enumerate(loaded)})
+    run_metrics.emit(run_metrics.build_record(
+        'batch', summary, metric_paths,
+        {'vulnerabilities': [f"vulnerabilities_{i}" for i in range(len(loaded))],
+         'ppts': ['ppts_local', 'ppts_general'], 'journal': ['journal']},
+        load_seconds=load_seconds, rows=total_rows, distinct_products=int(unique_df['product'].nunique()),
+        engine=run_metrics.engine_delta(engine_before, engine_after)
+    ), config, output_folder, log)
+    return summary
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    assert parse_sources(['БДУ ФСТЭК = a.xlsx', 'NVD=C:\\tsu\\nvd.xlsx']) == [('БДУ ФСТЭК', 'a.xlsx'),
+                                                                            ('NVD', 'C:\\tsu\\nvd.xlsx')]
+    bdu = pd.DataFrame({'id_num': [1, 2], 'cve': ['CVE-1', 'CVE-2'], 'cvss': ['9.8', '5.0'],
+                        'product': ['A - X', 'B - Y'], 'source_url': ['bdu', 'bdu']})
+    nvd = pd.DataFrame({'id_num': [1, 2], 'cve': ['CVE-2', 'CVE-2'], 'cvss': ['5.1', '5.1'],
+                        'product': ['B - Y', 'B - Z'], 'source_url': ['nvd', 'nvd']})
+    unique = unique_rows([bdu, nvd])
+    assert [duplicate_key(row._asdict()) for row in unique.itertuples()] == [
+        ('CVE-1', 'A - X'), ('CVE-2', 'B - Y'), ('CVE-2', 'B - Z')]
+    with __import__('tempfile').TemporaryDirectory() as folder:
+        names = [os.path.basename(path) for path in report_paths(folder, ['БДУ ФСТЭК', 'NVD', 'NVD'])]
+        assert names[0].startswith('res_tmp_report_БДУ_ФСТЭК_') and len(set(names)) == 4
+    print("Повторы (CVE, продукт) между источниками анализируются один раз.")
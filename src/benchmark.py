@@ -0,0 +1,189 @@
+# ==================================================================================
+# МОДУЛЬ 18: ЗАМЕРЫ ПРОИЗВОДИТЕЛЬНОСТИ (BENCHMARK)
+# Генерирует синтетические данные нужного размера (synthetic_data.py) и замеряет
+# каждый модуль по отдельности: data_loader, индексы, journal_sync,
+# comparison_engine, status_logic, report_generator, journal_updater.
+#   python main.py bench --scale 1000 --scale 10000 [--match-sample 500] [--label v2.1]
+# Каждый запуск дописывается в benchmark_history.jsonl; в лог выводится сравнение
+# с предыдущим запуском того же размера, чтобы регрессии были видны между версиями.
+# Конфигурация - всегда значения по умолчанию (config.ini в рабочей папке), чтобы
+# результаты разных версий можно было сравнивать.
+# ==================================================================================
+
+import json
+import os
+import platform
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_SCALES = [1000, 10000]
+
+# Сопоставление с ППТС - самый долгий этап; на больших объемах по умолчанию замеряется
+# на первых N строках ТСУ (время на строку сравнимо между запусками). 0 - все строки.
+DEFAULT_MATCH_SAMPLE = 500
+
+HISTORY_FILE_NAME = "benchmark_history.jsonl"
+DATASET_MARKER_NAME = "dataset.json"
+
+# Во сколько раз время на строку должно вырасти, чтобы считать это регрессией
+REGRESSION_RATIO = 1.2
+
+
+def _dataset(work_dir: str, scale: int, seed: int, log: Callable[[str], None]) -> Dict[str, str]:
+    """Набор файлов для размера scale; уже сгенерированный с тем же seed используется повторно."""
+    from src import synthetic_data
+
+    folder = os.path.join(work_dir, f"scale_{scale}")
+    marker_path = os.path.join(folder, DATASET_MARKER_NAME)
+    try:
+        with open(marker_path, encoding='utf-8') as f:
+            marker = json.load(f)
+        if marker.get('scale') == scale and marker.get('seed') == seed and \
+                all(os.path.exists(p) for p in marker['paths'].values()):
+            return marker['paths']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    log(f"Генерация синтетических данных: {scale} строк ТСУ...")
+    started = time.perf_counter()
+    paths = synthetic_data.write_dataset(folder, vulnerabilities=scale, seed=seed)
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump({'scale': scale, 'seed': seed, 'paths': paths}, f, ensure_ascii=False, indent=1)
+    log(f"  данные сгенерированы за {time.perf_counter() - started:.1f} с: {folder}")
+    return paths
+
+
+def run_scale(
+        work_dir: str, scale: int, config: Any, match_sample: int = DEFAULT_MATCH_SAMPLE,
+        seed: int = 1, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Замеряет все модули на одном наборе данных.
+
+    Returns:
+        Запись для истории: 'scale', 'match_sample', 'stages' (замеры run_stages) и 'per_row_ms'.
+    """
+    import pandas as pd
+    from src import data_loader, journal_updater, pipeline, report_generator, run_stages
+
+    paths = _dataset(work_dir, scale, seed, log)
+    recorder = run_stages.StageRecorder()
+    log(f"Замеры на {scale} строках ТСУ...")
+
+    with recorder.stage('data_loader') as record:
+        vulns_df = data_loader.load_vulnerabilities(paths['vulnerabilities'])
+        frames = pipeline.load_reference_frames(paths)
+        record['rows'] = len(vulns_df) + len(frames['ppts_df']) + len(frames['journal_df'])
+        frames_memory = data_loader.memory_report(
+            {'vulnerabilities': vulns_df, 'ppts': frames['ppts_df'], 'journal': frames['journal_df']}
+        )
+    with recorder.stage('index', len(frames['ppts_df'])):
+        reference = pipeline.build_reference_indexes(frames, config)
+
+    records = [row._asdict() for row in vulns_df.itertuples()]
+    with recorder.stage('journal_sync', len(records)):
+        journal_found = pipeline.check_journal(records, reference)
+
+    sample = records[:match_sample] if match_sample else records
+    with recorder.stage('comparison_engine', len(sample)):
+        matched = pipeline.match_products(sample, reference, config)
+    with recorder.stage('status_logic', len(sample)):
+        results = pipeline.decide_statuses(sample, journal_found, matched, pipeline.parse_config_rules(config))
+
+    report_path = os.path.join(paths['output_folder'], pipeline.REPORT_FILE_NAME)
+    with recorder.stage('report_generator', len(results)):
+        report_generator.generate_report(results, report_path, config, pipeline.DEFAULT_RESPONSIBLE,
+                                         pipeline.DEFAULT_PUBLICATION)
+
+    # Обновление ЖП создает новый файл журнала рядом с исходным - удаляем его после замера
+    with recorder.stage('journal_updater') as record:
+        added_df = journal_updater.update_journal_file(paths['journal'], report_path)
+        record['rows'] = len(added_df) if isinstance(added_df, pd.DataFrame) else 0
+    new_journal = journal_updater.generate_new_journal_name(paths['journal'])
+    if os.path.exists(new_journal) and os.path.abspath(new_journal) != os.path.abspath(paths['journal']):
+        os.remove(new_journal)
+
+    for line in recorder.format_lines():
+        log(line)
+    log(f"  память таблиц (до -> после сжатия типов): {data_loader.format_memory_report(frames_memory)}")
+    return {
+        'scale': scale, 'match_sample': match_sample, 'seed': seed,
+        'counts': {'vulnerabilities': len(vulns_df), 'ppts': len(frames['ppts_df']),
+                   'journal': len(frames['journal_df'])},
+        'stages': recorder.stages,
+        'frames_memory_mb': frames_memory,
+        'per_row_ms': {r['name']: r['wall_seconds'] * 1000 / r['rows'] for r in recorder.stages if r['rows']},
+    }
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    entries = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+    except (OSError, ValueError):
+        pass
+    return entries
+
+
+def compare_with_previous(entry: Dict[str, Any], history: List[Dict[str, Any]]) -> List[str]:
+    """Сравнивает время на строку с последним запуском того же размера и выборки."""
+    previous = next((h for h in reversed(history)
+                     if h.get('scale') == entry['scale'] and h.get('match_sample') == entry['match_sample']), None)
+    if previous is None:
+        return [f"  {entry['scale']} строк: предыдущих замеров нет."]
+
+    lines = [f"  {entry['scale']} строк: сравнение с '{previous.get('label')}' ({previous.get('created')}):"]
+    for name, value in entry['per_row_ms'].items():
+        before = previous.get('per_row_ms', {}).get(name)
+        if not before:
+            continue
+        ratio = value / before
+        flag = "  <- РЕГРЕССИЯ" if ratio >= REGRESSION_RATIO else ""
+        lines.append(f"    {name}: {before:.3f} -> {value:.3f} мс/строку ({(ratio - 1) * 100:+.0f}%){flag}")
+    return lines
+
+
+def run_benchmark(
+        work_dir: str, scales: Optional[List[int]] = None, match_sample: int = DEFAULT_MATCH_SAMPLE,
+        label: Optional[str] = None, seed: int = 1, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Сценарий команды 'bench'.
+
+    Returns:
+        Сводка: 'ok', 'history_path', 'entries' (записи по каждому размеру) и 'regressions'.
+    """
+    from src import config_handler
+
+    os.makedirs(work_dir, exist_ok=True)
+    config_handler.create_default_config(work_dir)
+    config = config_handler.load_config(work_dir)
+
+    history_path = os.path.join(work_dir, HISTORY_FILE_NAME)
+    history = load_history(history_path)
+    created = time.strftime('%Y-%m-%d %H:%M:%S')
+    label = label or created
+
+    entries, comparison = [], []
+    for scale in scales or DEFAULT_SCALES:
+        entry = run_scale(work_dir, scale, config, match_sample, seed, log)
+        entry.update({'label': label, 'created': created, 'python': platform.python_version(),
+                      'platform': platform.platform()})
+        comparison.extend(compare_with_previous(entry, history))
+        entries.append(entry)
+
+    with open(history_path, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    log("Сравнение с предыдущими замерами:")
+    for line in comparison:
+        log(line)
+    log(f"Результаты дописаны в {history_path}")
+    regressions = [line.strip() for line in comparison if 'РЕГРЕССИЯ' in line]
+    return {'ok': True, 'history_path': history_path, 'label': label,
+            'entries': [{k: e[k] for k in ('scale', 'match_sample', 'counts', 'per_row_ms')} for e in entries],
+            'regressions': regressions}
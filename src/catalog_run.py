@@ -0,0 +1,225 @@
+# ==================================================================================
+# МОДУЛЬ 26: РЕЖИМ ПОЛНОГО КАТАЛОГА
+# Режим python main.py catalog --vulnerabilities bdu_full.xlsx - проверка всего
+# каталога БДУ (десятки тысяч строк) по новому ППТС при ограниченной памяти:
+#   - ТСУ читается порциями ([Performance] catalog_chunk_rows строк) через openpyxl
+#     в режиме read_only, без загрузки всего файла в DataFrame;
+#   - каждая порция проходит обычные этапы analyze_vulnerabilities; при match_workers > 1
+#     сопоставление идет в процессах-исполнителях, которые запускаются один раз
+#     на весь каталог (shared_index.MatchPool);
+#   - результаты порции сразу дописываются в отчет (report_generator.StreamingReport,
+#     xlsxwriter constant_memory) и не накапливаются: в памяти - только одна порция
+#     и счетчики статусов;
+#   - после каждой порции в лог пишутся прогресс, скорость, оценка оставшегося времени
+#     и пиковая память процесса.
+# Отчет: res_tmp_report_catalog_<дата_время>.xlsx в папке отчетов (без объединения ячеек).
+# ==================================================================================
+
+import contextlib
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+DEFAULT_CHUNK_ROWS = 2000
+CATALOG_REPORT_STEM = "catalog"
+
+# Колонки A-E ТСУ (как в data_loader.load_vulnerabilities)
+VULNERABILITY_COLUMNS = ['id_num', 'cve', 'cvss', 'product', 'source_url']
+
+
+def chunk_rows(config: Any) -> int:
+    value = config.getint('Performance', 'catalog_chunk_rows', fallback=DEFAULT_CHUNK_ROWS) \
+        if config is not None else DEFAULT_CHUNK_ROWS
+    return max(1, value)
+
+
+def catalog_row_count(path: str) -> Optional[int]:
+    """
+    Число строк ТСУ (с пустыми) для прогресса и оценки времени: по размеру листа, записанному
+    в файле, а если его нет (файл выгружен не из Excel) - одним проходом по строкам.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        if sheet.max_row is None:
+            sheet.calculate_dimension(force=True)
+        max_row = sheet.max_row
+    finally:
+        workbook.close()
+    return None if max_row is None else max(0, max_row - 1)
+
+
+def iter_vulnerability_chunks(path: str, rows_per_chunk: int) -> Iterator[List[tuple]]:
+    """
+    Строки ТСУ (первый лист, колонки A-E, без заголовка) порциями по rows_per_chunk.
+    Полностью пустые строки пропускаются.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        chunk: List[tuple] = []
+        for row in workbook.worksheets[0].iter_rows(min_row=2, max_col=len(VULNERABILITY_COLUMNS), values_only=True):
+            row = tuple(row) + (None,) * (len(VULNERABILITY_COLUMNS) - len(row))
+            if all(value is None for value in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= rows_per_chunk:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        workbook.close()
+
+
+def format_eta(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes:02d} мин" if hours else f"{minutes} мин {seconds:02d} с"
+
+
+def run_catalog(
+        paths: Dict[str, str], config: Any,
+        responsible: Optional[str] = None, publication: Optional[str] = None,
+        rows_per_chunk: Optional[int] = None,
+        progress: Callable[[float], None] = lambda value: None,
+        log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Анализ всего каталога ТСУ порциями с потоковой записью отчета.
+
+    Returns:
+        Сводка: 'ok', 'output_path', 'counts' (строки, порции, статусы), 'timings' (по этапам -
+        суммарно по всем порциям) и 'matching' (суммы счетчиков analyze_vulnerabilities).
+        Результаты по строкам не возвращаются - они только в отчете.
+    """
+    import pandas as pd
+    from src import (comparison_engine, pipeline, report_generator, run_metrics, run_stages, shared_index,
+                     watch_folder)
+
+    summary: Dict[str, Any] = {'ok': False, 'output_path': None, 'counts': {}, 'timings': {}}
+    started = time.perf_counter()
+    if not all(paths.get(key) for key in pipeline.PATH_KEYS):
+        log("Ошибка: Все пути должны быть указаны.")
+        summary['error'] = 'missing_paths'
+        return summary
+    if not os.path.exists(paths['vulnerabilities']):
+        log(f"Ошибка: Файл ТСУ не найден: {paths['vulnerabilities']}")
+        summary['error'] = 'missing_vulnerabilities'
+        return summary
+
+    rows_per_chunk = rows_per_chunk or chunk_rows(config)
+    recorder = run_stages.StageRecorder(run_stages.profile_prefix(config, paths['output_folder'], 'catalog'))
+    config_rules = pipeline.parse_config_rules(config)
+    with recorder.stage('load'):
+        frames = pipeline.load_reference_frames(paths, config, log)
+        total_rows = catalog_row_count(paths['vulnerabilities'])
+    with recorder.stage('index', pipeline.ppts_row_count(frames)):
+        reference = pipeline.build_reference_indexes(frames, config, log)
+    del frames
+
+    output_path = watch_folder.unique_report_path(paths['output_folder'], f"{CATALOG_REPORT_STEM}.xlsx")
+    report = report_generator.StreamingReport(
+        output_path, config, responsible or pipeline.DEFAULT_RESPONSIBLE, publication or pipeline.DEFAULT_PUBLICATION
+    )
+    log(f"Полный каталог: ~{total_rows if total_rows is not None else '?'} строк ТСУ, порции по {rows_per_chunk}.")
+
+    statuses: Dict[str, int] = {}
+    matching: Dict[str, Any] = {}
+    stage_seconds: Dict[str, float] = {}
+    done = chunks = 0
+    engine_before = comparison_engine.engine_stats(reference['ppts_index'])
+    workers = shared_index.worker_count(config)
+    analysis_started = time.perf_counter()
+    try:
+        # При match_workers = 1 сопоставление идет в основном процессе (match_pool = None); в собранном
+        # .exe исполнители MatchPool перехватывает multiprocessing.freeze_support() в main.py
+        with shared_index.MatchPool(reference['ppts_index'], workers) if workers > 1 else \
+                contextlib.nullcontext() as match_pool:
+            chunk_reference = dict(reference, match_pool=match_pool)
+            for rows in iter_vulnerability_chunks(paths['vulnerabilities'], rows_per_chunk):
+                chunk_recorder = run_stages.StageRecorder()
+                chunk_report: Dict[str, Any] = {}
+                vulns_df = pd.DataFrame(rows, columns=VULNERABILITY_COLUMNS)
+                results = pipeline.analyze_vulnerabilities(
+                    vulns_df, chunk_reference, config, config_rules, recorder=chunk_recorder,
+                    matching_report=chunk_report
+                )
+                with chunk_recorder.stage('report', len(results)):
+                    report.write(results)
+
+                for status, count in pipeline.count_statuses(results).items():
+                    statuses[status] = statuses.get(status, 0) + count
+                for key, value in chunk_report.items():
+                    matching[key] = matching.get(key, 0) + value if isinstance(value, int) else value
+                for name, seconds in chunk_recorder.timings().items():
+                    stage_seconds[name] = stage_seconds.get(name, 0.0) + seconds
+                done += len(rows)
+                chunks += 1
+                del results, vulns_df
+
+                elapsed = time.perf_counter() - analysis_started
+                rate = done / elapsed if elapsed else 0.0
+                line = f"Полный каталог: порция {chunks}, строк {done}"
+                if total_rows:
+                    line += f" из {total_rows} ({min(done / total_rows, 1.0):.0%})"
+                    if rate:
+                        line += f", осталось ~{format_eta(max(total_rows - done, 0) / rate)}"
+                    progress(min(done / total_rows, 1.0))
+                peak = run_stages.peak_rss_bytes()
+                line += f", {rate:.0f} строк/с"
+                if peak is not None:
+                    line += f", пик памяти {peak / (1024 * 1024):.0f} МБ"
+                log(line)
+    finally:
+        with recorder.stage('report_close'):
+            report.close()
+    engine_after = comparison_engine.engine_stats(reference['ppts_index'])
+
+    if not done:
+        log("Ошибка: Таблица с уязвимостями пуста.")
+        summary['error'] = 'empty_vulnerabilities'
+        return summary
+
+    summary['timings'].update(recorder.timings())
+    summary['timings'].update(stage_seconds)
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {
+        'vulnerabilities': done, 'chunks': chunks, 'chunk_rows': rows_per_chunk,
+        'ppts': pipeline.ppts_row_count(reference), 'journal': len(reference['journal_df']), 'statuses': statuses
+    }
+    summary.update({'ok': True, 'backend': 'local', 'output_path': output_path, 'matching': matching,
+                    'stages': recorder.stages, 'peak_rss_mb': run_stages._mb(run_stages.peak_rss_bytes())})
+    log(f"Полный каталог: {done} строк за {format_eta(summary['timings']['total'])}, отчет сохранен в {output_path}")
+    run_metrics.emit(run_metrics.build_record(
+        'catalog', summary, paths,
+        {'vulnerabilities': ['vulnerabilities'], 'ppts': ['ppts_local', 'ppts_general'], 'journal': ['journal']},
+        rows=done, engine=run_metrics.engine_delta(engine_before, engine_after)
+    ), config, paths['output_folder'], log)
+    return summary
+
+
+if __name__ == '__main__':
+    import tempfile
+    import openpyxl
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'catalog.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['№', 'CVE', 'CVSS', 'Продукт', 'Источник'])
+        for i in range(1, 8):
+            sheet.append([i, f'CVE-2025-{i:04d}', '5.0', f'Vendor - Product {i}', f'https://bdu/{i}'])
+        sheet.append([None] * 5)
+        sheet.append([8, 'CVE-2025-0008', None, 'Vendor - Product 8'])
+        workbook.save(path)
+
+        assert catalog_row_count(path) == 9
+        chunks = list(iter_vulnerability_chunks(path, 3))
+        assert [len(chunk) for chunk in chunks] == [3, 3, 2], "пустая строка пропускается"
+        assert chunks[-1][-1] == (8, 'CVE-2025-0008', None, 'Vendor - Product 8', None)
+    assert format_eta(3725) == "1 ч 02 мин" and format_eta(65) == "1 мин 05 с"
+    print("Чтение ТСУ порциями работает.")
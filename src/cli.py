@@ -0,0 +1,226 @@
+# ==================================================================================
+# МОДУЛЬ 10: КОМАНДНАЯ СТРОКА (пакетный режим без окна)
+# Позволяет запускать анализ и обновление ЖП по расписанию на сервере без графики:
+#   python main.py analyze [--vulnerabilities ... --output-folder ...]
+#   python main.py update-journal [--journal ... --output-folder ...]
+#   python main.py serve [--host ... --port ...]   - локальная служба (analysis_service)
+#   python main.py match "Вендор - Продукт"        - совпадения в ППТС для одной строки
+#   python main.py watch [--inbox ... --once]      - анализ новых ТСУ из папки входящих
+#   python main.py batch --source "NVD=nvd.xlsx" ... - несколько ТСУ с общими ППТС/ЖП
+#   python main.py catalog --vulnerabilities bdu.xlsx - весь каталог порциями (потоковый отчет)
+#   python main.py reverse --previous-ppts-local old.xlsx - продукты ЖП, совпавшие с новыми строками ППТС
+#   python main.py sweep --grid fuzz_ratio_threshold=50,60,70 - подбор порогов по ЖП
+#   python main.py verify [--generate 500 --limit 200] - ускоренный анализ против исходного алгоритма
+#   python main.py bench --scale 1000 --scale 10000  - замеры на синтетических данных
+# Пути берутся из config.ini и могут быть переопределены аргументами.
+# Сводка (счетчики и тайминги) печатается в stdout одной строкой JSON,
+# весь остальной вывод модулей перенаправляется в stderr.
+# ВАЖНО: модуль не должен импортировать customtkinter/tkinter.
+# ==================================================================================
+
+import argparse
+import contextlib
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from src import config_handler
+
+def _add_path_arguments(parser: argparse.ArgumentParser):
+    """Добавляет аргументы для переопределения путей из секции [Paths]."""
+    parser.add_argument('--config-dir', help="Папка с config.ini (по умолчанию - папка программы)")
+    parser.add_argument('--vulnerabilities', help="Таблица с уязвимостями (ТСУ)")
+    parser.add_argument('--ppts-local', help="Локальный перечень ППТС")
+    parser.add_argument('--ppts-general', help="Общий перечень ППТС")
+    parser.add_argument('--journal', help="Журнал публикаций уязвимостей")
+    parser.add_argument('--output-folder', help="Папка для сохранения отчетов")
+    parser.add_argument('--publication', help="Источник публикации")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='main.py', description="Анализатор статусов уязвимостей (пакетный режим)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze = subparsers.add_parser('analyze', help="Анализ ТСУ и генерация res_tmp_report.xlsx")
+    _add_path_arguments(analyze)
+    analyze.add_argument('--responsible', help="Ответственный")
+    analyze.add_argument('--no-service', action='store_true', help="Не передавать анализ запущенной службе")
+
+    update = subparsers.add_parser('update-journal', help="Обновление ЖП по проверенному отчету и генерация письма")
+    _add_path_arguments(update)
+
+    serve = subparsers.add_parser('serve', help="Локальная служба: держит ППТС/ЖП загруженными")
+    _add_path_arguments(serve)
+    serve.add_argument('--host', help="Адрес (по умолчанию из [Service], 127.0.0.1)")
+    serve.add_argument('--port', type=int, help="Порт (по умолчанию из [Service], 8765)")
+
+    match = subparsers.add_parser('match', help="Совпадения в ППТС для строки продукта")
+    _add_path_arguments(match)
+    match.add_argument('product', help="Строка продукта, например 'Microsoft - Windows 10'")
+
+    watch = subparsers.add_parser('watch', help="Анализ новых ТСУ, появляющихся в папке входящих")
+    _add_path_arguments(watch)
+    watch.add_argument('--inbox', help="Папка входящих (по умолчанию [Watch] inbox_folder)")
+    watch.add_argument('--interval', type=float, help="Период проверки папки, сек.")
+    watch.add_argument('--once', action='store_true', help="Обработать уже лежащие файлы и завершиться")
+
+    batch = subparsers.add_parser('batch', help="Анализ нескольких ТСУ с общими ППТС/ЖП и сводный отчет")
+    _add_path_arguments(batch)
+    batch.add_argument('--source', action='append', default=[], required=True, metavar='ПУБЛИКАЦИЯ=ПУТЬ',
+                       help="Источник публикации и его ТСУ, например 'NVD=nvd.xlsx' (можно повторять)")
+    batch.add_argument('--responsible', help="Ответственный")
+
+    catalog = subparsers.add_parser('catalog', help="Анализ всего каталога ТСУ порциями при ограниченной памяти")
+    _add_path_arguments(catalog)
+    catalog.add_argument('--responsible', help="Ответственный")
+    catalog.add_argument('--chunk-rows', type=int, help="Строк ТСУ в порции (по умолчанию [Performance] catalog_chunk_rows)")
+
+    reverse = subparsers.add_parser('reverse', help="Исторические уязвимости, совпавшие с новыми строками ППТС")
+    _add_path_arguments(reverse)
+    reverse.add_argument('--previous-ppts-local', help="Прежняя версия локального ППТС")
+    reverse.add_argument('--previous-ppts-general', help="Прежняя версия общего ППТС")
+    reverse.add_argument('--history', action='append', default=[], metavar='ПУТЬ',
+                         help="Прошлая ТСУ, продукты которой тоже проверяются (можно повторять)")
+
+    sweep = subparsers.add_parser('sweep', help="Точность/полнота движка по ЖП для сетки настроек")
+    _add_path_arguments(sweep)
+    sweep.add_argument('--grid', action='append', default=[], metavar='KEY=V1,V2',
+                       help="Значения настройки [Settings] для перебора (можно повторять; по умолчанию [Sweep])")
+    sweep.add_argument('--limit', type=int, help="Оценивать только первые N размеченных строк ЖП")
+
+    verify = subparsers.add_parser('verify', help="Сравнение ускоренного анализа с исходным алгоритмом по строкам ТСУ")
+    _add_path_arguments(verify)
+    verify.add_argument('--generate', type=int, metavar='N', help="Проверить на синтетических данных из N строк ТСУ")
+    verify.add_argument('--seed', type=int, default=1, help="Зерно генератора синтетических данных")
+    verify.add_argument('--limit', type=int, help="Проверять только первые N строк ТСУ")
+
+    bench = subparsers.add_parser('bench', help="Замеры производительности модулей на синтетических данных")
+    bench.add_argument('--config-dir', help="Папка программы (по умолчанию рабочая папка - <папка>/benchmark)")
+    bench.add_argument('--work-dir', help="Папка для синтетических данных и истории замеров")
+    bench.add_argument('--scale', type=int, action='append', help="Количество строк ТСУ (можно повторять)")
+    bench.add_argument('--match-sample', type=int, help="Строк ТСУ для замера сопоставления (0 - все)")
+    bench.add_argument('--label', help="Метка запуска в истории, например версия программы")
+    bench.add_argument('--seed', type=int, default=1, help="Зерно генератора данных")
+
+    return parser
+
+
+def _resolve_paths(config: Any, args: argparse.Namespace) -> Dict[str, str]:
+    """Берет пути из config.ini и подставляет поверх них аргументы командной строки."""
+    from src import pipeline
+
+    paths = {key: config.get('Paths', key, fallback='') for key in pipeline.PATH_KEYS}
+    for key in pipeline.PATH_KEYS:
+        override = getattr(args, key, None)
+        if override:
+            paths[key] = override
+    return paths
+
+
+def _run_match(config: Any, paths: Dict[str, str], product: str) -> Dict[str, Any]:
+    """Ищет совпадения через службу, а если она не запущена - загружает ППТС сам."""
+    import time
+    from src import analysis_service, comparison_engine, pipeline
+
+    started = time.perf_counter()
+    matches = analysis_service.request_match(config, product)
+    backend = 'service'
+    if matches is None:
+        backend = 'local'
+        reference = pipeline.load_reference_data(paths, config)
+        matches = comparison_engine.find_best_matches(product, reference['ppts_df'], config, reference['ppts_index'])
+    return {'ok': True, 'backend': backend, 'product': product, 'matches': matches,
+            'timings': {'total': time.perf_counter() - started}}
+
+
+def _emit(command: str, summary: Dict[str, Any], stream: Any) -> int:
+    """Печатает машиночитаемую сводку и возвращает код завершения процесса."""
+    record = {'command': command}
+    record.update({k: v for k, v in summary.items() if k != 'results'})
+    stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    stream.flush()
+    return 0 if summary.get('ok') else 1
+
+
+def main(argv: Optional[List[str]], base_path: str) -> int:
+    args = build_parser().parse_args(argv)
+    config_dir = args.config_dir or base_path
+    stdout = sys.stdout
+
+    # Все print() модулей уходят в stderr, чтобы stdout содержал только JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        from src import pipeline
+
+        if args.command == 'bench':
+            import os
+            from src import benchmark
+
+            summary = benchmark.run_benchmark(
+                args.work_dir or os.path.join(config_dir, 'benchmark'), args.scale,
+                benchmark.DEFAULT_MATCH_SAMPLE if args.match_sample is None else args.match_sample,
+                args.label, args.seed
+            )
+            return _emit(args.command, summary, stdout)
+
+        config_handler.create_default_config(config_dir)
+        config = config_handler.load_config(config_dir)
+        paths = _resolve_paths(config, args)
+        publication = args.publication or pipeline.DEFAULT_PUBLICATION
+
+        if args.command == 'analyze':
+            summary = pipeline.run_analysis(
+                paths=paths, config=config,
+                responsible=args.responsible or pipeline.DEFAULT_RESPONSIBLE, publication=publication,
+                use_service=not args.no_service
+            )
+        elif args.command == 'update-journal':
+            summary = pipeline.run_update(paths=paths, publication=publication, config=config)
+        elif args.command == 'serve':
+            from src import analysis_service
+
+            overrides = {key: getattr(args, key, None) for key in pipeline.PATH_KEYS}
+            analysis_service.serve(config_dir, overrides, host=args.host, port=args.port)
+            return 0
+        elif args.command == 'watch':
+            from src import watch_folder
+
+            overrides = {key: getattr(args, key, None) for key in pipeline.PATH_KEYS}
+            summary = watch_folder.watch(config_dir, overrides, args.inbox, args.interval, args.once)
+        elif args.command == 'batch':
+            from src import batch_run
+
+            try:
+                sources = batch_run.parse_sources(args.source)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return _emit(args.command, {'ok': False, 'error': 'bad_source'}, stdout)
+            summary = batch_run.run_batch(sources, paths, config, args.responsible)
+        elif args.command == 'catalog':
+            from src import catalog_run
+
+            summary = catalog_run.run_catalog(paths, config, args.responsible, publication, args.chunk_rows)
+        elif args.command == 'reverse':
+            from src import reverse_match
+
+            previous_paths = {'ppts_local': args.previous_ppts_local, 'ppts_general': args.previous_ppts_general}
+            summary = reverse_match.run_reverse(paths, config, previous_paths, args.history)
+        elif args.command == 'sweep':
+            from src import threshold_sweep
+
+            try:
+                grid = threshold_sweep.parse_grid(args.grid)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return _emit(args.command, {'ok': False, 'error': 'bad_grid'}, stdout)
+            summary = threshold_sweep.sweep(paths, config, grid, args.limit)
+        elif args.command == 'verify':
+            from src import equivalence
+
+            if args.generate:
+                summary = equivalence.verify_generated(args.generate, config, args.seed, args.limit)
+            else:
+                summary = equivalence.verify(paths, config, args.limit)
+        else:
+            summary = _run_match(config, paths, args.product)
+
+    return _emit(args.command, summary, stdout)
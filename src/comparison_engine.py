@@ -4,11 +4,18 @@
 # Является "мозгом" аналитического процесса.
 # ==================================================================================
 
+import heapq
 import re
-from fuzzywuzzy import fuzz
-from typing import Set, Dict, Any, Tuple, List
+from typing import Set, Dict, Any, Tuple, List, Optional
 import pandas as pd
 
+from src import scorers
+from src.result_records import PptsMatch
+
+# Нижний порог fuzz.ratio, с которым сохраняются "сырые" оценки для пересчета результатов
+# при изменении порогов (rank_raw_scores): пересчет возможен для fuzz_ratio_threshold от этого значения
+RESCORE_RATIO_FLOOR = 50
+
 
 def _prepare_words(text: str, min_word_length: int) -> Set[str]:
     """Вспомогательная функция для очистки и подготовки текста."""
@@ -62,7 +69,7 @@ def _compare_word_sets(vuln_words: Set[str], ppts_words: Set[str], settings: Dic
                     break  # Нашли идеальное совпадение, идем к следующему слову
 
             # 2. Нечеткое сравнение (если префикс не найден)
-            ratio = fuzz.ratio(v_word, p_word)
+            ratio = scorers.ratio(v_word, p_word)
             if ratio > best_match_score:
                 best_match_score = ratio
 
@@ -76,16 +83,10 @@ def _compare_word_sets(vuln_words: Set[str], ppts_words: Set[str], settings: Dic
     return {'count': match_count, 'avg_sim': avg_sim, 'prefix_found': prefix_match_found}
 
 
-def find_best_matches(vuln_product_name: str, ppts_df: pd.DataFrame, config: Any) -> List[Dict[str, Any]]:
-    """
-    Основная функция сравнения. Принимает название продукта из ТСУ,
-    DataFrame всех ППТС и настройки. Возвращает отсортированный список совпадений.
-    """
-    results = []
-
-    # Загружаем настройки из конфига с значениями по умолчанию
+def _load_settings(config: Any) -> Dict[str, int]:
+    """Загружает настройки сравнения из конфига со значениями по умолчанию."""
     s = config['Settings']
-    settings = {
+    return {
         'min_word_length': s.getint('min_word_length', 3),
         'prefix_threshold_short': s.getint('prefix_threshold_short', 100),
         'prefix_threshold_medium': s.getint('prefix_threshold_medium', 90),
@@ -95,61 +96,279 @@ def find_best_matches(vuln_product_name: str, ppts_df: pd.DataFrame, config: Any
         'index1_results_limit': s.getint('index1_results_limit', 5)
     }
 
+
+def _prefix_threshold(word_length: int, settings: Dict[str, int]) -> int:
+    """Порог префикса в зависимости от длины слова (как в _compare_word_sets)."""
+    return settings['prefix_threshold_short'] if word_length < 5 else \
+        settings['prefix_threshold_medium'] if word_length < 10 else \
+        settings['prefix_threshold_long']
+
+
+def build_ppts_index(ppts_df: pd.DataFrame, min_word_length: int) -> Dict[str, Any]:
+    """
+    Строит индекс ППТС, чтобы не разбирать все строки ППТС заново для каждой уязвимости.
+
+    Returns:
+        Словарь:
+            'rows' - кортежи (id_ppts, name, vendor, source) в порядке строк ppts_df;
+            'words' - словарь всех слов ППТС, 'word_ids' - слово -> номер в 'words';
+            'postings' - для каждого слова список номеров строк, где оно встречается;
+            'word_cache' - кэш оценок слов уязвимостей против словаря (заполняется при поиске);
+            'word_occurrences' - сколько всего слов во всех строках ППТС;
+            'stats' - счетчики работы движка (см. engine_stats).
+    """
+    rows = []
+    words: List[str] = []
+    word_ids: Dict[str, int] = {}
+    postings: List[List[int]] = []
+
+    for row_id, row in enumerate(ppts_df.itertuples(index=False)):
+        rows.append((row.id_ppts, row.name, row.vendor, row.source))
+        ppts_words = _prepare_words(f"{row.vendor} {row.name}", min_word_length)
+        for word in ppts_words:
+            word_id = word_ids.get(word)
+            if word_id is None:
+                word_id = len(words)
+                word_ids[word] = word_id
+                words.append(word)
+                postings.append([])
+            postings[word_id].append(row_id)
+
+    return {
+        'min_word_length': min_word_length,
+        'rows': rows,
+        'words': words,
+        'word_ids': word_ids,
+        'postings': postings,
+        'word_cache': {},
+        'word_occurrences': sum(len(p) for p in postings),
+        'stats': {'word_lookups': 0, 'word_cache_hits': 0, 'fuzz_comparisons': 0, 'naive_comparisons': 0}
+    }
+
+
+def engine_stats(ppts_index: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Снимок счетчиков движка для индекса:
+        'word_lookups' / 'word_cache_hits' - обращения к кэшу оценок слов и попадания в него;
+        'fuzz_comparisons' - фактически выполненные вызовы fuzz.ratio;
+        'naive_comparisons' - сколько пар слов сравнил бы построчный перебор ППТС (_compare_word_sets).
+    """
+    return dict(ppts_index['stats'])
+
+
+def _score_word_against_vocabulary(v_word: str, ppts_index: Dict[str, Any], floor: int) -> list:
+    """
+    Сравнивает слово уязвимости со всем словарем ППТС (один раз на слово, дальше - из кэша).
+    Возвращает "сырые" оценки только тех слов ППТС, которые могут дать совпадение
+    при пороге нечеткого совпадения не ниже floor: кортежи (word_id, fuzz.ratio, слово_ППТС_начинается_с_v_word).
+    """
+    stats = ppts_index['stats']
+    stats['word_lookups'] += 1
+    stats['naive_comparisons'] += ppts_index['word_occurrences']
+    cache_key = (v_word, floor)
+    cached = ppts_index['word_cache'].get(cache_key)
+    if cached is not None:
+        stats['word_cache_hits'] += 1
+        return cached
+
+    stats['fuzz_comparisons'] += len(ppts_index['words'])
+    scored = []
+    words = ppts_index['words']
+    # Оценки против всего словаря одним вызовом: реализация rapidfuzz считает их пачкой
+    for word_id, (p_word, ratio) in enumerate(zip(words, scorers.ratios(v_word, words))):
+        is_prefix = p_word.startswith(v_word)
+        if is_prefix or ratio >= floor:
+            scored.append((word_id, ratio, is_prefix))
+
+    ppts_index['word_cache'][cache_key] = scored
+    return scored
+
+
+def _collect_word_set_scores(vuln_words: Set[str], ppts_index: Dict[str, Any], floor: int) -> Dict[int, Dict[str, list]]:
+    """Для каждой строки ППТС: слово уязвимости -> [лучший fuzz.ratio, есть_префикс]."""
+    postings = ppts_index['postings']
+    best_by_row: Dict[int, Dict[str, list]] = {}
+
+    for v_word in vuln_words:
+        for word_id, ratio, is_prefix in _score_word_against_vocabulary(v_word, ppts_index, floor):
+            for row_id in postings[word_id]:
+                row_best = best_by_row.setdefault(row_id, {})
+                current = row_best.get(v_word)
+                if current is None:
+                    row_best[v_word] = [ratio, is_prefix]
+                else:
+                    if ratio > current[0]:
+                        current[0] = ratio
+                    current[1] = current[1] or is_prefix
+    return best_by_row
+
+
+def collect_raw_scores(vuln_product_name: str, ppts_index: Dict[str, Any], floor: int) -> Dict[str, Any]:
+    """
+    Первый этап сравнения: "сырые" оценки слов уязвимости против строк ППТС, не зависящие от порогов.
+    Из них rank_raw_scores получает итоговые совпадения для любых порогов
+    (fuzz_ratio_threshold не ниже floor) без новых вызовов fuzz.ratio.
+
+    Returns:
+        Словарь 'floor', 'min_word_length' и 'rows' - список (row_id, строка_ППТС, оценки_вендора, оценки_продукта),
+        где строка_ППТС - кортеж (id_ppts, name, vendor, source) из индекса, а оценки - кортежи
+        (длина_слова, лучший_fuzz.ratio, есть_префикс) по каждому слову уязвимости.
+    """
+    min_word_length = ppts_index['min_word_length']
     vendor_str, product_str = _split_vuln_product(vuln_product_name)
-    vuln_vendor_words = _prepare_words(vendor_str, settings['min_word_length'])
-    vuln_product_words = _prepare_words(product_str, settings['min_word_length'])
+    vuln_vendor_words = _prepare_words(vendor_str, min_word_length)
+    vuln_product_words = _prepare_words(product_str, min_word_length)
+
+    vendor_scores = _collect_word_set_scores(vuln_vendor_words, ppts_index, floor)
+    product_scores = _collect_word_set_scores(vuln_product_words, ppts_index, floor)
+
+    rows = []
+    # Строки в исходном порядке ППТС, чтобы сортировка совпадений давала тот же порядок
+    for row_id in sorted(vendor_scores.keys() | product_scores.keys()):
+        rows.append((
+            row_id,
+            ppts_index['rows'][row_id],
+            tuple((len(v), best, pref) for v, (best, pref) in vendor_scores.get(row_id, {}).items()),
+            tuple((len(v), best, pref) for v, (best, pref) in product_scores.get(row_id, {}).items()),
+        ))
+    return {'floor': floor, 'min_word_length': min_word_length, 'rows': rows}
+
+
+def _word_set_metrics(word_scores: tuple, settings: Dict[str, int]) -> Dict[str, Any]:
+    """То же, что _compare_word_sets, но по уже посчитанным "сырым" оценкам слов."""
+    match_count = 0
+    total_similarity = 0
+    prefix_match_found = False
 
-    for row in ppts_df.itertuples(index=False):
-        ppts_full_string = f"{row.vendor} {row.name}"
-        ppts_words = _prepare_words(ppts_full_string, settings['min_word_length'])
+    for word_length, best_ratio, has_prefix in word_scores:
+        # Префикс при пороге 100 считается идеальным совпадением
+        if has_prefix and _prefix_threshold(word_length, settings) == 100:
+            best_match_score, is_prefix = 100, True
+        else:
+            best_match_score, is_prefix = best_ratio, False
 
-        if not ppts_words:
-            continue
+        if best_match_score >= settings['fuzz_ratio_threshold']:
+            match_count += 1
+            total_similarity += best_match_score
+            if is_prefix:
+                prefix_match_found = True
+
+    avg_sim = (total_similarity / match_count) if match_count > 0 else 0
+    return {'count': match_count, 'avg_sim': avg_sim, 'prefix_found': prefix_match_found}
+
+
+def _match_from_metrics(ppts_row: tuple, vendor_res: Dict[str, Any], product_res: Dict[str, Any],
+                        settings: Dict[str, int]) -> Optional[PptsMatch]:
+    """Совпадение (PptsMatch) по метрикам слов вендора и продукта или None, если строка не проходит пороги."""
+    total_matches = vendor_res['count'] + product_res['count']
+
+    if total_matches == 0:
+        return None
+
+    avg_similarity = (vendor_res['avg_sim'] * vendor_res['count'] + product_res['avg_sim'] * product_res[
+        'count']) / total_matches
+
+    # Расчет Индекса
+    index = 0
+    if vendor_res['prefix_found'] and product_res['prefix_found']:
+        index = 3
+    elif vendor_res['prefix_found'] or product_res['prefix_found']:
+        index = 2
+    elif total_matches > 0:
+        index = 1
 
-        vendor_res = _compare_word_sets(vuln_vendor_words, ppts_words, settings)
-        product_res = _compare_word_sets(vuln_product_words, ppts_words, settings)
+    if index >= 1 and total_matches >= settings['min_matched_words']:
+        return PptsMatch(ppts_row, index, total_matches, round(avg_similarity),
+                         vendor_res['count'], product_res['count'])
+    return None
 
-        total_matches = vendor_res['count'] + product_res['count']
 
-        if total_matches == 0:
+def _may_have_prefix(word_scores: tuple, settings: Dict[str, int]) -> bool:
+    """Может ли хоть одно слово дать префиксное совпадение (без него строка получает не выше Индекса 1)."""
+    return any(has_prefix and _prefix_threshold(word_length, settings) == 100
+               for word_length, _, has_prefix in word_scores)
+
+
+def rank_raw_scores_compact(raw_scores: Dict[str, Any], settings: Dict[str, int]) -> List[PptsMatch]:
+    """
+    Второй этап сравнения: применяет пороги к "сырым" оценкам и возвращает
+    отсортированный список совпадений в компактном виде (PptsMatch со ссылкой на строку индекса ППТС).
+
+    Совпадения Индекса 2-3 возвращаются все, Индекса 1 - лучшие index1_results_limit: их держит куча
+    этого размера. Строка без возможного префикса, которая даже по верхней оценке (все слова с оценками
+    совпали, схожесть - лучшая оценка слова) не вытеснит худшее совпадение кучи, не оценивается.
+    Порядок тот же, что у полной сортировки: при равных оценках выше строка, раньше идущая в ППТС.
+    """
+    if settings['fuzz_ratio_threshold'] < raw_scores['floor']:
+        raise ValueError("Порог нечеткого совпадения ниже порога, с которым собирались оценки")
+
+    limit = settings['index1_results_limit']
+    min_matched_words = settings['min_matched_words']
+    upper_results = []
+    # (кол-во слов, схожесть, -позиция, совпадение): в вершине кучи - худшее из отобранных
+    index1_heap: List[tuple] = []
+    for position, (_, ppts_row, vendor_scores, product_scores) in enumerate(raw_scores['rows']):
+        words_bound = len(vendor_scores) + len(product_scores)
+        if words_bound < min_matched_words:
+            continue
+        if 0 <= limit <= len(index1_heap):
+            # Куча заполнена: строка без шанса в нее попасть пропускается, если она может дать только Индекс 1
+            hopeless = True
+            if limit:
+                worst_words, worst_similarity = index1_heap[0][0], index1_heap[0][1]
+                hopeless = words_bound < worst_words or (
+                    words_bound == worst_words and
+                    max(best for _, best, _ in vendor_scores + product_scores) <= worst_similarity)
+            if hopeless and not _may_have_prefix(vendor_scores, settings) \
+                    and not _may_have_prefix(product_scores, settings):
+                continue
+
+        match = _match_from_metrics(ppts_row, _word_set_metrics(vendor_scores, settings),
+                                    _word_set_metrics(product_scores, settings), settings)
+        if match is None:
+            continue
+        if match.index > 1:
+            upper_results.append(match)
             continue
+        item = (match.matched_words_count, match.avg_similarity, -position, match)
+        if limit < 0 or len(index1_heap) < limit:
+            heapq.heappush(index1_heap, item)
+        elif limit and item[:3] > index1_heap[0][:3]:
+            heapq.heapreplace(index1_heap, item)
 
-        avg_similarity = (vendor_res['avg_sim'] * vendor_res['count'] + product_res['avg_sim'] * product_res[
-            'count']) / total_matches
+    # Сортировка: по Индексу (убыв), по кол-ву слов (убыв), по схожести (убыв); сортировка устойчивая
+    upper_results.sort(key=lambda x: (-x.index, -x.matched_words_count, -x.avg_similarity))
+    index1_results = [item[3] for item in sorted(index1_heap, key=lambda item: item[:3], reverse=True)]
+    if limit < 0:
+        # Отрицательный лимит - срез с конца, как у списка
+        index1_results = index1_results[:limit]
+    return upper_results + index1_results
 
-        # Расчет Индекса
-        index = 0
-        if vendor_res['prefix_found'] and product_res['prefix_found']:
-            index = 3
-        elif vendor_res['prefix_found'] or product_res['prefix_found']:
-            index = 2
-        elif total_matches > 0:
-            index = 1
 
-        if index >= 1 and total_matches >= settings['min_matched_words']:
-            results.append({
-                'id_ppts': row.id_ppts,
-                'name': row.name,
-                'vendor': row.vendor,
-                'source': row.source,
-                'index': index,
-                'matched_words_count': total_matches,
-                'avg_similarity': round(avg_similarity),
-                'vendor_matched': vendor_res['count'],
-                'product_matched': product_res['count']
-            })
+def rank_raw_scores(raw_scores: Dict[str, Any], settings: Dict[str, int]) -> List[Dict[str, Any]]:
+    """То же, что rank_raw_scores_compact, но совпадения - словари (формат find_best_matches)."""
+    return [match.to_dict() for match in rank_raw_scores_compact(raw_scores, settings)]
 
-    # Сортировка: по Индексу (убыв), по кол-ву слов (убыв), по схожести (убыв)
-    results.sort(key=lambda x: (-x['index'], -x['matched_words_count'], -x['avg_similarity']))
 
-    # Ограничение для Индекса 1
-    index1_results = [r for r in results if r['index'] == 1]
-    other_results = [r for r in results if r['index'] > 1]
+def find_best_matches(
+        vuln_product_name: str, ppts_df: pd.DataFrame, config: Any, ppts_index: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Основная функция сравнения. Принимает название продукта из ТСУ,
+    DataFrame всех ППТС и настройки. Возвращает отсортированный список совпадений.
 
-    final_results = other_results + index1_results[:settings['index1_results_limit']]
-    final_results.sort(key=lambda x: (-x['index'], -x['matched_words_count'], -x['avg_similarity']))
+    Если передан ppts_index (см. build_ppts_index), строки ППТС заново не разбираются,
+    а оценки слов берутся из его кэша - так работают пакетный анализ и служба.
+    """
+    settings = _load_settings(config)
+
+    if ppts_index is None or ppts_index['min_word_length'] != settings['min_word_length']:
+        if ppts_df is None:
+            raise ValueError("Индекс ППТС построен для другой min_word_length, а ppts_df не передан")
+        ppts_index = build_ppts_index(ppts_df, settings['min_word_length'])
 
-    return final_results
+    raw_scores = collect_raw_scores(vuln_product_name, ppts_index, settings['fuzz_ratio_threshold'])
+    return rank_raw_scores(raw_scores, settings)
 
 
 # --- Пример использования (для тестирования модуля) ---
@@ -198,6 +417,24 @@ if __name__ == '__main__':
                 f"Similarity: {match['avg_similarity']}%"
             )
 
+    # 6. Поиск через заранее построенный индекс должен давать тот же результат
+    mock_index = build_ppts_index(mock_ppts_df, 3)
+    assert find_best_matches(test_vuln, mock_ppts_df, mock_config, mock_index) == best_matches
+    print("Поиск через индекс ППТС совпадает с обычным поиском.")
+
+    # 7. Отбор лучших совпадений Индекса 1: при равных оценках остаются строки, идущие раньше
+    settings = _load_settings(mock_config)
+    settings['index1_results_limit'] = 2
+    def raw_row(row_id, vendor_ratio, product_ratio, prefix=False):
+        return (row_id, (f'ID-{row_id}', 'name', 'vendor', 'source'),
+                ((4, vendor_ratio, prefix),), ((7, product_ratio, False),))
+
+    rows = [raw_row(1, 90, 95), raw_row(2, 90, 97), raw_row(3, 90, 95), raw_row(4, 80, 95), raw_row(5, 70, 95, True)]
+    ranked = rank_raw_scores_compact({'floor': 60, 'rows': rows}, settings)
+    assert [(m.id_ppts, m.index, m.avg_similarity) for m in ranked] == \
+        [('ID-5', 2, 98), ('ID-2', 1, 94), ('ID-1', 1, 92)], ranked
+    print("Отбор лучших совпадений Индекса 1 сохраняет порядок полной сортировки.")
+
     # Ожидаемый результат:
     # Сначала должны пойти Windows 11 и Windows Server (Index 3 или 2),
     # так как у них есть префиксное совпадение по "Microsoft" и "Windows".
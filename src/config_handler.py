@@ -37,7 +37,79 @@ def create_default_config(base_path: str):
             'prefix_threshold_long': '80',
             'fuzz_ratio_threshold': '60',
             'min_matched_words': '2',
-            'index1_results_limit': '5'
+            'index1_results_limit': '5',
+            '; journal_learned = 1 - если продукт строки ТСУ уже решен в ЖП (те же слова без версий),': '',
+            '; показать это решение кандидатом без сопоставления с ППТС. journal_learned_ratio - порог': '',
+            '; fuzz.ratio для продукта, отличающегося одним словом (опечатка, окончание).': '',
+            '; Меняет результат: такая строка не сопоставляется с ППТС и не получает статус по обычным': '',
+            '; правилам конфига и НЕТ - статус остается за ручным анализом. По умолчанию выключено.': '',
+            'journal_learned': '0',
+            'journal_learned_ratio': '90'
+        }
+
+        config['Service'] = {
+            '; Локальная служба анализа (python main.py serve). Если она запущена,': '',
+            '; окно и командная строка передают ей анализ (use_service = 0 - отключить).': '',
+            'host': '127.0.0.1',
+            'port': '8765',
+            'use_service': '1',
+            '; word_cache_limit - сколько слов держит кэш оценок движка в службе; при превышении': '',
+            '; кэш очищается (0 - без ограничения).': '',
+            'word_cache_limit': '100000'
+        }
+
+        config['Watch'] = {
+            '; Папка, куда поступают новые ТСУ (python main.py watch), и период ее проверки в секундах': '',
+            'inbox_folder': '',
+            'poll_interval': '5'
+        }
+
+        config['Diagnostics'] = {
+            '; profile = 1 - профилировать каждый этап анализа/обновления ЖП (cProfile + tracemalloc):': '',
+            '; в папку отчетов пишутся файлы profile_*.prof и profile_*_allocations.txt.': '',
+            '; То же включает переменная окружения VULN_ANALYZER_PROFILE=1 (в том числе для exe).': '',
+            'profile': '0'
+        }
+
+        config['Metrics'] = {
+            '; Метрики каждого запуска дописываются в metrics.jsonl в папке отчетов (enabled = 0 - отключить).': '',
+            '; prometheus_textfile_dir - папка textfile collector node_exporter для файлов vuln_analyzer_*.prom.': '',
+            'enabled': '1',
+            'jsonl_path': '',
+            'prometheus_textfile_dir': ''
+        }
+
+        config['Performance'] = {
+            '; match_workers - процессов для сопоставления с ППТС (индекс ППТС передается им через общую память):': '',
+            '; 1 - в одном процессе, 0 - по числу ядер. Включается при 200 и более строках ТСУ.': '',
+            'match_workers': '1',
+            '; ppts_index_file = 1 - сохранять индекс ППТС в ppts_index_<хэш>.bin и открывать его при': '',
+            '; следующих запусках, пока файлы ППТС не изменятся. ppts_index_folder - папка для файла': '',
+            '; (пусто - кэш пользователя: %LOCALAPPDATA%\\vuln_analyzer\\ppts_index).': '',
+            'ppts_index_file': '1',
+            'ppts_index_folder': '',
+            '; ppts_index_update = 1 - при изменении ППТС обновлять прежний индекс только по добавленным,': '',
+            '; измененным и удаленным строкам (и пересчитывать только затронутые ими строки прошлого запуска).': '',
+            'ppts_index_update': '1',
+            '; decided_rows_matches - совпадения в ППТС для строк, решенных ЖП или правилом priority=1:': '',
+            '; deferred - искать после остальных строк (для листа "Детальный анализ"), skip - не искать.': '',
+            'decided_rows_matches': 'deferred',
+            '; incremental = 1 - запоминать результаты по строкам ТСУ (analysis_state.json в папке отчетов)': '',
+            '; и при следующем запуске анализировать только новые и измененные строки, пока ЖП и настройки': '',
+            '; не изменились (при изменении ППТС пересчитываются строки, затронутые измененными строками ППТС).': '',
+            'incremental': '1',
+            '; catalog_chunk_rows - строк ТСУ в порции режима полного каталога (python main.py catalog).': '',
+            'catalog_chunk_rows': '2000',
+            '; scorer - реализация fuzz.ratio: auto (самая быстрая из установленных), rapidfuzz, fuzzywuzzy': '',
+            '; или python. Оценки у всех одинаковые (проверка: python -m src.scorers), разница только в скорости.': '',
+            'scorer': 'auto'
+        }
+
+        config['Sweep'] = {
+            '; Сетка для подбора порогов (python main.py sweep) - значения через запятую.': '',
+            '; Настройки, не указанные здесь или в --grid, берутся из [Settings].': '',
+            'fuzz_ratio_threshold': '50,60,70,80',
+            'min_matched_words': '1,2'
         }
 
         # --- Секции со структурированными правилами ---
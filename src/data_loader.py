@@ -8,6 +8,56 @@ import pandas as pd
 import os
 from typing import List, Dict, Any
 
+# Текстовые столбцы с повторяющимися значениями (вендор, 'local'/'general', статус, ответственный)
+# хранятся как category: каждое значение - одна строка на весь столбец плюс компактные коды.
+# Столбец переводится, только если уникальных значений не больше этой доли от числа строк.
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# Столбцы-кандидаты в category по таблицам (уникальные по смыслу CVE, ссылки и ID строк ППТС не переводятся)
+VULNERABILITY_CATEGORY_COLUMNS = ['cvss', 'product']
+PPTS_CATEGORY_COLUMNS = ['name', 'vendor', 'source']
+JOURNAL_CATEGORY_COLUMNS = ['responsible', 'publication', 'status', 'id_ppts', 'cvss', 'product']
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """Полный объем памяти таблицы, включая сами строки."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_dtypes(df: pd.DataFrame, category_columns: List[str], integer_columns: List[str] = ()) -> pd.DataFrame:
+    """
+    Уменьшает память таблицы без изменения значений:
+      - столбцы category_columns с повторяющимися значениями -> category;
+      - целочисленные столбцы integer_columns -> наименьший целый тип (int8/int16/int32).
+    Дробные числа не сужаются до float32: 7.1 превратился бы в 7.0999999 в отчете.
+    Объем до и после сохраняется в df.attrs['memory'] (байты) для отчета о памяти.
+    """
+    if df.empty:
+        return df
+    before = frame_memory_bytes(df)
+    for column in category_columns:
+        if column in df.columns and df[column].nunique() <= len(df) * CATEGORY_MAX_UNIQUE_RATIO:
+            df[column] = df[column].astype('category')
+    for column in integer_columns:
+        if column in df.columns and pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    df.attrs['memory'] = {'before': before, 'after': frame_memory_bytes(df)}
+    return df
+
+
+def memory_report(frames: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, float]]:
+    """Память таблиц до и после compact_dtypes в МБ: {'ppts': {'before': ..., 'after': ...}, ...}."""
+    report = {}
+    for name, df in frames.items():
+        memory = df.attrs.get('memory')
+        if memory:
+            report[name] = {key: round(value / (1024 * 1024), 2) for key, value in memory.items()}
+    return report
+
+
+def format_memory_report(report: Dict[str, Dict[str, float]]) -> str:
+    return ", ".join(f"{name} {m['before']:.2f} -> {m['after']:.2f} МБ" for name, m in report.items())
+
 
 def load_vulnerabilities(path: str) -> pd.DataFrame:
     """
@@ -20,7 +70,7 @@ def load_vulnerabilities(path: str) -> pd.DataFrame:
 
         df = pd.read_excel(path, usecols=required_cols, header=None, skiprows=1, names=col_names, sheet_name=0)
         print(f"Успешно загружен файл ТСУ: {path}")
-        return df
+        return compact_dtypes(df, VULNERABILITY_CATEGORY_COLUMNS, integer_columns=['id_num'])
     except FileNotFoundError:
         print(f"ОШИБКА: Файл ТСУ не найден по пути: {path}")
     except Exception as e:
@@ -69,7 +119,7 @@ def load_ppts(local_path: str, general_path: str) -> pd.DataFrame:
     combined_df.dropna(subset=['vendor', 'name'], how='all', inplace=True)
 
     print(f"ППТС объединены. Общее количество записей для анализа: {len(combined_df)}")
-    return combined_df
+    return compact_dtypes(combined_df, PPTS_CATEGORY_COLUMNS)
 
 
 def load_journal(path: str) -> pd.DataFrame:
@@ -85,7 +135,7 @@ def load_journal(path: str) -> pd.DataFrame:
         df = pd.read_excel(path, sheet_name=0, usecols=required_cols, header=None, skiprows=1, names=col_names)
 
         print(f"Успешно загружен Журнал Публикаций (с первого листа): {path}")
-        return df
+        return compact_dtypes(df, JOURNAL_CATEGORY_COLUMNS)
     except FileNotFoundError:
         print(f"ОШИБКА: Файл ЖП не найден по пути: {path}")
     except ValueError as e:
@@ -0,0 +1,247 @@
+# ==================================================================================
+# МОДУЛЬ 30: ПРОВЕРКА РАВНОЗНАЧНОСТИ УСКОРЕНИЙ
+# Режим python main.py verify - прогоняет одни и те же ТСУ/ППТС/ЖП (или синтетические
+# данные, --generate N) двумя путями и сравнивает то, что видит аналитик:
+#   - эталон: reference_engine - замороженная копия исходного алгоритма (свое чтение
+#     Excel, поиск CVE перебором ЖП, перебор ППТС с fuzzywuzzy, исходный каскад статусов);
+#   - рабочий путь: data_loader + pipeline.load_reference_data + analyze_vulnerabilities
+#     со всеми ускорениями из config.ini (файл индекса, match_workers, scorer и т.д.).
+# Рабочий путь проверяется в двух конфигурациях: 'shipped' - config.ini как есть, и
+# 'speed_only' - без функций, которые меняют результат намеренно (journal_learned,
+# decided_rows_matches = skip). Расхождения выводятся с конфигурацией и продуктом строки;
+# код завершения 1, если они есть хотя бы в одной - так проверку можно ставить перед выкаткой.
+# ==================================================================================
+
+import configparser
+import contextlib
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Сколько расхождений выводится в лог и попадает в сводку
+MAX_REPORTED_DIVERGENCES = 20
+
+COMPARED_FIELDS = ('status', 'id_ppts', 'journal', 'matches')
+
+# Настройки, которые меняют результат анализа, и их значения в конфигурации 'speed_only'
+SPEED_ONLY_OVERRIDES = (
+    ('Settings', 'journal_learned', '0'),
+    ('Performance', 'decided_rows_matches', 'deferred'),
+)
+
+
+def configurations(config: Any) -> Dict[str, Any]:
+    """
+    Конфигурации рабочего пути: 'shipped' - config как есть (с его значениями по умолчанию),
+    'speed_only' - копия без функций, которые меняют результат, а не скорость.
+    """
+    shipped = configparser.ConfigParser()
+    speed_only = configparser.ConfigParser()
+    for section in config.sections():
+        shipped[section] = dict(config.items(section, raw=True))
+        speed_only[section] = dict(config.items(section, raw=True))
+    for copy in (shipped, speed_only):
+        for section in ('Settings', 'Performance'):
+            if not copy.has_section(section):
+                copy.add_section(section)
+    for section, option, value in SPEED_ONLY_OVERRIDES:
+        speed_only.set(section, option, value)
+    return {'shipped': shipped, 'speed_only': speed_only}
+
+
+def _result_options(config: Any) -> Dict[str, str]:
+    return {option: config.get(section, option, fallback='') for section, option, _ in SPEED_ONLY_OVERRIDES}
+
+
+def _plain(value: Any) -> Any:
+    """Пустые ячейки (NaN) -> None, чтобы одинаковые значения из разных источников были равны."""
+    return None if value is None or value != value else value
+
+
+def _match_key(match: Dict[str, Any]) -> tuple:
+    return tuple(_plain(match[key]) for key in ('id_ppts', 'name', 'vendor', 'source', 'index',
+                                                'matched_words_count', 'avg_similarity',
+                                                'vendor_matched', 'product_matched'))
+
+
+def _journal_key(rows: List[Dict[str, Any]]) -> List[tuple]:
+    return [tuple(_plain(row.get(key)) for key in ('cve', 'status', 'id_ppts', 'product', 'responsible'))
+            for row in rows]
+
+
+def reference_rows(reference_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Поля COMPARED_FIELDS по результатам эталона (reference_engine.analyze)."""
+    return [{'status': item['final_status'], 'id_ppts': item['final_id'],
+             'journal': _journal_key(item['journal_matches']),
+             'matches': [_match_key(match) for match in item['ppts_matches']]}
+            for item in reference_results]
+
+
+def optimized_rows(all_results: List[Any]) -> List[Dict[str, Any]]:
+    """Те же поля по результатам analyze_vulnerabilities."""
+    return [{'status': item.final_status, 'id_ppts': item.final_id,
+             'journal': _journal_key(list(item.journal_matches)),
+             'matches': [_match_key(match.to_dict()) for match in item.ppts_matches]}
+            for item in all_results]
+
+
+def diff_rows(
+        records: List[Dict[str, Any]], reference: List[Dict[str, Any]], optimized: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Расхождения по строкам: номер строки ТСУ (с 1), id_num, CVE, продукт, список
+    различающихся полей и их значения в обоих путях.
+    """
+    divergences = []
+    for position, (record, expected, actual) in enumerate(zip(records, reference, optimized), start=1):
+        fields = [field for field in COMPARED_FIELDS if expected[field] != actual[field]]
+        if fields:
+            divergences.append({
+                'row': position, 'id_num': record.get('id_num'), 'cve': record.get('cve'),
+                'product': record.get('product'), 'fields': fields,
+                'reference': {field: expected[field] for field in fields},
+                'optimized': {field: actual[field] for field in fields},
+            })
+    if len(reference) != len(optimized):
+        divergences.append({'row': None, 'id_num': None, 'cve': None, 'product': None, 'fields': ['rows'],
+                            'reference': {'rows': len(reference)}, 'optimized': {'rows': len(optimized)}})
+    return divergences
+
+
+def _describe(divergence: Dict[str, Any]) -> str:
+    parts = []
+    for field in divergence['fields']:
+        expected, actual = divergence['reference'][field], divergence['optimized'][field]
+        if field == 'matches':
+            expected = [match[0] for match in expected]
+            actual = [match[0] for match in actual]
+        parts.append(f"{field}: эталон {expected!r}, ускоренный {actual!r}")
+    return f"[{divergence['configuration']}] строка {divergence['row']} '{divergence['product']}': " + "; ".join(parts)
+
+
+def verify(
+        paths: Dict[str, str], config: Any, limit: Optional[int] = None,
+        log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Сравнивает эталон с рабочим путем в конфигурациях 'shipped' и 'speed_only' на файлах paths.
+
+    Args:
+        limit: Проверять только первые limit строк ТСУ (эталон перебирает весь ППТС на каждую строку).
+
+    Returns:
+        Сводка: 'ok' (нет расхождений ни в одной конфигурации), 'counts', 'timings' (загрузка
+        и анализ эталоном), 'configurations' (по каждой: 'ok', 'options' - настройки, меняющие
+        результат, 'divergent_rows', 'timings', 'speedup'), 'scorers' и 'divergences' (первые
+        MAX_REPORTED_DIVERGENCES по всем конфигурациям, с полем 'configuration').
+    """
+    from src import data_loader, pipeline, reference_engine, scorers
+
+    summary: Dict[str, Any] = {'ok': False, 'counts': {}, 'timings': {}, 'configurations': {}, 'divergences': []}
+    if not all(paths.get(key) for key in ('vulnerabilities', 'ppts_local', 'ppts_general', 'journal')):
+        log("Ошибка: Укажите ТСУ, оба ППТС и ЖП.")
+        summary['error'] = 'missing_paths'
+        return summary
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        reference_vulns = reference_engine.load_vulnerabilities(paths['vulnerabilities'])
+        ppts_df = reference_engine.load_ppts(paths['ppts_local'], paths['ppts_general'])
+        journal_df = reference_engine.load_journal(paths['journal'])
+    if limit:
+        reference_vulns = reference_vulns.head(limit)
+    summary['timings']['load'] = time.perf_counter() - started
+    if reference_vulns.empty:
+        log("Ошибка: Таблица с уязвимостями пуста.")
+        summary['error'] = 'empty_vulnerabilities'
+        return summary
+    records = [row._asdict() for row in reference_vulns.itertuples()]
+
+    variants = configurations(config)
+    started = time.perf_counter()
+    expected = reference_rows(reference_engine.analyze(reference_vulns, ppts_df, journal_df, variants['shipped']))
+    summary['timings']['reference'] = time.perf_counter() - started
+
+    for name, variant in variants.items():
+        timings = {}
+        started = time.perf_counter()
+        vulns_df = data_loader.load_vulnerabilities(paths['vulnerabilities'])
+        if limit:
+            vulns_df = vulns_df.head(limit)
+        reference = pipeline.load_reference_data(paths, variant, log)
+        timings['load'] = time.perf_counter() - started
+        started = time.perf_counter()
+        all_results = pipeline.analyze_vulnerabilities(vulns_df, reference, variant,
+                                                       pipeline.parse_config_rules(variant))
+        timings['analyze'] = time.perf_counter() - started
+
+        divergences = [dict(divergence, configuration=name)
+                       for divergence in diff_rows(records, expected, optimized_rows(all_results))]
+        summary['configurations'][name] = {
+            'ok': not divergences, 'options': _result_options(variant), 'divergent_rows': len(divergences),
+            'timings': timings, 'speedup': round(summary['timings']['reference'] / timings['analyze'], 1)
+            if timings['analyze'] else None,
+        }
+        summary['divergences'].extend(divergences)
+
+    summary.update({
+        'ok': all(item['ok'] for item in summary['configurations'].values()),
+        'counts': {'vulnerabilities': len(records), 'ppts': len(ppts_df), 'journal': len(journal_df)},
+        'scorers': {'reference': 'fuzzywuzzy', 'optimized': scorers.active_name()},
+    })
+    reported = summary['divergences'][:MAX_REPORTED_DIVERGENCES]
+
+    log(f"Эталон: {summary['timings']['reference']:.2f} с на {len(records)} строк ТСУ.")
+    for name, item in summary['configurations'].items():
+        options = ", ".join(f"{option} = {value or 'по умолчанию'}" for option, value in item['options'].items())
+        verdict = "совпадает" if item['ok'] else f"расхождения в {item['divergent_rows']} строках"
+        log(f"  {name} ({options}): анализ {item['timings']['analyze']:.2f} с (загрузка и индексы "
+            f"{item['timings']['load']:.2f} с), ускорение x{item['speedup']}, {verdict}.")
+    for divergence in reported:
+        log("  Расхождение: " + _describe(divergence))
+    summary['divergences'] = reported
+    if summary['ok']:
+        log(f"Результаты совпадают по всем {len(records)} строкам ТСУ (статус, ID ППТС, ЖП, совпадения в ППТС).")
+    else:
+        log("Ошибка: рабочий путь расходится с исходным алгоритмом.")
+    return summary
+
+
+def verify_generated(
+        rows: int, config: Any, seed: int = 1, limit: Optional[int] = None,
+        log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """verify на синтетических данных (synthetic_data) из rows строк ТСУ во временной папке."""
+    from src import synthetic_data
+
+    with tempfile.TemporaryDirectory() as folder:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            paths = synthetic_data.write_dataset(folder, rows, seed=seed)
+        log(f"Синтетические данные: {rows} строк ТСУ (зерно {seed}).")
+        summary = verify(paths, config, limit, log)
+    summary['generated'] = {'rows': rows, 'seed': seed}
+    return summary
+
+
+if __name__ == '__main__':
+    checked = configparser.ConfigParser()
+    checked.read_dict({'Settings': {'min_word_length': '3', 'fuzz_ratio_threshold': '60', 'min_matched_words': '2',
+                                    'journal_learned': '1'},
+                       'Performance': {'ppts_index_file': '0', 'match_workers': '1'}})
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        result = verify_generated(150, checked, log=lambda message: None)
+    speed_only, shipped = result['configurations']['speed_only'], result['configurations']['shipped']
+    assert speed_only['ok'], result['divergences']
+    # journal_learned меняет результат намеренно - проверка должна это показать
+    assert not shipped['ok'] and not result['ok']
+    assert all(d['configuration'] == 'shipped' for d in result['divergences'])
+
+    records = [{'id_num': 1, 'cve': 'CVE-1', 'product': 'Apache - Tomcat'}]
+    same = {'status': '', 'id_ppts': '', 'journal': [], 'matches': [('ID-1',) + (None,) * 8]}
+    changed = dict(same, matches=[('ID-2',) + (None,) * 8])
+    found = [dict(d, configuration='shipped') for d in diff_rows(records, [same], [changed])]
+    assert [d['fields'] for d in found] == [['matches']] and 'Apache - Tomcat' in _describe(found[0])
+    print(f"Эталон и ускоренный путь без journal_learned совпадают на {result['counts']['vulnerabilities']} строках "
+          f"синтетических данных (ускорение x{speed_only['speedup']}), с journal_learned расходятся в "
+          f"{shipped['divergent_rows']} строках.")
@@ -3,17 +3,13 @@ from customtkinter import CTk, CTkFrame, CTkLabel, CTkEntry, CTkButton, CTkTabvi
 import tkinter
 import tkinter.filedialog as tkfd
 import threading
-import os
-from src import (
-    data_loader,
-    comparison_engine,
-    journal_sync,
-    status_logic,
-    report_generator,
-    config_handler,
-    journal_updater,
-    email_generator
-)
+# Здесь только легкие модули: pandas/openpyxl/fuzzywuzzy подгружаются
+# конвейером (src/pipeline.py) при первом запуске анализа или обновления.
+from src import config_handler, pipeline, startup_profile, results_view
+
+# Настройки, при изменении которых результаты пересчитываются без повторного сравнения
+WHATIF_SETTINGS_KEYS = ['min_word_length', 'prefix_threshold_short', 'prefix_threshold_medium',
+                        'prefix_threshold_long', 'fuzz_ratio_threshold', 'min_matched_words', 'index1_results_limit']
 
 
 class VulnerabilityAnalyzerApp(CTk):
@@ -28,7 +24,23 @@ class VulnerabilityAnalyzerApp(CTk):
         config_handler.create_default_config(self.base_path)
         self.config = config_handler.load_config(self.base_path)
 
+        # Результаты последнего анализа (all_results) для вкладки "Результаты"
+        self.last_summary = None
+        self.whatif_result = None
+        self.whatif_job = None
+        self.last_results = []
+        self.filtered_positions = []
+        self.results_page = 0
+
         self.create_ui()
+        # Профиль запуска выводим, когда окно уже отрисовано
+        self.after_idle(self.report_startup_profile)
+
+    def report_startup_profile(self):
+        startup_profile.mark_window_ready()
+        for line in startup_profile.format_startup_summary():
+            self.add_log(line)
+
     def create_ui(self):
         print("Создание UI...")
         # Создаём вкладки
@@ -38,10 +50,12 @@ class VulnerabilityAnalyzerApp(CTk):
         self.tabview.add("Файлы")
         self.tabview.add("Настройки")
         self.tabview.add("Анализ")
+        self.tabview.add("Результаты")
 
         self.create_files_tab()
         self.create_settings_tab()
         self.create_analysis_tab()
+        self.create_results_tab()
         print("UI создана")
 
     def create_files_tab(self):
@@ -76,13 +90,13 @@ class VulnerabilityAnalyzerApp(CTk):
         CTkLabel(frame, text="Ответственный:").grid(row=row, column=0, sticky="w", padx=5, pady=5)
         self.responsible_entry = CTkEntry(frame)
         self.responsible_entry.grid(row=row, column=1, padx=5, pady=5)
-        self.responsible_entry.insert(0, "Шейчук Я.И.")
+        self.responsible_entry.insert(0, pipeline.DEFAULT_RESPONSIBLE)
         row += 1
 
         CTkLabel(frame, text="Источник публикации:").grid(row=row, column=0, sticky="w", padx=5, pady=5)
         self.publication_entry = CTkEntry(frame)
         self.publication_entry.grid(row=row, column=1, padx=5, pady=5)
-        self.publication_entry.insert(0, "БДУ ФСТЭК")
+        self.publication_entry.insert(0, pipeline.DEFAULT_PUBLICATION)
 
         # Кнопка сохранения конфига
         save_btn = CTkButton(frame, text="Сохранить настройки", command=self.save_config)
@@ -111,6 +125,8 @@ class VulnerabilityAnalyzerApp(CTk):
             entry.grid(row=row, column=1, padx=5, pady=5)
             val = self.config.getint('Settings', key, fallback=default)
             entry.insert(0, str(val))
+            # При каждом изменении порога показываем, как изменятся статусы последнего анализа
+            entry.bind("<KeyRelease>", lambda _: self.schedule_whatif_preview())
             self.entries[key] = entry
             row += 1
 
@@ -118,6 +134,13 @@ class VulnerabilityAnalyzerApp(CTk):
         save_btn = CTkButton(frame, text="Сохранить настройки", command=self.save_config)
         save_btn.grid(row=row, column=1, pady=10)
 
+        # Пересчет последнего анализа при новых порогах (без повторного сравнения)
+        self.whatif_label = CTkLabel(frame, text="", justify="left", anchor="w")
+        self.whatif_label.grid(row=row + 1, column=0, columnspan=2, sticky="w", padx=5, pady=5)
+        self.whatif_apply_btn = CTkButton(frame, text="Применить к результатам", command=self.apply_whatif,
+                                          state="disabled")
+        self.whatif_apply_btn.grid(row=row + 2, column=1, pady=5)
+
     def create_analysis_tab(self):
         tab = self.tabview.tab("Анализ")
         frame = CTkFrame(tab)
@@ -140,6 +163,153 @@ class VulnerabilityAnalyzerApp(CTk):
         self.log_box = CTkTextbox(frame, width=750, height=300)
         self.log_box.pack(pady=10, padx=10)
 
+    def create_results_tab(self):
+        tab = self.tabview.tab("Результаты")
+        frame = CTkFrame(tab)
+        frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # Фильтры и навигация по страницам
+        filter_frame = CTkFrame(frame)
+        filter_frame.pack(fill="x", pady=5)
+        CTkLabel(filter_frame, text="Статус:").pack(side="left", padx=5)
+        self.status_filter = CTkOptionMenu(filter_frame, values=results_view.STATUS_FILTER_VALUES,
+                                           command=lambda _: self.apply_results_filter())
+        self.status_filter.pack(side="left", padx=5)
+        CTkLabel(filter_frame, text="Индекс:").pack(side="left", padx=5)
+        self.index_filter = CTkOptionMenu(filter_frame, values=results_view.INDEX_FILTER_VALUES, width=120,
+                                          command=lambda _: self.apply_results_filter())
+        self.index_filter.pack(side="left", padx=5)
+
+        CTkButton(filter_frame, text=">", width=30, command=lambda: self.show_results_page(self.results_page + 1)
+                  ).pack(side="right", padx=5)
+        self.page_label = CTkLabel(filter_frame, text="Нет данных")
+        self.page_label.pack(side="right", padx=5)
+        CTkButton(filter_frame, text="<", width=30, command=lambda: self.show_results_page(self.results_page - 1)
+                  ).pack(side="right", padx=5)
+
+        # Таблица: фиксированный набор строк-виджетов, которые переиспользуются при листании,
+        # поэтому отрисовывается только видимая страница, сколько бы строк ни было в анализе
+        table = ctk.CTkScrollableFrame(frame, height=260)
+        table.pack(fill="both", expand=True, pady=5)
+        for col, (title, width) in enumerate(results_view.COLUMNS):
+            CTkLabel(table, text=title, width=width, anchor="w", font=ctk.CTkFont(weight="bold")
+                     ).grid(row=0, column=col, sticky="w", padx=2)
+
+        self.result_rows = []
+        for row_idx in range(results_view.PAGE_SIZE):
+            cells = []
+            for col, (_, width) in enumerate(results_view.COLUMNS):
+                label = CTkLabel(table, text="", width=width, anchor="w")
+                label.grid(row=row_idx + 1, column=col, sticky="w", padx=2)
+                cells.append(label)
+            details_btn = CTkButton(table, text="▸", width=30,
+                                    command=lambda r=row_idx: self.show_result_details(r))
+            details_btn.grid(row=row_idx + 1, column=len(results_view.COLUMNS), padx=2)
+            self.result_rows.append((cells, details_btn))
+
+        # Подробности по выбранной строке формируются только по нажатию "▸"
+        self.details_box = CTkTextbox(frame, height=140)
+        self.details_box.pack(fill="x", pady=5)
+
+        self.show_results_page(0)
+
+    def set_results(self, results):
+        self.last_results = results
+        self.apply_results_filter()
+
+    def apply_results_filter(self):
+        self.filtered_positions = results_view.filter_results(
+            self.last_results, self.status_filter.get(), self.index_filter.get()
+        )
+        self.show_results_page(0)
+
+    def show_results_page(self, page):
+        start, end, pages = results_view.page_bounds(len(self.filtered_positions), page)
+        self.results_page = min(max(page, 0), pages - 1)
+        visible = self.filtered_positions[start:end]
+
+        for row_idx, (cells, details_btn) in enumerate(self.result_rows):
+            if row_idx < len(visible):
+                values = results_view.format_row(self.last_results[visible[row_idx]])
+                for cell, value in zip(cells, values):
+                    cell.configure(text=value)
+                details_btn.grid()
+            else:
+                for cell in cells:
+                    cell.configure(text="")
+                details_btn.grid_remove()
+
+        if self.filtered_positions:
+            self.page_label.configure(text=f"Стр. {self.results_page + 1} из {pages} "
+                                           f"(строк: {len(self.filtered_positions)} из {len(self.last_results)})")
+        else:
+            self.page_label.configure(text="Нет данных")
+
+    def show_result_details(self, row_idx):
+        start, _, _ = results_view.page_bounds(len(self.filtered_positions), self.results_page)
+        position = self.filtered_positions[start + row_idx]
+        self.details_box.delete("1.0", "end")
+        self.details_box.insert("end", results_view.format_details(self.last_results[position]))
+
+    def _settings_from_entries(self):
+        return {key: int(self.entries[key].get()) for key in WHATIF_SETTINGS_KEYS}
+
+    def schedule_whatif_preview(self):
+        # Откладываем пересчет, пока пользователь печатает
+        if self.whatif_job is not None:
+            self.after_cancel(self.whatif_job)
+        self.whatif_job = self.after(300, self.preview_whatif)
+
+    def preview_whatif(self):
+        self.whatif_job = None
+        self.whatif_result = None
+        self.whatif_apply_btn.configure(state="disabled")
+        if not self.last_results:
+            self.whatif_label.configure(text="")
+            return
+        try:
+            settings = self._settings_from_entries()
+        except ValueError:
+            self.whatif_label.configure(text="Некорректное значение порога.")
+            return
+
+        rescored = pipeline.rescore_results(self.last_results, settings, pipeline.parse_config_rules(self.config))
+        if rescored is None:
+            self.whatif_label.configure(text="Для этих настроек нужен повторный анализ "
+                                             "(изменена длина слова или порог ниже сохраненного).")
+            return
+
+        self.whatif_result = rescored
+        lines = [f"Изменится статусов: {rescored['changed']} из {len(self.last_results)}"]
+        for (old, new), count in sorted(rescored['transitions'].items(), key=lambda kv: -kv[1]):
+            lines.append(f"  {old or results_view.MANUAL_LABEL} -> {new or results_view.MANUAL_LABEL}: {count}")
+        self.whatif_label.configure(text="\n".join(lines))
+        self.whatif_apply_btn.configure(state="normal")
+
+    def apply_whatif(self):
+        if self.whatif_result is None or self.last_summary is None:
+            return
+        results = self.whatif_result['results']
+        self.set_results(results)
+        self.whatif_apply_btn.configure(state="disabled")
+        self.add_log(f"Результаты пересчитаны при новых порогах (изменено статусов: {self.whatif_result['changed']}).")
+
+        # Отчет перезаписываем в фоне, пересчет не требует повторного сравнения
+        summary = self.last_summary
+        config = config_handler.load_config(self.base_path)
+        for key, value in self._settings_from_entries().items():
+            config.set('Settings', key, str(value))
+
+        def write_report():
+            from src import report_generator
+            report_generator.generate_report(
+                processed_data_list=results, output_path=summary['output_path'], config=config,
+                responsible_person=summary['responsible'], publication_source=summary['publication']
+            )
+            self.add_log(f"Отчет обновлен: {summary['output_path']}")
+
+        threading.Thread(target=write_report, daemon=True).start()
+
     def browse_file(self, key, entry):
         if key == "output_folder":
             path = tkfd.askdirectory()
@@ -155,7 +325,7 @@ class VulnerabilityAnalyzerApp(CTk):
 
     def save_config(self):
         # Сохраняем пути
-        for key in ["vulnerabilities", "ppts_local", "ppts_general", "journal", "output_folder"]:
+        for key in pipeline.PATH_KEYS:
             self.config.set('Paths', key, self.entries[key].get())
         # Сохраняем настройки
         for key in ['min_word_length', 'prefix_threshold_short', 'prefix_threshold_medium',
@@ -175,89 +345,21 @@ class VulnerabilityAnalyzerApp(CTk):
         self.add_log("Запуск анализа...")
         threading.Thread(target=self.run_analysis, daemon=True).start()
 
+    def _current_paths(self):
+        return {key: self.entries[key].get() for key in pipeline.PATH_KEYS}
+
     def run_analysis(self):
         try:
-            # Получаем пути
-            vulns_path = self.entries["vulnerabilities"].get()
-            local_ppts = self.entries["ppts_local"].get()
-            general_ppts = self.entries["ppts_general"].get()
-            journal_path = self.entries["journal"].get()
-            output_folder = self.entries["output_folder"].get()
-            responsible = self.responsible_entry.get()
-            publication = self.publication_entry.get()
-
-            if not all([vulns_path, local_ppts, general_ppts, journal_path, output_folder]):
-                self.add_log("Ошибка: Все пути должны быть указаны.")
-                return
-
-            output_path = os.path.join(output_folder, "res_tmp_report.xlsx")
-
-            self.progress.set(0.1)
-            self.add_log("Загрузка конфигурационных правил...")
-            parsed_config_rules = {
-                'DA': config_handler.parse_structured_config_section(self.config, 'DA'),
-                'NOT': config_handler.parse_structured_config_section(self.config, 'NOT'),
-                'LINUX': config_handler.parse_structured_config_section(self.config, 'LINUX'),
-                'Uslovno': config_handler.parse_structured_config_section(self.config, 'Uslovno'),
-            }
-
-            self.progress.set(0.2)
-            self.add_log("Загрузка данных...")
-            vulns_df = data_loader.load_vulnerabilities(vulns_path)
-            ppts_df = data_loader.load_ppts(local_ppts, general_ppts)
-            journal_df = data_loader.load_journal(journal_path)
-            if vulns_df.empty:
-                self.add_log("Ошибка: Таблица с уязвимостями пуста.")
-                return
-
-            self.progress.set(0.3)
-            all_results = []
-            total = len(vulns_df)
-            self.add_log(f"Начинаем анализ {total} уязвимостей...")
-            for i, row in enumerate(vulns_df.itertuples()):
-                vuln_data = {'product': row.product, 'cve': row.cve}
-                journal_matches = journal_sync.find_cve_in_journal(vuln_data['cve'], journal_df)
-                ppts_matches = comparison_engine.find_best_matches(vuln_data['product'], ppts_df, self.config)
-
-                min_word_len = self.config.getint('Settings', 'min_word_length', fallback=3)
-                vendor_str, product_str = comparison_engine._split_vuln_product(vuln_data['product'])
-                vuln_words_set = comparison_engine._prepare_words(f"{vendor_str} {product_str}", min_word_len)
-
-                status_info = status_logic.determine_status(
-                    vuln_data=vuln_data, journal_matches=journal_matches,
-                    ppts_matches=ppts_matches, config_rules=parsed_config_rules
-                )
-
-                status_source = ''
-                matched_rule = None
-                if status_info['status'] == 'ПОВТОР':
-                    status_source = 'journal'
-                elif status_info['status'] != '' and status_info['status'] != 'НЕТ':
-                    status_source = 'config'
-                elif ppts_matches and status_info['status'] == '':
-                    status_source = 'ppts_match'
-                elif status_info['status'] == 'НЕТ':
-                    status_source = 'no_match'
-
-                all_results.append({
-                    'source_data': row._asdict(),
-                    'final_status': status_info['status'], 'final_id': status_info['id_ppts'],
-                    'journal_matches': journal_matches, 'ppts_matches': ppts_matches,
-                    'vuln_words_set': vuln_words_set, 'status_source': status_source, 'matched_rule': matched_rule
-                })
-
-                self.progress.set(0.3 + (i / total) * 0.5)
-
-            self.progress.set(0.9)
-            self.add_log("Генерация отчета...")
-            report_generator.generate_report(
-                processed_data_list=all_results, output_path=output_path, config=self.config,
-                responsible_person=responsible, publication_source=publication
+            summary = pipeline.run_analysis(
+                paths=self._current_paths(), config=self.config,
+                responsible=self.responsible_entry.get(), publication=self.publication_entry.get(),
+                progress=self.progress.set, log=self.add_log, retain_raw_scores=True
             )
-
-            self.progress.set(1.0)
-            self.add_log(f"Анализ завершен. Отчет сохранен в {output_path}")
-
+            if summary['ok']:
+                summary.update(responsible=self.responsible_entry.get(), publication=self.publication_entry.get())
+                self.last_summary = summary
+                # Обновляем вкладку "Результаты" из главного потока окна
+                self.after(0, self.set_results, summary['results'])
         except Exception as e:
             self.add_log(f"Ошибка во время анализа: {str(e)}")
         finally:
@@ -271,46 +373,10 @@ class VulnerabilityAnalyzerApp(CTk):
 
     def run_update(self):
         try:
-            journal_path = self.entries["journal"].get()
-            output_folder = self.entries["output_folder"].get()
-            responsible = self.responsible_entry.get()
-            publication = self.publication_entry.get()
-            verified_report_path = os.path.join(output_folder, "res_tmp_report.xlsx")
-            email_path = os.path.join(output_folder, "email_preview.html")
-
-            if not os.path.exists(verified_report_path) or not os.path.exists(journal_path):
-                self.add_log("Ошибка: Не найдены необходимые файлы.")
-                return
-
-            self.progress.set(0.1)
-            self.add_log("Обновление журнала публикаций...")
-            added_data_df = journal_updater.update_journal_file(journal_path, verified_report_path)
-
-            if added_data_df is not None and not added_data_df.empty:
-                self.progress.set(0.6)
-                self.add_log("Генерация письма...")
-                new_journal_name = journal_updater.generate_new_journal_name(journal_path)
-                date_str = " ".join(new_journal_name.split(" ")[-1:]).split(".")[0]
-                if "(" in date_str:
-                    date_str = date_str.split(" (")[0]
-
-                total_vulns_count = len(data_loader.load_vulnerabilities(self.entries["vulnerabilities"].get()))
-
-                email_parts = email_generator.generate_email_parts(
-                    added_vulnerabilities_df=added_data_df,
-                    publication_source=publication,
-                    journal_date_str=date_str,
-                    total_vulns_count=total_vulns_count
-                )
-
-                with open(email_path, "w", encoding="utf-8") as f:
-                    f.write(email_parts['body_html'])
-
-                self.progress.set(1.0)
-                self.add_log(f"Журнал обновлен. Письмо сохранено в {email_path}")
-            else:
-                self.add_log("Нет данных для обновления.")
-
+            pipeline.run_update(
+                paths=self._current_paths(), publication=self.publication_entry.get(),
+                progress=self.progress.set, log=self.add_log, config=self.config
+            )
         except Exception as e:
             self.add_log(f"Ошибка во время обновления: {str(e)}")
         finally:
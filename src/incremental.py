@@ -0,0 +1,190 @@
+# ==================================================================================
+# МОДУЛЬ 23: ИНКРЕМЕНТАЛЬНЫЙ ПОВТОРНЫЙ АНАЛИЗ
+# После анализа результаты по строкам ТСУ сохраняются в analysis_state.json (папка
+# отчетов) вместе с "отпечатком" справочников: содержимое ЖП, [Settings], правила
+# конфига и decided_rows_matches, - и ключом версии ППТС (index_file.content_key).
+# При следующем запуске с тем же отпечатком строки, у которых совпадает ключ
+# (id_num, cve, product), берутся из сохраненного состояния, а через ЖП/ППТС проходят
+# только новые и измененные строки.
+# Если изменились ЖП или настройки - отпечаток другой и пересчитывается все. Если
+# изменился ППТС, а индекс ППТС обновлен по изменениям из той версии, с которой
+# сохранено состояние (ppts_update), пересчитываются только строки, затронутые
+# измененными строками ППТС; иначе - тоже все.
+# Включается настройкой [Performance] incremental (по умолчанию включено).
+# ==================================================================================
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+STATE_FILE_NAME = "analysis_state.json"
+
+# Версия формата состояния и логики решений: при ее смене сохраненные строки не используются
+STATE_VERSION = 3
+
+
+def enabled(config: Any) -> bool:
+    return config is not None and config.getboolean('Performance', 'incremental', fallback=True)
+
+
+def state_path(output_folder: str) -> str:
+    return os.path.join(output_folder, STATE_FILE_NAME)
+
+
+def reference_fingerprint(paths: Dict[str, str], config: Any, config_rules: Dict[str, List[Dict]]) -> str:
+    """Отпечаток всего, от чего зависит решение по строке, кроме самой строки ТСУ."""
+    from src import index_file, pipeline
+
+    parts = {
+        'version': STATE_VERSION,
+        'journal': index_file.file_digest(paths.get('journal', '')),
+        'settings': dict(config.items('Settings')) if config.has_section('Settings') else {},
+        'rules': config_rules,
+        'decided_rows_matches': pipeline.decided_rows_matches(config),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+                          .encode('utf-8')).hexdigest()
+
+
+def ppts_key(paths: Dict[str, str], config: Any) -> str:
+    """Ключ версии ППТС - тот же, что у файла индекса ППТС."""
+    from src import index_file
+
+    return index_file.content_key(paths, config.getint('Settings', 'min_word_length', fallback=3))
+
+
+def row_key(record: Dict[str, Any]) -> str:
+    """Ключ строки ТСУ: (id_num, cve, product)."""
+    return json.dumps([record.get('id_num'), record.get('cve'), record.get('product')],
+                      ensure_ascii=False, default=str)
+
+
+def load_previous(
+        path: str, fingerprint: str, retain_raw_scores: bool, current_ppts_key: str,
+        ppts_changes: Optional[Dict[str, Any]] = None, floor: int = 0
+) -> Dict[str, Any]:
+    """
+    Сохраненные результаты предыдущего запуска.
+    Пусто, если состояния нет, оно повреждено или отпечаток справочников другой.
+    При retain_raw_scores строки без "сырых" оценок не используются (их нужно пересчитать).
+    Если состояние сохранено с другой версией ППТС, строки используются, только когда
+    ppts_changes - изменения именно от той версии; затронутые ими строки отбрасываются
+    (ppts_update.stale_keys, floor - порог сбора оценок).
+
+    Returns:
+        Словарь 'rows' (ключ строки -> ResultRecord) и 'stale_rows' - сколько строк
+        отброшено из-за изменения ППТС.
+    """
+    from src import ppts_update
+    from src.result_records import ResultRecord
+
+    loaded: Dict[str, Any] = {'rows': {}, 'stale_rows': 0}
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return loaded
+    if state.get('fingerprint') != fingerprint:
+        return loaded
+    ppts_changed = state.get('ppts_key') != current_ppts_key
+    if ppts_changed and (not ppts_changes or not state.get('ppts_key') or
+                         ppts_changes.get('base_key') != state.get('ppts_key')):
+        return loaded
+
+    previous = {}
+    for key, data in state.get('rows', {}).items():
+        if retain_raw_scores and data.get('raw_scores') is None:
+            continue
+        try:
+            previous[key] = ResultRecord.from_dict(data)
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    if ppts_changed:
+        stale = ppts_update.stale_keys(previous, ppts_changes, floor)
+        for key in stale:
+            del previous[key]
+        loaded['stale_rows'] = len(stale)
+        # Номера строк ППТС в "сырых" оценках - по новому индексу (строки в них не удалялись)
+        old_to_new = ppts_changes['old_to_new']
+        for item in previous.values():
+            if item.raw_scores is not None:
+                item.raw_scores = dict(item.raw_scores, rows=[
+                    (old_to_new[row_id],) + tuple(rest) for row_id, *rest in item.raw_scores['rows']
+                ])
+    loaded['rows'] = previous
+    return loaded
+
+
+def save_state(path: str, fingerprint: str, all_results: List[Any], current_ppts_key: Optional[str] = None):
+    """Сохраняет результаты запуска атомарно (через временный файл)."""
+    rows = {}
+    for item in all_results:
+        rows[row_key({'id_num': item.id_num, 'cve': item.cve, 'product': item.product})] = item.to_dict()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': STATE_VERSION, 'fingerprint': fingerprint, 'ppts_key': current_ppts_key, 'rows': rows},
+                  f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+def reuse_result(previous: Any, record: Dict[str, Any], retain_raw_scores: bool) -> Any:
+    """
+    Сохраненный результат для строки с тем же ключом. Прочие поля строки (CVSS, ссылка)
+    могли измениться - они берутся из новой строки, на решение они не влияют.
+    """
+    from src.result_records import ResultRecord, SOURCE_FIELDS
+
+    return ResultRecord(
+        *(record.get(field) for field in SOURCE_FIELDS),
+        previous.final_status, previous.final_id, previous.status_source, previous.matched_rule,
+        previous.journal_matches, previous.ppts_matches, previous.raw_scores if retain_raw_scores else None,
+        previous.learned_match
+    )
+
+
+def split_records(
+        records: List[Dict[str, Any]], previous: Dict[str, Any], retain_raw_scores: bool
+) -> Dict[str, Any]:
+    """
+    Делит строки ТСУ на уже известные и требующие анализа.
+
+    Returns:
+        Словарь 'reused' (позиция -> ResultRecord) и 'pending' (позиции строк для анализа).
+    """
+    reused: Dict[int, Any] = {}
+    pending: List[int] = []
+    for pos, record in enumerate(records):
+        cached = previous.get(row_key(record))
+        if cached is None:
+            pending.append(pos)
+        else:
+            reused[pos] = reuse_result(cached, record, retain_raw_scores)
+    return {'reused': reused, 'pending': pending}
+
+
+def merge_results(total: int, reused: Dict[int, Any], pending: List[int], computed: List[Any]) -> List[Any]:
+    """Собирает all_results в порядке строк ТСУ из сохраненных и пересчитанных результатов."""
+    merged: List[Optional[Any]] = [None] * total
+    for pos, item in reused.items():
+        merged[pos] = item
+    for pos, item in zip(pending, computed):
+        merged[pos] = item
+    return merged
+
+
+if __name__ == '__main__':
+    from src.result_records import ResultRecord
+
+    def make(id_num, cve, product, status):
+        return ResultRecord(id_num, cve, '5.0', product, 'url', status, '', 'journal', None, (), (), None, None)
+
+    previous = {row_key({'id_num': 1, 'cve': 'CVE-1', 'product': 'A'}): make(1, 'CVE-1', 'A', 'ПОВТОР')}
+    records = [{'id_num': 1, 'cve': 'CVE-1', 'cvss': '9.8', 'product': 'A', 'source_url': 'new'},
+               {'id_num': 2, 'cve': 'CVE-2', 'cvss': '1.0', 'product': 'B', 'source_url': 'u'}]
+    split = split_records(records, previous, retain_raw_scores=False)
+    assert split['pending'] == [1] and split['reused'][0].cvss == '9.8' and split['reused'][0].final_status == 'ПОВТОР'
+    merged = merge_results(2, split['reused'], split['pending'], [make(2, 'CVE-2', 'B', 'НЕТ')])
+    assert [item.final_status for item in merged] == ['ПОВТОР', 'НЕТ']
+    print("Разделение строк ТСУ на сохраненные и новые работает.")
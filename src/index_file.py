@@ -0,0 +1,271 @@
+# ==================================================================================
+# МОДУЛЬ 22: ФАЙЛ ИНДЕКСА ППТС
+# Индекс ППТС строится один раз на версию файлов ППТС и сохраняется в кэш пользователя
+# (%LOCALAPPDATA%\vuln_analyzer\ppts_index, ~/.cache/vuln_analyzer/ppts_index) или в
+# [Performance] ppts_index_folder:
+#   ppts_index_<источник>_<ключ>.bin = заголовок (MAGIC, длина, JSON с раскладкой) + плоские
+#   массивы shared_index.pack_index (словарь, списки строк по словам, поля строк).
+# Источник - хэш путей к файлам ППТС, ключ - SHA-256 их содержимого, min_word_length и версии
+# формата: изменение ППТС или длины слова дает новый файл, а прежний файл того же источника
+# удаляется. Файлы других источников (другие ППТС, другие аналитики в общей папке) не трогаются.
+# При запуске файл открывается через mmap: чтение Excel и разбор ППТС пропускаются,
+# страницы файла подгружает ОС при первом обращении и держит в своем кэше.
+# Включается настройкой [Performance] ppts_index_file (по умолчанию включено).
+# ==================================================================================
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Any, Callable, Dict, List, Optional
+
+FORMAT_VERSION = 1
+MAGIC = b'VAPPTSIX'
+FILE_PREFIX = "ppts_index_"
+FILE_SUFFIX = ".bin"
+CACHE_FOLDER = os.path.join("vuln_analyzer", "ppts_index")
+
+# Длина заголовка записывается 4 байтами после MAGIC; массивы начинаются с кратного 8 смещения
+_HEADER_LENGTH = struct.Struct('<I')
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def enabled(config: Any) -> bool:
+    return config is not None and config.getboolean('Performance', 'ppts_index_file', fallback=True)
+
+
+def file_digest(path: str) -> str:
+    if not path or not os.path.exists(path):
+        return 'missing'
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_key(paths: Dict[str, str], min_word_length: int) -> str:
+    """Ключ версии индекса: содержимое обоих ППТС, длина слова и версия формата."""
+    parts = [f"v{FORMAT_VERSION}", f"mwl{min_word_length}",
+             file_digest(paths.get('ppts_local', '')), file_digest(paths.get('ppts_general', ''))]
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:32]
+
+
+def source_tag(paths: Dict[str, str]) -> str:
+    """Источник индекса: хэш путей к локальному и общему ППТС (не их содержимого)."""
+    parts = [os.path.normcase(os.path.abspath(paths[name])) if paths.get(name) else ''
+             for name in ('ppts_local', 'ppts_general')]
+    return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def default_folder() -> str:
+    """Кэш пользователя: %LOCALAPPDATA% в Windows, иначе $XDG_CACHE_HOME или ~/.cache."""
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, CACHE_FOLDER)
+
+
+def index_folder(config: Any) -> str:
+    """[Performance] ppts_index_folder или кэш пользователя (папку ППТС делят несколько аналитиков)."""
+    folder = config.get('Performance', 'ppts_index_folder', fallback='') if config is not None else ''
+    return folder or default_folder()
+
+
+def index_path(folder: str, source: str, key: str) -> str:
+    return os.path.join(folder, f"{FILE_PREFIX}{source}_{key}{FILE_SUFFIX}")
+
+
+def _split_name(name: str) -> Optional[tuple]:
+    """(источник, ключ) из имени файла индекса или None для чужих файлов."""
+    if not (name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)):
+        return None
+    source, separator, key = name[len(FILE_PREFIX):-len(FILE_SUFFIX)].partition('_')
+    return (source, key) if separator and key else None
+
+
+def write_index_file(path: str, ppts_index: Dict[str, Any], key: str):
+    """
+    Записывает индекс атомарно (через временный файл) и удаляет индексы прежних версий
+    тех же файлов ППТС (тот же источник, другой ключ).
+    """
+    from src import shared_index
+
+    arrays = shared_index.pack_index(ppts_index)
+    layout, size = shared_index.array_layout(arrays)
+    header = json.dumps({
+        'version': FORMAT_VERSION, 'key': key, 'min_word_length': ppts_index['min_word_length'],
+        'rows': len(ppts_index['rows']), 'words': len(ppts_index['words']), 'layout': layout,
+    }).encode('utf-8')
+    data_offset = -(-(len(MAGIC) + _HEADER_LENGTH.size + len(header)) // shared_index.ALIGNMENT) * \
+        shared_index.ALIGNMENT
+
+    buffer = bytearray(data_offset + size)
+    buffer[:len(MAGIC)] = MAGIC
+    _HEADER_LENGTH.pack_into(buffer, len(MAGIC), len(header))
+    buffer[len(MAGIC) + _HEADER_LENGTH.size:len(MAGIC) + _HEADER_LENGTH.size + len(header)] = header
+    shared_index.write_arrays(memoryview(buffer)[data_offset:], arrays, layout)
+
+    folder, name = os.path.split(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # Временный файл с PID: два процесса с одним индексом не пишут в один .tmp
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buffer)
+    os.replace(tmp_path, path)
+
+    for other in _same_source_files(folder, path_source(path)):
+        if other != path:
+            try:
+                os.remove(other)
+            except OSError:
+                pass
+
+
+def _same_source_files(folder: str, source: str) -> List[str]:
+    try:
+        names = os.listdir(folder or '.')
+    except OSError:
+        return []
+    return [os.path.join(folder, name) for name in names if (_split_name(name) or ('',))[0] == source]
+
+
+def previous_index_path(folder: str, source: str, key: str) -> Optional[str]:
+    """Файл индекса прежней версии тех же ППТС (самый новый из других ключей источника) или None."""
+    current = index_path(folder, source, key)
+    paths = [path for path in _same_source_files(folder, source) if path != current]
+    try:
+        return max(paths, key=os.path.getmtime) if paths else None
+    except OSError:
+        return None
+
+
+def path_source(path: str) -> str:
+    return (_split_name(os.path.basename(path)) or ('', ''))[0]
+
+
+def path_key(path: str) -> str:
+    return (_split_name(os.path.basename(path)) or ('', ''))[1]
+
+
+def open_index_file(path: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    Открывает файл индекса через mmap. Возвращает индекс в формате comparison_engine
+    (shared_index.index_from_arrays) или None, если файла нет или он от другой версии ППТС.
+    """
+    from src import shared_index
+
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    prefix = len(MAGIC) + _HEADER_LENGTH.size
+    if len(mapped) < prefix or mapped[:len(MAGIC)] != MAGIC:
+        mapped.close()
+        return None
+    header_length, = _HEADER_LENGTH.unpack_from(mapped, len(MAGIC))
+    try:
+        header = json.loads(mapped[prefix:prefix + header_length].decode('utf-8'))
+    except ValueError:
+        mapped.close()
+        return None
+    if header.get('version') != FORMAT_VERSION or header.get('key') != key:
+        mapped.close()
+        return None
+
+    data_offset = -(-(prefix + header_length) // shared_index.ALIGNMENT) * shared_index.ALIGNMENT
+    # Массивы - представления поверх mmap: файл остается открытым, пока жив индекс
+    arrays = shared_index.read_arrays(memoryview(mapped)[data_offset:], header['layout'])
+    return shared_index.index_from_arrays(arrays, header['min_word_length'])
+
+
+def load_cached_index(
+        paths: Dict[str, str], config: Any, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Ищет файл индекса для текущих ППТС.
+
+    Returns:
+        Словарь 'ppts_index' (индекс или None, если его нужно построить), 'path' - куда
+        сохранить построенный индекс, 'key' - ключ версии ППТС и, если индекса текущей версии
+        нет, 'base_index' / 'base_key' - индекс прежней версии ППТС (для ppts_update) или None.
+    """
+    min_word_length = config.getint('Settings', 'min_word_length', fallback=3)
+    result = {'ppts_index': None, 'path': None, 'key': None, 'base_index': None, 'base_key': None}
+    try:
+        key = content_key(paths, min_word_length)
+    except OSError as e:
+        log(f"Не удалось прочитать файлы ППТС для ключа индекса: {e}")
+        return result
+    folder = index_folder(config)
+    source = source_tag(paths)
+    path = index_path(folder, source, key)
+    result.update(path=path, key=key)
+    try:
+        result['ppts_index'] = open_index_file(path, key)
+    except (OSError, ValueError) as e:
+        log(f"Не удалось открыть файл индекса ППТС {path}: {e}")
+    if result['ppts_index'] is not None:
+        log(f"Индекс ППТС открыт из файла: {path} (строк: {len(result['ppts_index']['rows'])})")
+        return result
+
+    base_path = previous_index_path(folder, source, key)
+    if base_path is not None:
+        try:
+            result['base_index'] = open_index_file(base_path, path_key(base_path))
+        except (OSError, ValueError):
+            result['base_index'] = None
+        if result['base_index'] is not None:
+            result['base_key'] = path_key(base_path)
+    return result
+
+
+def save_index(path: str, ppts_index: Dict[str, Any], log: Callable[[str], None] = print):
+    """Сохраняет построенный индекс; ошибка записи (например, папка только для чтения) не критична."""
+    try:
+        write_index_file(path, ppts_index, path_key(path))
+        log(f"Индекс ППТС сохранен для следующих запусков: {path}")
+    except OSError as e:
+        log(f"Не удалось сохранить файл индекса ППТС {path}: {e}")
+
+
+if __name__ == '__main__':
+    import tempfile
+    import pandas as pd
+    from src import comparison_engine
+
+    mock_ppts_df = pd.DataFrame({
+        'id_ppts': ['ID-001', 1002, float('nan')],
+        'name': ['Windows 11 Pro', 'Office 2021', 'Tomcat Server'],
+        'vendor': ['Microsoft', 'Microsoft', 'Apache'],
+        'source': ['local', 'local', 'general'],
+    })
+    index = comparison_engine.build_ppts_index(mock_ppts_df, 3)
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = source_tag({'ppts_local': 'local.xlsx', 'ppts_general': 'general.xlsx'})
+        other_source = source_tag({'ppts_local': 'other.xlsx'})
+        old_path, foreign_path = index_path(folder, source, 'old'), index_path(folder, other_source, 'old')
+        write_index_file(old_path, index, 'old')
+        write_index_file(foreign_path, index, 'old')
+        path = index_path(folder, source, 'test')
+        assert previous_index_path(folder, source, 'test') == old_path
+        write_index_file(path, index, 'test')
+        assert not os.path.exists(old_path), "прежний индекс тех же ППТС должен удаляться"
+        assert os.path.exists(foreign_path), "индекс других ППТС не должен удаляться"
+        assert path_source(path) == source and path_key(path) == 'test'
+
+        assert open_index_file(path, 'other') is None, "индекс другой версии ППТС не должен открываться"
+        opened = open_index_file(path, 'test')
+        assert opened['words'] == index['words']
+        assert list(opened['postings']) == index['postings']
+        assert opened['rows'][1] == index['rows'][1] and opened['rows'][0] is opened['rows'][0]
+        for product in ['Microsoft Windows 11', 'Apache Tomcat']:
+            expected = comparison_engine.collect_raw_scores(product, index, 60)['rows']
+            actual = comparison_engine.collect_raw_scores(product, opened, 60)['rows']
+            assert [(r[0], r[2], r[3]) for r in actual] == [(r[0], r[2], r[3]) for r in expected]
+        del opened
+        print(f"Файл индекса: {os.path.getsize(path)} байт, поиск по нему совпадает с индексом в памяти.")
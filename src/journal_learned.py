@@ -0,0 +1,137 @@
+# ==================================================================================
+# МОДУЛЬ 25: РЕШЕНИЯ ЖП ПО ПРОДУКТУ
+# ЖП хранит проверенные человеком решения (статус и ID ППТС) для тысяч строк.
+# Индекс "нормализованный продукт -> решение" строится по load_journal один раз
+# вместе с индексом CVE. Продукт нормализуется как в движке сравнения
+# (_split_vuln_product + _prepare_words): регистр, знаки препинания, номера версий
+# и порядок слов не важны. Строка ТСУ, продукт которой уже встречался в ЖП, получает
+# это решение как кандидата сразу, без сопоставления с ППТС:
+#   - точно: тот же набор слов;
+#   - похоже: набор слов отличается одним словом, и fuzz.ratio этих слов не ниже
+#     [Settings] journal_learned_ratio (опечатки, окончания).
+# Кандидат показывается на листе "Детальный анализ"; статус строки, как и при
+# совпадениях в ППТС, остается за ручным анализом.
+# Меняет результат, который видит аналитик: строка с кандидатом не сопоставляется с ППТС
+# и не получает статус по обычным правилам конфига и НЕТ.
+# Включается настройкой [Settings] journal_learned (по умолчанию выключено).
+# ==================================================================================
+
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+# Статусы ЖП, которые являются решением по продукту (ПОВТОР - решение по CVE, а не по продукту)
+LEARNED_STATUSES = ('ДА', 'НЕТ', 'УСЛОВНО', 'Linux')
+
+MATCH_EXACT = 'exact'
+MATCH_NEAR = 'near'
+
+DEFAULT_NEAR_RATIO = 90
+
+
+def enabled(config: Any) -> bool:
+    return config is not None and config.getboolean('Settings', 'journal_learned', fallback=False)
+
+
+def near_ratio(config: Any) -> int:
+    return config.getint('Settings', 'journal_learned_ratio', fallback=DEFAULT_NEAR_RATIO) \
+        if config is not None else DEFAULT_NEAR_RATIO
+
+
+def product_key(product: Any, min_word_length: int) -> FrozenSet[str]:
+    """Нормализованный продукт: слова вендора и продукта без цифр и знаков препинания."""
+    from src import comparison_engine
+
+    if not isinstance(product, str):
+        return frozenset()
+    vendor_str, product_str = comparison_engine._split_vuln_product(product)
+    return frozenset(comparison_engine._prepare_words(f"{vendor_str} {product_str}", min_word_length))
+
+
+def _clean(value: Any) -> Any:
+    """Пустые ячейки ЖП (NaN) -> '', чтобы одинаковые решения группировались."""
+    return '' if value is None or value != value else value
+
+
+def build_learned_index(journal_df: Any, min_word_length: int) -> Dict[str, Any]:
+    """
+    Строит индекс решений ЖП по продукту.
+
+    Returns:
+        Словарь 'min_word_length', 'decisions' (набор слов -> решение: самое частое для этого
+        продукта, при равенстве - более позднее) и 'near' (набор слов без одного слова ->
+        [(убранное слово, набор слов), ...] для поиска похожих продуктов).
+    """
+    votes: Dict[FrozenSet[str], Dict[Tuple[Any, Any], Dict[str, Any]]] = {}
+    if not journal_df.empty and {'status', 'product'} <= set(journal_df.columns):
+        for position, record in enumerate(journal_df.to_dict('records')):
+            status = record.get('status')
+            if not isinstance(status, str) or status.strip() not in LEARNED_STATUSES:
+                continue
+            key = product_key(record.get('product'), min_word_length)
+            if not key:
+                continue
+            decision = (status.strip(), _clean(record.get('id_ppts')))
+            vote = votes.setdefault(key, {}).setdefault(decision, {'count': 0})
+            vote.update(count=vote['count'] + 1, position=position, record=record)
+
+    decisions: Dict[FrozenSet[str], Dict[str, Any]] = {}
+    near: Dict[FrozenSet[str], List[Tuple[str, FrozenSet[str]]]] = {}
+    for key, key_votes in votes.items():
+        (status, id_ppts), vote = max(key_votes.items(), key=lambda item: (item[1]['count'], item[1]['position']))
+        record = vote['record']
+        decisions[key] = {
+            'status': status, 'id_ppts': id_ppts, 'product': _clean(record.get('product')),
+            'responsible': _clean(record.get('responsible')), 'cve': _clean(record.get('cve')),
+            'count': vote['count'], 'total': sum(v['count'] for v in key_votes.values()),
+        }
+        if len(key) > 1:
+            for word in key:
+                near.setdefault(key - {word}, []).append((word, key))
+    return {'min_word_length': min_word_length, 'decisions': decisions, 'near': near}
+
+
+def lookup(product: Any, learned_index: Dict[str, Any], ratio: int = DEFAULT_NEAR_RATIO) -> Optional[Dict[str, Any]]:
+    """
+    Решение ЖП для продукта строки ТСУ или None.
+    Возвращает копию решения с ключом 'match': MATCH_EXACT или MATCH_NEAR.
+    """
+    key = product_key(product, learned_index['min_word_length'])
+    if not key:
+        return None
+    decision = learned_index['decisions'].get(key)
+    if decision is not None:
+        return dict(decision, match=MATCH_EXACT)
+    if len(key) < 2 or not learned_index['near']:
+        return None
+
+    from src import scorers
+
+    best_score, best_key = 0, None
+    for word in sorted(key):
+        for journal_word, journal_key in learned_index['near'].get(key - {word}, ()):
+            score = scorers.ratio(word, journal_word)
+            if score >= ratio and score > best_score:
+                best_score, best_key = score, journal_key
+    if best_key is None:
+        return None
+    return dict(learned_index['decisions'][best_key], match=MATCH_NEAR)
+
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    mock_journal_df = pd.DataFrame({
+        'responsible': ['Иванов И.И.', 'Петров П.П.', 'Иванов И.И.', 'Петров П.П.'],
+        'status': ['ДА', 'ДА', 'ПОВТОР', 'НЕТ'],
+        'id_ppts': ['COM-7303', 'COM-7303', 'COM-7303', float('nan')],
+        'cve': ['CVE-2021-1', 'CVE-2022-2', 'CVE-2022-2', 'CVE-2023-3'],
+        'product': ['Google Inc, Kubernetes 1.20', 'Google Inc - Kubernetes 1.25', 'Google Kubernetes',
+                    'Apache Software Foundation - Tomcat Server 9'],
+    })
+    index = build_learned_index(mock_journal_df, 3)
+    hit = lookup('Google Inc - Kubernetes 1.30', index)
+    assert hit['match'] == MATCH_EXACT and hit['id_ppts'] == 'COM-7303' and hit['count'] == 2
+    hit = lookup('Apache Software Foundation - Tomcat Servers 10', index)
+    assert hit['match'] == MATCH_NEAR and hit['status'] == 'НЕТ' and hit['id_ppts'] == ''
+    assert lookup('Apache Software Foundation - HTTP Server', index) is None
+    assert lookup('Google Kubernetes', index) is None, "решение ПОВТОР не относится к продукту"
+    print(f"Решений ЖП по продукту: {len(index['decisions'])}, поиск точных и похожих продуктов работает.")
@@ -8,18 +8,43 @@ import pandas as pd
 from typing import List, Dict, Any
 
 
-def find_cve_in_journal(cve_id: str, journal_df: pd.DataFrame) -> List[Dict[str, Any]]:
+def build_cve_index(journal_df: pd.DataFrame) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Строит словарь "очищенный CVE -> строки ЖП", чтобы не сканировать весь ЖП
+    для каждой уязвимости. Порядок строк внутри CVE совпадает с порядком в ЖП.
+    """
+    cve_index: Dict[str, List[Dict[str, Any]]] = {}
+    if journal_df.empty or 'cve' not in journal_df.columns:
+        return cve_index
+
+    for record in journal_df.to_dict('records'):
+        cve = record['cve']
+        # Как и в find_cve_in_journal, нестроковые значения (пустые ячейки) не участвуют
+        if isinstance(cve, str):
+            cve_index.setdefault(cve.strip(), []).append(record)
+    return cve_index
+
+
+def find_cve_in_journal(
+        cve_id: str, journal_df: pd.DataFrame, cve_index: Dict[str, List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
     """
     Ищет точное совпадение CVE в DataFrame'е Журнала Публикаций.
 
     Args:
         cve_id (str): Идентификатор CVE для поиска (например, 'CVE-2024-45283').
         journal_df (pd.DataFrame): DataFrame с данными ЖП, загруженный data_loader'ом.
+        cve_index: Необязательный индекс из build_cve_index (ускоряет поиск).
 
     Returns:
         Список словарей, где каждый словарь представляет найденную в ЖП строку.
         Возвращает пустой список, если совпадений не найдено или входные данные некорректны.
     """
+    if cve_index is not None:
+        if not isinstance(cve_id, str):
+            return []
+        return list(cve_index.get(cve_id.strip(), []))
+
     # Проверка на корректность входных данных
     if journal_df.empty or 'cve' not in journal_df.columns or not isinstance(cve_id, str):
         return []
@@ -89,6 +114,12 @@ if __name__ == '__main__':
 
     # Ожидаемый вывод: 0 совпадений.
 
+    # --- Тест 3а: Поиск через индекс дает тот же результат ---
+    mock_cve_index = build_cve_index(mock_journal_df)
+    for cve in [cve_to_find_1, cve_to_find_2, cve_to_find_3]:
+        assert find_cve_in_journal(cve, mock_journal_df, mock_cve_index) == find_cve_in_journal(cve, mock_journal_df)
+    print("\nПоиск через индекс совпадает с поиском по DataFrame.")
+
     # --- Тест 4: Ищем в пустом DataFrame ---
     print("\nИщем в пустом DataFrame...")
     matches4 = find_cve_in_journal(cve_to_find_1, pd.DataFrame())
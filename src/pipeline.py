@@ -0,0 +1,748 @@
+# ==================================================================================
+# МОДУЛЬ 9: КОНВЕЙЕР АНАЛИЗА
+# Содержит весь сценарий "анализ ТСУ" и "обновление ЖП" без привязки к интерфейсу.
+# Используется и окном (gui.py), и командной строкой (cli.py), поэтому
+# НЕ должен импортировать customtkinter/tkinter.
+# Тяжелые модули (pandas, openpyxl, fuzzywuzzy) импортируются внутри функций,
+# при первом запуске анализа/обновления, чтобы не замедлять открытие окна.
+# ==================================================================================
+
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src import config_handler
+
+# Имена выходных файлов, которые ожидают и окно, и командная строка
+REPORT_FILE_NAME = "res_tmp_report.xlsx"
+EMAIL_FILE_NAME = "email_preview.html"
+
+# Замеры этапов: <имя отчета>_timings.json рядом с отчетом и отдельный файл для обновления ЖП
+TIMINGS_FILE_SUFFIX = "_timings.json"
+UPDATE_TIMINGS_FILE_NAME = "journal_update_timings.json"
+
+# Значения по умолчанию для полей "Ответственный" и "Источник публикации"
+DEFAULT_RESPONSIBLE = "Шейчук Я.И."
+DEFAULT_PUBLICATION = "БДУ ФСТЭК"
+
+PATH_KEYS = ["vulnerabilities", "ppts_local", "ppts_general", "journal", "output_folder"]
+
+
+def _noop_progress(value: float):
+    pass
+
+
+def parse_config_rules(config: Any) -> Dict[str, List[Dict]]:
+    """Разбирает все секции с правилами ([DA], [NOT], [LINUX], [Uslovno])."""
+    return {
+        'DA': config_handler.parse_structured_config_section(config, 'DA'),
+        'NOT': config_handler.parse_structured_config_section(config, 'NOT'),
+        'LINUX': config_handler.parse_structured_config_section(config, 'LINUX'),
+        'Uslovno': config_handler.parse_structured_config_section(config, 'Uslovno'),
+    }
+
+
+def load_reference_frames(
+        paths: Dict[str, str], config: Any = None, log: Callable[[str], None] = print,
+        base_reference: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Этап загрузки справочников: ППТС (локальный + общий) и ЖП.
+    Если для текущих файлов ППТС уже есть файл индекса (index_file), ППТС не читается:
+    в 'ppts_index' - индекс из файла, а 'ppts_df' равен None.
+    Иначе в 'ppts_base' - индекс прежней версии ППТС для обновления по изменениям (ppts_update):
+    из base_reference (служба держит его в памяти вместе с кэшем оценок слов) или из файла индекса.
+    """
+    from src import data_loader, index_file, ppts_update
+
+    started = time.perf_counter()
+    cached = index_file.load_cached_index(paths, config, log) if index_file.enabled(config) else \
+        {'ppts_index': None, 'path': None, 'key': None, 'base_index': None, 'base_key': None}
+    ppts_df = None
+    ppts_base = None
+    if cached['ppts_index'] is None:
+        ppts_df = data_loader.load_ppts(paths['ppts_local'], paths['ppts_general'])
+        if ppts_update.enabled(config):
+            if base_reference is not None and base_reference.get('ppts_index') is not None:
+                ppts_base = {'ppts_index': base_reference['ppts_index'], 'key': base_reference.get('ppts_key')}
+            elif cached['base_index'] is not None:
+                ppts_base = {'ppts_index': cached['base_index'], 'key': cached['base_key']}
+    ppts_seconds = time.perf_counter() - started
+    journal_df = data_loader.load_journal(paths['journal'])
+    return {
+        'ppts_df': ppts_df,
+        'journal_df': journal_df,
+        'ppts_index': cached['ppts_index'],
+        'ppts_index_path': cached['path'],
+        'ppts_key': cached['key'],
+        'ppts_base': ppts_base,
+        # Время загрузки по файлам (для метрик); оба ППТС читаются одним вызовом
+        'load_seconds': {'ppts': ppts_seconds, 'journal': time.perf_counter() - started - ppts_seconds},
+    }
+
+
+def ppts_row_count(reference: Dict[str, Any]) -> int:
+    """Строк ППТС в справочниках (ppts_df может не загружаться, если индекс открыт из файла)."""
+    if reference.get('ppts_df') is not None:
+        return len(reference['ppts_df'])
+    return len(reference['ppts_index']['rows']) if reference.get('ppts_index') is not None else 0
+
+
+def build_reference_indexes(
+        frames: Dict[str, Any], config: Any, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Этап построения индексов: словарь ППТС для движка сравнения, индекс CVE по ЖП и
+    решения ЖП по продукту (journal_learned).
+    Если есть индекс прежней версии ППТС (frames['ppts_base']), он обновляется по изменившимся
+    строкам, иначе строится заново. Индекс сохраняется в файл (frames['ppts_index_path'])
+    для следующих запусков.
+    """
+    from src import comparison_engine, index_file, journal_learned, journal_sync, ppts_update, scorers
+
+    scorers.configure(config, log)
+    min_word_len = config.getint('Settings', 'min_word_length', fallback=3)
+    ppts_index = frames.get('ppts_index')
+    ppts_changes = None
+    if ppts_index is None:
+        base = frames.get('ppts_base')
+        if base is not None and base['ppts_index']['min_word_length'] == min_word_len and not frames['ppts_df'].empty:
+            updated = ppts_update.update_index(base['ppts_index'], frames['ppts_df'])
+            ppts_index = updated['ppts_index']
+            ppts_changes = dict(updated['changes'], base_key=base['key'], key=frames.get('ppts_key'))
+            log(f"Индекс ППТС обновлен по изменениям: строк добавлено/изменено {len(ppts_changes['added_rows'])}, "
+                f"удалено {len(ppts_changes['removed_rows'])}, новых слов {ppts_changes['new_words']} "
+                f"({ppts_changes['seconds'] * 1000:.0f} мс).")
+        else:
+            ppts_index = comparison_engine.build_ppts_index(frames['ppts_df'], min_word_len)
+        if frames.get('ppts_index_path') and not frames['ppts_df'].empty:
+            index_file.save_index(frames['ppts_index_path'], ppts_index, log)
+    return {
+        'ppts_df': frames['ppts_df'],
+        'journal_df': frames['journal_df'],
+        'ppts_index': ppts_index,
+        'ppts_key': frames.get('ppts_key'),
+        'ppts_changes': ppts_changes,
+        'cve_index': journal_sync.build_cve_index(frames['journal_df']),
+        'learned_index': journal_learned.build_learned_index(frames['journal_df'], min_word_len)
+        if journal_learned.enabled(config) else None,
+    }
+
+
+def load_reference_data(
+        paths: Dict[str, str], config: Any, log: Callable[[str], None] = print,
+        base_reference: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Загружает ППТС и ЖП и строит по ним индексы для сопоставления.
+    Результат можно переиспользовать между запусками (так делает служба analysis_service);
+    при перезагрузке прежний результат передается как base_reference.
+
+    Returns:
+        Словарь 'ppts_df' (None, если индекс ППТС открыт из файла), 'journal_df', 'ppts_index', 'ppts_key'
+        (ключ версии ППТС index_file), 'ppts_changes' (изменения ППТС, если индекс обновлен по ним),
+        'cve_index' и 'learned_index'.
+    """
+    return build_reference_indexes(load_reference_frames(paths, config, log, base_reference), config, log)
+
+
+def _build_result_item(
+        source_data: Dict[str, Any], journal_matches: List, ppts_matches: List,
+        config_rules: Dict[str, List[Dict]], raw_scores: Optional[Dict[str, Any]] = None,
+        learned_match: Optional[Dict[str, Any]] = None
+) -> Any:
+    """Принимает решение по статусу и собирает одну запись all_results (result_records.ResultRecord)."""
+    from src import status_logic
+    from src.result_records import ResultRecord, SOURCE_FIELDS
+
+    vuln_data = {'product': source_data['product'], 'cve': source_data['cve']}
+    status_info = status_logic.determine_status(
+        vuln_data=vuln_data, journal_matches=journal_matches,
+        ppts_matches=ppts_matches, config_rules=config_rules, learned_match=learned_match
+    )
+
+    status_source = ''
+    matched_rule = None
+    if status_info['status'] == 'ПОВТОР':
+        status_source = 'journal'
+    elif status_info['status'] != '' and status_info['status'] != 'НЕТ':
+        status_source = 'config'
+    elif ppts_matches and status_info['status'] == '':
+        status_source = 'ppts_match'
+    elif learned_match and status_info['status'] == '':
+        status_source = 'journal_learned'
+    elif status_info['status'] == 'НЕТ':
+        status_source = 'no_match'
+
+    return ResultRecord(
+        *(source_data.get(field) for field in SOURCE_FIELDS),
+        status_info['status'], status_info['id_ppts'], status_source, matched_rule,
+        tuple(journal_matches), tuple(ppts_matches), raw_scores, learned_match
+    )
+
+
+def _stage_progress(progress: Callable[[float], None], start: float, span: float, total: int):
+    """Прогресс внутри этапа: от start до start + span по мере обработки total строк."""
+    return lambda i: progress(start + (i / total) * span)
+
+
+def check_journal(
+        records: List[Dict[str, Any]], reference: Dict[str, Any],
+        progress: Callable[[int], None] = _noop_progress
+) -> List[List[Dict]]:
+    """Этап проверки ЖП: записи журнала с тем же CVE для каждой строки ТСУ."""
+    from src import journal_sync
+
+    journal_df, cve_index = reference['journal_df'], reference['cve_index']
+    found = []
+    for i, record in enumerate(records):
+        found.append(journal_sync.find_cve_in_journal(record['cve'], journal_df, cve_index))
+        progress(i)
+    return found
+
+
+def match_products(
+        records: List[Dict[str, Any]], reference: Dict[str, Any], config: Any,
+        retain_raw_scores: bool = False, progress: Callable[[int], None] = _noop_progress
+) -> List[Tuple[List[Any], Optional[Dict[str, Any]]]]:
+    """
+    Этап сопоставления с ППТС. При [Performance] match_workers > 1 "сырые" оценки собираются
+    в нескольких процессах (shared_index.parallel_raw_scores или reference['match_pool'] -
+    shared_index.MatchPool, если исполнители уже запущены).
+
+    Returns:
+        Для каждой строки ТСУ: (совпадения в ППТС - список PptsMatch, "сырые" оценки или None).
+    """
+    from src import comparison_engine, shared_index
+
+    settings = comparison_engine._load_settings(config)
+    ppts_index = reference['ppts_index']
+    if ppts_index['min_word_length'] != settings['min_word_length']:
+        if reference['ppts_df'] is None:
+            raise ValueError("Индекс ППТС открыт из файла для другой min_word_length, а ppts_df не загружен")
+        ppts_index = comparison_engine.build_ppts_index(reference['ppts_df'], settings['min_word_length'])
+    # Для пересчета при других порогах оценки собираются с запасом (от RESCORE_RATIO_FLOOR)
+    floor = settings['fuzz_ratio_threshold']
+    if retain_raw_scores:
+        floor = min(floor, comparison_engine.RESCORE_RATIO_FLOOR)
+
+    workers = shared_index.worker_count(config)
+    match_pool = reference.get('match_pool')
+    if match_pool is not None and match_pool.ppts_index is ppts_index and records:
+        # Уже запущенные исполнители (режим полного каталога) - без запуска процессов на каждую порцию
+        all_raw_scores = match_pool.raw_scores([record['product'] for record in records], floor, progress)
+        progress = _noop_progress
+    elif workers > 1 and len(records) >= shared_index.PARALLEL_MIN_ROWS:
+        # Исполнители читают индекс ППТС из общей памяти, а не получают копию ppts_df
+        all_raw_scores = shared_index.parallel_raw_scores(
+            [record['product'] for record in records], ppts_index, floor, workers, progress
+        )
+        progress = _noop_progress
+    else:
+        all_raw_scores = (comparison_engine.collect_raw_scores(record['product'], ppts_index, floor)
+                          for record in records)
+
+    matched = []
+    for i, raw_scores in enumerate(all_raw_scores):
+        ppts_matches = comparison_engine.rank_raw_scores_compact(raw_scores, settings)
+        matched.append((ppts_matches, raw_scores if retain_raw_scores else None))
+        progress(i)
+    return matched
+
+
+def decide_statuses(
+        records: List[Dict[str, Any]], journal_found: List[List[Dict]],
+        matched: List[Tuple[List[Any], Optional[Dict[str, Any]]]],
+        config_rules: Dict[str, List[Dict]], learned: Optional[List[Optional[Dict[str, Any]]]] = None
+) -> List[Any]:
+    """Этап принятия решений: статус по каждой строке и сборка all_results."""
+    learned = learned or [None] * len(records)
+    return [
+        _build_result_item(record, journal_matches, ppts_matches, config_rules, raw_scores, learned_match)
+        for record, journal_matches, (ppts_matches, raw_scores), learned_match
+        in zip(records, journal_found, matched, learned)
+    ]
+
+
+def learned_decisions(
+        records: List[Dict[str, Any]], reference: Dict[str, Any], config: Any
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Этап решений ЖП по продукту: для каждой строки ТСУ - решение ЖП по тому же продукту или None.
+    Строки с решением не сопоставляются с ППТС ([Settings] journal_learned = 1 - включить).
+    """
+    from src import journal_learned
+
+    if not journal_learned.enabled(config):
+        return [None] * len(records)
+    learned_index = reference.get('learned_index')
+    min_word_length = config.getint('Settings', 'min_word_length', fallback=3)
+    if learned_index is None or learned_index['min_word_length'] != min_word_length:
+        learned_index = journal_learned.build_learned_index(reference['journal_df'], min_word_length)
+    ratio = journal_learned.near_ratio(config)
+    return [journal_learned.lookup(record['product'], learned_index, ratio) for record in records]
+
+
+DECIDED_MATCHES_DEFERRED = 'deferred'
+DECIDED_MATCHES_SKIP = 'skip'
+
+
+def decided_rows_matches(config: Any) -> str:
+    """
+    [Performance] decided_rows_matches - что делать с совпадениями в ППТС для строк, статус которых
+    уже решили ЖП или правило priority=1: 'deferred' - сопоставить после всех остальных строк
+    (только для листа 'Детальный анализ'), 'skip' - не сопоставлять вовсе.
+    """
+    value = config.get('Performance', 'decided_rows_matches', fallback=DECIDED_MATCHES_DEFERRED) \
+        if config is not None else DECIDED_MATCHES_DEFERRED
+    return DECIDED_MATCHES_SKIP if value.strip().lower() == DECIDED_MATCHES_SKIP else DECIDED_MATCHES_DEFERRED
+
+
+def analyze_vulnerabilities(
+        vulns_df: Any, reference: Dict[str, Any], config: Any,
+        config_rules: Dict[str, List[Dict]],
+        progress: Callable[[float], None] = _noop_progress,
+        retain_raw_scores: bool = False,
+        recorder: Optional[Any] = None,
+        matching_report: Optional[Dict[str, Any]] = None,
+        previous: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Прогоняет строки ТСУ через этапы: проверка ЖП -> ранние решения -> решения ЖП по продукту ->
+    сопоставление с ППТС -> статусы.
+    Сопоставление с ППТС (самый дорогой этап) выполняется только для строк, которые не решили
+    ЖП и правила priority=1; для решенных строк - отдельным этапом в конце или никогда
+    (см. decided_rows_matches). Строки, продукт которых уже решен в ЖП (journal_learned),
+    не сопоставляются вовсе.
+
+    Args:
+        reference: Результат load_reference_data.
+        retain_raw_scores: Сохранить в каждой записи "сырые" оценки движка ('raw_scores'),
+            чтобы потом пересчитать результат при других порогах без повторного сравнения
+            (см. rescore_results).
+        recorder: run_stages.StageRecorder для замеров этапов (по умолчанию - свой, без вывода).
+        matching_report: Если передан, в него записывается, сколько строк решено без сопоставления.
+        previous: Результаты прошлого запуска (incremental.load_previous): строки ТСУ с тем же
+            ключом (id_num, cve, product) берутся оттуда и через этапы не проходят.
+
+    Returns:
+        all_results - список result_records.ResultRecord (его читают report_generator и results_view).
+    """
+    from src import incremental, run_stages, status_logic
+
+    recorder = recorder or run_stages.StageRecorder()
+    all_records = [row._asdict() for row in vulns_df.itertuples()]
+    split = incremental.split_records(all_records, previous or {}, retain_raw_scores)
+    records = [all_records[i] for i in split['pending']]
+    total = len(records)
+
+    with recorder.stage('journal', total):
+        journal_found = check_journal(records, reference, _stage_progress(progress, 0.3, 0.05, total))
+    with recorder.stage('precheck', total):
+        early = [status_logic.decide_before_matching(record, journal_matches, config_rules)
+                 for record, journal_matches in zip(records, journal_found)]
+    with recorder.stage('learned', total):
+        # Строкам, найденным в ЖП по CVE, кандидат не нужен: их строки ЖП уже показаны в отчете
+        without_journal = [i for i in range(total) if not journal_found[i]]
+        learned = [None] * total
+        for i, decision in zip(without_journal, learned_decisions([records[i] for i in without_journal],
+                                                                  reference, config)):
+            learned[i] = decision
+    # Строки с решением ЖП по продукту получают кандидата оттуда и с ППТС не сопоставляются
+    pending = [i for i, decision in enumerate(early) if decision is None and learned[i] is None]
+    decided = [i for i, decision in enumerate(early) if decision is not None and learned[i] is None]
+
+    matched: List[Any] = [((), None)] * total
+    with recorder.stage('match', len(pending)):
+        for i, result in zip(pending, match_products([records[i] for i in pending], reference, config,
+                                                     retain_raw_scores,
+                                                     _stage_progress(progress, 0.35, 0.4, len(pending)))):
+            matched[i] = result
+
+    mode = decided_rows_matches(config)
+    if decided and mode == DECIDED_MATCHES_DEFERRED:
+        # Статусы этих строк уже известны, совпадения нужны только для показа в отчете
+        with recorder.stage('match_deferred', len(decided)):
+            for i, result in zip(decided, match_products([records[i] for i in decided], reference, config,
+                                                         retain_raw_scores)):
+                matched[i] = result
+
+    with recorder.stage('status', total):
+        all_results = decide_statuses(records, journal_found, matched, config_rules, learned)
+    progress(0.8)
+
+    if matching_report is not None:
+        early_decided = [i for i, decision in enumerate(early) if decision is not None]
+        matching_report.update({
+            'reused_rows': len(split['reused']),
+            'decided_before_matching': len(early_decided),
+            'decided_by_journal': sum(1 for i in early_decided if journal_found[i]),
+            'learned_rows': sum(1 for i, decision in enumerate(early) if decision is None and learned[i]),
+            'matched_rows': len(pending),
+            'decided_rows_matches': mode,
+        })
+    if not split['reused']:
+        return all_results
+    return incremental.merge_results(len(all_records), split['reused'], split['pending'], all_results)
+
+
+def rescore_results(
+        all_results: List[Any], settings: Dict[str, int], config_rules: Dict[str, List[Dict]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Пересчитывает совпадения и статусы при новых порогах по сохраненным "сырым" оценкам,
+    без единого вызова fuzz.ratio.
+
+    Returns:
+        Словарь 'results' (новый all_results), 'changed' (сколько статусов изменится) и
+        'transitions' ({(старый, новый): количество}), либо None, если пересчет невозможен
+        (нет сохраненных оценок, изменилась min_word_length или порог ниже сохраненного).
+    """
+    from src import comparison_engine
+    from src.result_records import SOURCE_FIELDS
+
+    new_results = []
+    transitions: Dict[tuple, int] = {}
+    from src import status_logic
+
+    for item in all_results:
+        raw_scores = item.raw_scores
+        if raw_scores is None and (item.learned_match is not None or status_logic.decide_before_matching(
+                {'product': item.product}, item.journal_matches, config_rules)):
+            # Решено ЖП, правилом priority=1 (decided_rows_matches = skip) или решением ЖП по продукту
+            # без сопоставления: пороги не влияют
+            new_results.append(item)
+            continue
+        if (raw_scores is None or raw_scores['min_word_length'] != settings['min_word_length']
+                or settings['fuzz_ratio_threshold'] < raw_scores['floor']):
+            return None
+
+        ppts_matches = comparison_engine.rank_raw_scores_compact(raw_scores, settings)
+        new_item = _build_result_item(
+            {field: getattr(item, field) for field in SOURCE_FIELDS}, item.journal_matches, ppts_matches,
+            config_rules, raw_scores
+        )
+        new_results.append(new_item)
+
+        if new_item.final_status != item.final_status:
+            key = (item.final_status, new_item.final_status)
+            transitions[key] = transitions.get(key, 0) + 1
+
+    return {'results': new_results, 'changed': sum(transitions.values()), 'transitions': transitions}
+
+
+def count_statuses(all_results: List[Any]) -> Dict[str, int]:
+    """Считает количество строк по каждому итоговому статусу ('' - ручной анализ)."""
+    counts: Dict[str, int] = {}
+    for item in all_results:
+        status = item.final_status
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def run_analysis(
+        paths: Dict[str, str], config: Any,
+        responsible: str = DEFAULT_RESPONSIBLE, publication: str = DEFAULT_PUBLICATION,
+        progress: Callable[[float], None] = _noop_progress,
+        log: Callable[[str], None] = print,
+        reference: Optional[Dict[str, Any]] = None,
+        use_service: bool = True,
+        output_path: Optional[str] = None,
+        retain_raw_scores: bool = False
+) -> Dict[str, Any]:
+    """
+    Полный сценарий анализа по этапам: загрузка -> индексы -> проверка ЖП ->
+    сопоставление с ППТС -> статусы -> отчет (замеры каждого этапа - в 'stages').
+
+    Args:
+        paths: Словарь путей с ключами из PATH_KEYS.
+        config: Загруженный объект конфигурации.
+        reference: Уже загруженные ППТС/ЖП (load_reference_data). Если не переданы -
+            анализ выполняет запущенная служба (см. analysis_service), а без нее - загружаем сами.
+        use_service: Разрешить передачу анализа запущенной службе.
+        output_path: Путь отчета (по умолчанию res_tmp_report.xlsx в папке отчетов).
+        retain_raw_scores: Сохранить "сырые" оценки движка для rescore_results.
+
+    Returns:
+        Сводка запуска: 'ok', 'output_path', 'counts', 'timings' (сек.), 'stages' (замеры этапов)
+        и 'results'.
+    """
+    summary: Dict[str, Any] = {'ok': False, 'output_path': None, 'counts': {}, 'timings': {}, 'results': []}
+    started = time.perf_counter()
+
+    from src import comparison_engine, data_loader, report_generator, run_metrics, run_stages
+    summary['timings']['imports'] = time.perf_counter() - started
+
+    if not all(paths.get(key) for key in PATH_KEYS):
+        log("Ошибка: Все пути должны быть указаны.")
+        summary['error'] = 'missing_paths'
+        return summary
+
+    output_path = output_path or os.path.join(paths['output_folder'], REPORT_FILE_NAME)
+
+    if reference is None and use_service:
+        from src import analysis_service
+        remote_summary = analysis_service.try_remote_analysis(
+            paths, config, responsible, publication, log, retain_raw_scores
+        )
+        if remote_summary is not None:
+            progress(1.0)
+            return remote_summary
+
+    recorder = run_stages.StageRecorder(run_stages.profile_prefix(config, paths['output_folder'], 'analysis'))
+    if recorder.profile_prefix:
+        log("Профилирование включено (cProfile + tracemalloc), анализ будет медленнее обычного.")
+
+    progress(0.1)
+    log("Загрузка конфигурационных правил...")
+    config_rules = parse_config_rules(config)
+
+    progress(0.2)
+    log("Загрузка данных...")
+    with recorder.stage('load') as record:
+        stage_start = time.perf_counter()
+        vulns_df = data_loader.load_vulnerabilities(paths['vulnerabilities'])
+        load_seconds = {'vulnerabilities': time.perf_counter() - stage_start}
+        record['rows'] = len(vulns_df)
+        if reference is None:
+            frames = load_reference_frames(paths, config, log)
+            load_seconds.update(frames['load_seconds'])
+            record['rows'] += ppts_row_count(frames) + len(frames['journal_df'])
+        loaded_frames = {'vulnerabilities': vulns_df}
+        if reference is None:
+            loaded_frames.update({'ppts': frames['ppts_df'], 'journal': frames['journal_df']})
+        record['frames_memory_mb'] = data_loader.memory_report(
+            {name: df for name, df in loaded_frames.items() if df is not None}
+        )
+    if record['frames_memory_mb']:
+        log(f"Память таблиц (до -> после сжатия типов): {data_loader.format_memory_report(record['frames_memory_mb'])}")
+    if reference is None:
+        with recorder.stage('index', ppts_row_count(frames)):
+            reference = build_reference_indexes(frames, config, log)
+    if vulns_df.empty:
+        log("Ошибка: Таблица с уязвимостями пуста.")
+        summary['timings'].update(recorder.timings())
+        summary['error'] = 'empty_vulnerabilities'
+        return summary
+
+    progress(0.3)
+    state = _previous_state(paths, config, config_rules, retain_raw_scores, log, reference)
+    log(f"Начинаем анализ {len(vulns_df)} уязвимостей...")
+    engine_before = comparison_engine.engine_stats(reference['ppts_index'])
+    matching_report: Dict[str, Any] = {}
+    all_results = analyze_vulnerabilities(
+        vulns_df, reference, config, config_rules, progress, retain_raw_scores, recorder, matching_report,
+        state['previous']
+    )
+    _save_state(state, all_results, log)
+    _log_matching_report(matching_report, recorder, log)
+    engine_after = comparison_engine.engine_stats(reference['ppts_index'])
+
+    progress(0.9)
+    log("Генерация отчета...")
+    with recorder.stage('report', len(all_results)):
+        report_generator.generate_report(
+            processed_data_list=all_results, output_path=output_path, config=config,
+            responsible_person=responsible, publication_source=publication
+        )
+
+    progress(1.0)
+    log(f"Анализ завершен. Отчет сохранен в {output_path}")
+
+    summary['timings'].update(recorder.timings())
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {
+        'vulnerabilities': len(vulns_df), 'ppts': ppts_row_count(reference), 'journal': len(reference['journal_df']),
+        'statuses': count_statuses(all_results)
+    }
+    summary.update({'ok': True, 'backend': 'local', 'output_path': output_path, 'results': all_results,
+                    'stages': recorder.stages, 'matching': matching_report})
+    _report_stages(recorder, os.path.splitext(output_path)[0] + TIMINGS_FILE_SUFFIX, summary, log)
+    run_metrics.emit(run_metrics.build_record(
+        'analysis', summary, paths,
+        {'vulnerabilities': ['vulnerabilities'], 'ppts': ['ppts_local', 'ppts_general'], 'journal': ['journal']},
+        load_seconds=load_seconds, rows=len(vulns_df), distinct_products=int(vulns_df['product'].nunique()),
+        engine=run_metrics.engine_delta(engine_before, engine_after)
+    ), config, paths['output_folder'], log)
+    return summary
+
+
+def _previous_state(
+        paths: Dict[str, str], config: Any, config_rules: Dict[str, List[Dict]], retain_raw_scores: bool,
+        log: Callable[[str], None], reference: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Результаты прошлого запуска для incremental ([Performance] incremental); при ошибке - пусто.
+    Если индекс ППТС обновлен по изменениям (reference['ppts_changes']), из прошлых результатов
+    убираются только строки, затронутые измененными строками ППТС.
+    """
+    from src import comparison_engine, incremental
+
+    empty = {'path': None, 'fingerprint': None, 'ppts_key': None, 'previous': {}}
+    if not incremental.enabled(config):
+        return empty
+    reference = reference or {}
+    try:
+        fingerprint = incremental.reference_fingerprint(paths, config, config_rules)
+        ppts_key = reference.get('ppts_key') or incremental.ppts_key(paths, config)
+    except OSError as e:
+        log(f"Не удалось прочитать справочники для инкрементального анализа: {e}")
+        return empty
+    # Порог, с которым собираются оценки (как в match_products)
+    floor = comparison_engine._load_settings(config)['fuzz_ratio_threshold']
+    if retain_raw_scores:
+        floor = min(floor, comparison_engine.RESCORE_RATIO_FLOOR)
+    path = incremental.state_path(paths['output_folder'])
+    loaded = incremental.load_previous(path, fingerprint, retain_raw_scores, ppts_key, reference.get('ppts_changes'),
+                                       floor)
+    if loaded['stale_rows']:
+        log(f"ППТС изменился: из прошлого запуска пересчитываются только затронутые строки ТСУ "
+            f"({loaded['stale_rows']} из {loaded['stale_rows'] + len(loaded['rows'])}).")
+    return {'path': path, 'fingerprint': fingerprint, 'ppts_key': ppts_key, 'previous': loaded['rows']}
+
+
+def _save_state(state: Dict[str, Any], all_results: List[Any], log: Callable[[str], None]):
+    """Сохраняет результаты для следующего запуска; ошибка записи не должна ломать сам запуск."""
+    from src import incremental
+
+    if state['path'] is None:
+        return
+    try:
+        incremental.save_state(state['path'], state['fingerprint'], all_results, state['ppts_key'])
+    except OSError as e:
+        log(f"Не удалось сохранить результаты для следующего запуска {state['path']}: {e}")
+
+
+def _log_matching_report(report: Dict[str, Any], recorder: Any, log: Callable[[str], None]):
+    """
+    Сколько строк взято из прошлого запуска, получило решение ЖП по продукту, решено без
+    сопоставления с ППТС и что стало с их сопоставлением.
+    """
+    analyzed = report['decided_before_matching'] + report['learned_rows'] + report['matched_rows']
+    if report.get('reused_rows'):
+        log(f"Взято из прошлого запуска без изменений: {report['reused_rows']} строк, "
+            f"проанализировано заново: {analyzed}.")
+    if report['learned_rows']:
+        log(f"Кандидат из решений ЖП по тому же продукту (без сопоставления с ППТС): {report['learned_rows']} строк.")
+    decided = report['decided_before_matching']
+    if not decided:
+        return
+    line = (f"Решено до сопоставления с ППТС: {decided} из {analyzed} строк "
+            f"(ЖП: {report['decided_by_journal']}, правила priority=1: {decided - report['decided_by_journal']}); ")
+    if report['decided_rows_matches'] == DECIDED_MATCHES_SKIP:
+        line += "сопоставление для них пропущено."
+    else:
+        deferred = next((r['wall_seconds'] for r in recorder.stages if r['name'] == 'match_deferred'), 0.0)
+        line += (f"их сопоставление отложено и выполнено только для листа 'Детальный анализ' за {deferred:.2f} с "
+                 f"(decided_rows_matches = skip сэкономит это время).")
+    log(line)
+
+
+def _report_stages(recorder: Any, json_path: str, summary: Dict[str, Any], log: Callable[[str], None]):
+    """Пишет замеры этапов в лог и в JSON; ошибка записи JSON не должна ломать сам запуск."""
+    log(f"Этапы запуска (всего {summary['timings']['total']:.2f} с):")
+    for line in recorder.format_lines():
+        log(line)
+    try:
+        recorder.write_json(json_path, {'counts': summary['counts'], 'timings': summary['timings']})
+    except OSError as e:
+        log(f"Не удалось сохранить замеры этапов в {json_path}: {e}")
+
+
+def run_update(
+        paths: Dict[str, str], publication: str = DEFAULT_PUBLICATION,
+        progress: Callable[[float], None] = _noop_progress,
+        log: Callable[[str], None] = print,
+        config: Optional[Any] = None
+) -> Dict[str, Any]:
+    """
+    Сценарий "Обновить журнал и сгенерировать письмо" на основе проверенного отчета.
+
+    Args:
+        config: Загруженный объект конфигурации (нужен только для настройки [Diagnostics]).
+
+    Returns:
+        Сводка запуска: 'ok', 'journal_path', 'email_path', 'counts', 'timings' (сек.) и 'stages'.
+    """
+    summary: Dict[str, Any] = {'ok': False, 'journal_path': None, 'email_path': None, 'counts': {}, 'timings': {}}
+    started = time.perf_counter()
+
+    from src import data_loader, journal_updater, email_generator, run_metrics, run_stages
+    summary['timings']['imports'] = time.perf_counter() - started
+
+    journal_path = paths.get('journal', '')
+    output_folder = paths.get('output_folder', '')
+    verified_report_path = os.path.join(output_folder, REPORT_FILE_NAME)
+    email_path = os.path.join(output_folder, EMAIL_FILE_NAME)
+
+    if not os.path.exists(verified_report_path) or not os.path.exists(journal_path):
+        log("Ошибка: Не найдены необходимые файлы.")
+        summary['error'] = 'missing_files'
+        return summary
+
+    recorder = run_stages.StageRecorder(run_stages.profile_prefix(config, output_folder, 'update'))
+    if recorder.profile_prefix:
+        log("Профилирование включено (cProfile + tracemalloc).")
+
+    progress(0.1)
+    log("Обновление журнала публикаций...")
+    with recorder.stage('journal_update') as record:
+        added_data_df = journal_updater.update_journal_file(journal_path, verified_report_path)
+        record['rows'] = 0 if added_data_df is None else len(added_data_df)
+
+    if added_data_df is None or added_data_df.empty:
+        log("Нет данных для обновления.")
+        summary['timings'].update(recorder.timings())
+        summary['timings']['total'] = time.perf_counter() - started
+        summary.update({'ok': True, 'counts': {'added': 0}})
+        return summary
+
+    progress(0.6)
+    log("Генерация письма...")
+    with recorder.stage('email', len(added_data_df)):
+        new_journal_name, total_vulns_count = _write_email(
+            paths, journal_path, email_path, added_data_df, publication
+        )
+
+    progress(1.0)
+    log(f"Журнал обновлен. Письмо сохранено в {email_path}")
+
+    summary['timings'].update(recorder.timings())
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {
+        'added': len(added_data_df), 'vulnerabilities': total_vulns_count,
+        'statuses': {str(k): int(v) for k, v in added_data_df['Статус'].value_counts().items() if v}
+    }
+    summary.update({'ok': True, 'journal_path': new_journal_name, 'email_path': email_path,
+                    'stages': recorder.stages})
+    _report_stages(recorder, os.path.join(output_folder, UPDATE_TIMINGS_FILE_NAME), summary, log)
+    run_metrics.emit(run_metrics.build_record(
+        'update', summary, dict(paths, report=verified_report_path), {'journal': ['journal'], 'report': ['report']},
+        rows=len(added_data_df)
+    ), config, output_folder, log)
+    return summary
+
+
+def _write_email(
+        paths: Dict[str, str], journal_path: str, email_path: str, added_data_df: Any, publication: str
+) -> Tuple[str, int]:
+    """Этап генерации письма по добавленным в ЖП строкам; возвращает имя нового ЖП и число строк ТСУ."""
+    from src import data_loader, journal_updater, email_generator
+
+    new_journal_name = journal_updater.generate_new_journal_name(journal_path)
+    date_str = " ".join(new_journal_name.split(" ")[-1:]).split(".")[0]
+    if "(" in date_str:
+        date_str = date_str.split(" (")[0]
+
+    total_vulns_count = len(data_loader.load_vulnerabilities(paths.get('vulnerabilities', '')))
+
+    email_parts = email_generator.generate_email_parts(
+        added_vulnerabilities_df=added_data_df,
+        publication_source=publication,
+        journal_date_str=date_str,
+        total_vulns_count=total_vulns_count
+    )
+
+    with open(email_path, "w", encoding="utf-8") as f:
+        f.write(email_parts['body_html'])
+    return new_journal_name, total_vulns_count
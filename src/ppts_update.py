@@ -0,0 +1,259 @@
+# ==================================================================================
+# МОДУЛЬ 28: ОБНОВЛЕНИЕ ИНДЕКСА ППТС ПО ИЗМЕНЕНИЯМ
+# В локальный ППТС каждую неделю добавляют или правят несколько строк, а индекс ППТС
+# (файл index_file, индекс службы) и сохраненные результаты incremental привязаны
+# к содержимому файлов целиком. Вместо полной перестройки:
+#   - строки нового ППТС сравниваются со строками прежнего индекса (ID ППТС, название,
+#     вендор, источник); порядок неизмененных строк сохраняется, строки, переставленные
+#     в другое место, считаются удаленными и добавленными;
+#   - индекс обновляется: списки строк меняются только у слов удаленных/добавленных
+#     строк и у слов со строками после места вставки (сдвиг номеров), новые слова
+#     дописываются в конец словаря, а кэш оценок слов дополняется оценками только
+#     новых слов - остальные оценки остаются верными;
+#   - в результатах прошлого запуска пересчитываются только строки ТСУ, у которых
+#     среди совпадений есть удаленная строка ППТС или слово продукта может совпасть
+#     со словом добавленной строки (stale_keys).
+# Прежний индекс не изменяется: новый индекс разделяет с ним неизмененные списки,
+# поэтому служба может отвечать по прежнему индексу, пока строится новый.
+# Слова, оставшиеся без строк, остаются в словаре до полной перестройки индекса.
+# Включается настройкой [Performance] ppts_index_update (по умолчанию включено).
+# ==================================================================================
+
+import bisect
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Set
+
+PPTS_COLUMNS = ['id_ppts', 'name', 'vendor', 'source']
+
+# Строк в блоке при поиске общего начала и конца двух версий ППТС
+_BLOCK_ROWS = 4096
+
+
+def enabled(config: Any) -> bool:
+    return config is not None and config.getboolean('Performance', 'ppts_index_update', fallback=True)
+
+
+def row_key(row: tuple) -> tuple:
+    """Ключ строки ППТС (id_ppts, name, vendor, source): ID как строка, NaN - пустая строка."""
+    id_ppts = row[0]
+    if isinstance(id_ppts, float) and id_ppts.is_integer():
+        id_ppts = int(id_ppts)
+    return ('' if id_ppts is None or id_ppts != id_ppts else str(id_ppts),) + tuple(str(value) for value in row[1:])
+
+
+def _diff_key(row: tuple) -> tuple:
+    """Ключ для сравнения версий в diff_rows: сама строка, только NaN в ID заменен (NaN != NaN)."""
+    return row if row[0] == row[0] else (None,) + row[1:]
+
+
+def _common_length(old_rows: List[tuple], new_rows: List[tuple], limit: int, reverse: bool = False) -> int:
+    """Сколько строк в начале (reverse - в конце) совпадают; сравнение блоками срезов, по строке - только в блоке с отличием."""
+    if reverse:
+        old_rows, new_rows = old_rows[len(old_rows) - limit:][::-1], new_rows[len(new_rows) - limit:][::-1]
+    count = 0
+    while count < limit:
+        block_end = min(count + _BLOCK_ROWS, limit)
+        if old_rows[count:block_end] != new_rows[count:block_end]:
+            while count < block_end and _diff_key(old_rows[count]) == _diff_key(new_rows[count]):
+                count += 1
+            if count < block_end:
+                return count
+        count = block_end
+    return limit
+
+
+def diff_rows(old_rows: List[tuple], new_rows: List[tuple]) -> Dict[str, Any]:
+    """
+    Сопоставляет строки прежнего и нового ППТС.
+
+    Returns:
+        Словарь 'old_to_new' (для каждой прежней строки - ее номер в новом ППТС или None,
+        номера неизмененных строк возрастают), 'added' (номера новых строк), 'removed'
+        (номера удаленных прежних строк) и 'shift_from' (первая прежняя строка, номер которой
+        в новом ППТС другой, или число прежних строк). Измененная строка - удаленная + добавленная.
+    """
+    n_old, n_new = len(old_rows), len(new_rows)
+    old_to_new: List[Optional[int]] = [None] * n_old
+
+    # Обычно меняется несколько строк: общие начало и конец сравниваются по позициям
+    start = _common_length(old_rows, new_rows, min(n_old, n_new))
+    end = _common_length(old_rows, new_rows, min(n_old, n_new) - start, reverse=True)
+    old_to_new[:start] = range(start)
+    old_to_new[n_old - end:] = range(n_new - end, n_new)
+
+    positions: Dict[tuple, deque] = {}
+    for old_id in range(start, n_old - end):
+        positions.setdefault(_diff_key(old_rows[old_id]), deque()).append(old_id)
+    added = []
+    last = start - 1
+    shift_from = n_old - end if end and n_old != n_new else n_old
+    for new_id in range(start, n_new - end):
+        queue = positions.get(_diff_key(new_rows[new_id]))
+        # Прежняя строка до уже сопоставленной - перестановка: считаем ее удаленной
+        while queue and queue[0] < last:
+            queue.popleft()
+        if queue:
+            last = queue.popleft()
+            old_to_new[last] = new_id
+            if last != new_id:
+                shift_from = min(shift_from, last)
+        else:
+            added.append(new_id)
+    removed = [old_id for old_id in range(start, n_old - end) if old_to_new[old_id] is None]
+    return {'old_to_new': old_to_new, 'added': added, 'removed': removed, 'shift_from': shift_from}
+
+
+def update_index(ppts_index: Dict[str, Any], ppts_df: Any) -> Dict[str, Any]:
+    """
+    Индекс ППТС для ppts_df, полученный из прежнего индекса по изменившимся строкам.
+    Совпадения по нему те же, что по build_ppts_index(ppts_df).
+
+    Returns:
+        Словарь 'ppts_index' (прежний индекс, если строки не изменились) и 'changes':
+        'added_rows' / 'removed_rows' (кортежи строк), 'old_to_new', 'new_words',
+        'min_word_length' и 'seconds'.
+    """
+    from src import comparison_engine, scorers
+
+    started = time.perf_counter()
+    min_word_length = ppts_index['min_word_length']
+    # Индекс из файла (shared_index.PackedRows) читает строки из буфера - все сразу одним проходом
+    old_rows = ppts_index['rows'] if isinstance(ppts_index['rows'], list) else ppts_index['rows'].tolist()
+    # Те же кортежи, что строит build_ppts_index, но без медленного itertuples по категориям
+    new_rows = list(zip(*(ppts_df[column].tolist() for column in PPTS_COLUMNS)))
+    diff = diff_rows(old_rows, new_rows)
+    old_to_new = diff['old_to_new']
+    changes = {
+        'added_rows': [new_rows[row_id] for row_id in diff['added']],
+        'removed_rows': [old_rows[row_id] for row_id in diff['removed']],
+        'old_to_new': old_to_new, 'new_words': 0, 'min_word_length': min_word_length,
+    }
+    # Списки строк слов, где все номера меньше shift_from, не меняются
+    shift_from = diff['shift_from']
+    if not diff['added'] and not diff['removed'] and shift_from == len(old_to_new):
+        changes['seconds'] = time.perf_counter() - started
+        return {'ppts_index': ppts_index, 'changes': changes}
+
+    words = list(ppts_index['words'])
+    word_ids = dict(ppts_index['word_ids'])
+    postings = list(ppts_index['postings'])
+    rebuilt: Set[int] = set()
+
+    def row_words(row: tuple) -> Set[str]:
+        return comparison_engine._prepare_words(f"{row[2]} {row[1]}", min_word_length)
+
+    removed_words = {word_ids[word] for row in changes['removed_rows'] for word in row_words(row) if word in word_ids}
+    for word_id, row_ids in enumerate(postings):
+        if word_id in removed_words or (len(row_ids) and row_ids[-1] >= shift_from):
+            postings[word_id] = [old_to_new[row_id] for row_id in row_ids if old_to_new[row_id] is not None]
+            rebuilt.add(word_id)
+
+    for row_id in diff['added']:
+        for word in row_words(new_rows[row_id]):
+            word_id = word_ids.get(word)
+            if word_id is None:
+                word_id = word_ids[word] = len(words)
+                words.append(word)
+                postings.append([])
+                rebuilt.add(word_id)
+            elif word_id not in rebuilt:
+                postings[word_id] = list(postings[word_id])
+                rebuilt.add(word_id)
+            bisect.insort(postings[word_id], row_id)
+
+    # Кэш оценок слов ТСУ: прежние оценки верны, не хватает только оценок новых слов словаря
+    first_new = len(ppts_index['words'])
+    new_words = words[first_new:]
+    word_cache = dict(ppts_index['word_cache'])
+    stats = dict(ppts_index['stats'])
+    if new_words:
+        for (v_word, floor), scored in word_cache.items():
+            extra = []
+            for offset, (p_word, ratio) in enumerate(zip(new_words, scorers.ratios(v_word, new_words))):
+                is_prefix = p_word.startswith(v_word)
+                if is_prefix or ratio >= floor:
+                    extra.append((first_new + offset, ratio, is_prefix))
+            if extra:
+                word_cache[(v_word, floor)] = scored + extra
+        stats['fuzz_comparisons'] += len(word_cache) * len(new_words)
+
+    changes.update(new_words=len(new_words), seconds=time.perf_counter() - started)
+    return {'ppts_index': dict(
+        ppts_index, rows=new_rows, words=words, word_ids=word_ids, postings=postings, word_cache=word_cache,
+        word_occurrences=sum(len(row_ids) for row_ids in postings), stats=stats
+    ), 'changes': changes}
+
+
+def stale_keys(previous: Dict[str, Any], changes: Dict[str, Any], floor: int) -> Set[str]:
+    """
+    Ключи сохраненных результатов (incremental), которые после изменения ППТС нужно пересчитать:
+    среди совпадений ("сырых" оценок) есть удаленная строка ППТС, или слово продукта может
+    совпасть со словом добавленной строки (префикс или fuzz.ratio не ниже floor, как при сборе оценок).
+    """
+    from src import comparison_engine, scorers
+
+    min_word_length = changes['min_word_length']
+    removed = {row_key(row) for row in changes['removed_rows']}
+    added_words: Set[str] = set()
+    for row in changes['added_rows']:
+        added_words |= comparison_engine._prepare_words(f"{row[2]} {row[1]}", min_word_length)
+
+    word_verdicts: Dict[str, bool] = {}
+
+    def near_added(v_word: str) -> bool:
+        verdict = word_verdicts.get(v_word)
+        if verdict is None:
+            verdict = word_verdicts[v_word] = any(
+                p_word.startswith(v_word) or scorers.ratio(v_word, p_word) >= floor for p_word in added_words
+            )
+        return verdict
+
+    stale = set()
+    for key, item in previous.items():
+        rows = [match.row for match in item.ppts_matches]
+        if item.raw_scores is not None:
+            rows.extend(raw_row[1] for raw_row in item.raw_scores['rows'])
+        if removed and any(row_key(row) in removed for row in rows):
+            stale.add(key)
+        elif added_words and isinstance(item.product, str) and \
+                any(near_added(word) for word in item.vuln_words(min_word_length)):
+            stale.add(key)
+    return stale
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from src import comparison_engine
+
+    old_df = pd.DataFrame({
+        'id_ppts': ['ID-001', 'ID-002', float('nan'), 'ID-004', 'ID-005'],
+        'name': ['Windows Server 2019', 'Tomcat', 'Chrome Browser', 'Java', 'Windows 11 Pro'],
+        'vendor': ['Microsoft', 'Apache', 'Google', 'Oracle', 'Microsoft'],
+        'source': ['local', 'local', 'local', 'general', 'general'],
+    })
+    # Правка строки, удаление строки и вставка в конец локальной части (номера общей сдвигаются)
+    new_df = pd.DataFrame({
+        'id_ppts': ['ID-001', float('nan'), 'ID-006', 'ID-004', 'ID-005'],
+        'name': ['Windows Server 2022', 'Chrome Browser', 'PostgreSQL Database', 'Java', 'Windows 11 Pro'],
+        'vendor': ['Microsoft', 'Google', 'PostgreSQL', 'Oracle', 'Microsoft'],
+        'source': ['local', 'local', 'local', 'general', 'general'],
+    })
+    diff = diff_rows(list(old_df.itertuples(index=False, name=None)), list(new_df.itertuples(index=False, name=None)))
+    assert diff == {'old_to_new': [None, None, 1, 3, 4], 'added': [0, 2], 'removed': [0, 1], 'shift_from': 2}, diff
+
+    old_index = comparison_engine.build_ppts_index(old_df, 3)
+    for product in ['Microsoft - Windows 10', 'Google - Chrome', 'PostgreSQL - PostgreSQL 15']:
+        comparison_engine.collect_raw_scores(product, old_index, 60)
+    old_cache = dict(old_index['word_cache'])
+    updated = update_index(old_index, new_df)
+    rebuilt = comparison_engine.build_ppts_index(new_df, 3)
+    assert old_index['word_cache'] == old_cache, "прежний индекс не изменяется"
+    for product in ['Microsoft - Windows 10', 'Google - Chrome', 'PostgreSQL - PostgreSQL 15', 'Oracle Java']:
+        expected = comparison_engine.collect_raw_scores(product, rebuilt, 60)['rows']
+        actual = comparison_engine.collect_raw_scores(product, updated['ppts_index'], 60)['rows']
+        assert [(r[0], r[1], sorted(r[2]), sorted(r[3])) for r in actual] == \
+            [(r[0], r[1], sorted(r[2]), sorted(r[3])) for r in expected], product
+    changes = updated['changes']
+    print(f"Индекс ППТС обновлен: +{len(changes['added_rows'])} / -{len(changes['removed_rows'])} строк, "
+          f"новых слов {changes['new_words']}; поиск совпадает с полной перестройкой.")
@@ -0,0 +1,333 @@
+# ==================================================================================
+# МОДУЛЬ 31: ЭТАЛОН - ИСХОДНЫЙ АЛГОРИТМ АНАЛИЗА
+# Замороженная копия первой версии анализа (data_loader, journal_sync, comparison_engine,
+# status_logic, разбор правил config_handler и цикл по строкам ТСУ из gui.run_analysis):
+# чтение Excel через pandas, поиск CVE перебором ЖП, перебор всех строк ППТС с
+# fuzzywuzzy.fuzz.ratio, каскад статусов ЖП -> priority=1 -> ППТС -> правила -> НЕТ.
+# Модуль не использует ни одну функцию рабочего пути, поэтому python main.py verify
+# (equivalence) замечает регрессию в любом из них. Менять его нельзя - только если
+# намеренно меняется результат анализа, и это должно быть видно в истории.
+# ==================================================================================
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+from fuzzywuzzy import fuzz
+
+ID_NOT = "-----------"
+ID_USLOVNO = "-----------"
+ID_LINUX_DEFAULT = "-----------"
+
+RULE_SECTIONS = ('DA', 'NOT', 'LINUX', 'Uslovno')
+
+
+# --- data_loader ---
+
+def load_vulnerabilities(path: str) -> pd.DataFrame:
+    try:
+        df = pd.read_excel(path, usecols=[0, 1, 2, 3, 4], header=None, skiprows=1,
+                           names=['id_num', 'cve', 'cvss', 'product', 'source_url'], sheet_name=0)
+        print(f"Успешно загружен файл ТСУ: {path}")
+        return df
+    except FileNotFoundError:
+        print(f"ОШИБКА: Файл ТСУ не найден по пути: {path}")
+    except Exception as e:
+        print(f"ОШИБКА: Не удалось прочитать файл ТСУ '{path}'. Проверьте, что столбцы A-E существуют. Ошибка: {e}")
+    return pd.DataFrame()
+
+
+def load_ppts(local_path: str, general_path: str) -> pd.DataFrame:
+    all_ppts = []
+    for path, columns, source in ((local_path, "O,Q,T", 'local'), (general_path, "M,O,R", 'general')):
+        if not os.path.exists(path):
+            print(f"ИНФО: Файл ППТС не найден по пути: {path}")
+            continue
+        try:
+            df = pd.read_excel(path, usecols=columns, header=None, skiprows=1, sheet_name=0)
+            df.columns = ['id_ppts', 'name', 'vendor']
+            df['source'] = source
+            all_ppts.append(df)
+        except Exception as e:
+            print(f"ОШИБКА: Не удалось прочитать ППТС '{path}'. Проверьте столбцы {columns}. Ошибка: {e}")
+
+    if not all_ppts:
+        return pd.DataFrame()
+
+    combined_df = pd.concat(all_ppts, ignore_index=True)
+    combined_df['name'] = combined_df['name'].fillna('')
+    combined_df['vendor'] = combined_df['vendor'].fillna('')
+    combined_df.dropna(subset=['vendor', 'name'], how='all', inplace=True)
+    return combined_df
+
+
+def load_journal(path: str) -> pd.DataFrame:
+    try:
+        return pd.read_excel(path, sheet_name=0, usecols="C,D,E,F,G,H,I", header=None, skiprows=1,
+                             names=['responsible', 'publication', 'status', 'id_ppts', 'cve', 'cvss', 'product'])
+    except FileNotFoundError:
+        print(f"ОШИБКА: Файл ЖП не найден по пути: {path}")
+    except Exception as e:
+        print(f"ОШИБКА: Не удалось прочитать файл ЖП '{path}'. Ошибка: {e}")
+    return pd.DataFrame()
+
+
+# --- config_handler ---
+
+def parse_rules(config: Any, section_name: str) -> List[Dict[str, Any]]:
+    rules_list = []
+    if not config.has_section(section_name):
+        return rules_list
+
+    for key, value in config.items(section_name):
+        if key.startswith(';'):
+            continue
+
+        parts = [p.strip() for p in value.split(';')]
+        rule = {'rule_name': key}
+        if section_name == 'DA':
+            rule['vendor'] = parts[0] if len(parts) > 0 else ''
+            rule['product'] = parts[1] if len(parts) > 1 else ''
+            rule['id_ppts'] = parts[2] if len(parts) > 2 else ''
+            rule['priority'] = int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else 0
+        elif section_name in ['Uslovno', 'NOT']:
+            rule['vendor'] = parts[0] if len(parts) > 0 else ''
+            rule['product'] = parts[1] if len(parts) > 1 else ''
+            rule['priority'] = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
+        elif section_name == 'LINUX':
+            rule['vendor'] = parts[0] if len(parts) > 0 else ''
+            rule['product'] = parts[1] if len(parts) > 1 else ''
+            rule['id_ppts'] = parts[2] if len(parts) > 2 else ''
+            rule['new_name'] = parts[3] if len(parts) > 3 else ''
+        rules_list.append(rule)
+
+    return rules_list
+
+
+# --- journal_sync ---
+
+def find_cve_in_journal(cve_id: str, journal_df: pd.DataFrame) -> List[Dict[str, Any]]:
+    if journal_df.empty or 'cve' not in journal_df.columns or not isinstance(cve_id, str):
+        return []
+    clean_cve_series = journal_df['cve'].str.strip()
+    return journal_df[clean_cve_series == cve_id.strip()].to_dict('records')
+
+
+# --- comparison_engine ---
+
+def _prepare_words(text: str, min_word_length: int) -> Set[str]:
+    if not isinstance(text, str) or not text:
+        return set()
+
+    text = text.lower()
+    text = re.sub(r'\d+', '', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return {word for word in text.split() if len(word) >= min_word_length}
+
+
+def _split_vuln_product(vuln_product_name: str) -> Tuple[str, str]:
+    if " - " in vuln_product_name:
+        parts = vuln_product_name.split(" - ", 1)
+        return parts[0], parts[1]
+    elif "," in vuln_product_name:
+        parts = vuln_product_name.split(",", 1)
+        return parts[0], parts[1]
+    else:
+        return "", vuln_product_name
+
+
+def _compare_word_sets(vuln_words: Set[str], ppts_words: Set[str], settings: Dict[str, int]) -> Dict[str, Any]:
+    match_count = 0
+    total_similarity = 0
+    prefix_match_found = False
+
+    if not vuln_words or not ppts_words:
+        return {'count': 0, 'avg_sim': 0, 'prefix_found': False}
+
+    for v_word in vuln_words:
+        best_match_score = 0
+        is_prefix = False
+
+        for p_word in ppts_words:
+            len_v = len(v_word)
+            if p_word.startswith(v_word):
+                threshold = settings['prefix_threshold_short'] if len_v < 5 else \
+                    settings['prefix_threshold_medium'] if len_v < 10 else \
+                        settings['prefix_threshold_long']
+                if threshold == 100:
+                    best_match_score = 100
+                    is_prefix = True
+                    break
+
+            ratio = fuzz.ratio(v_word, p_word)
+            if ratio > best_match_score:
+                best_match_score = ratio
+
+        if best_match_score >= settings['fuzz_ratio_threshold']:
+            match_count += 1
+            total_similarity += best_match_score
+            if is_prefix:
+                prefix_match_found = True
+
+    avg_sim = (total_similarity / match_count) if match_count > 0 else 0
+    return {'count': match_count, 'avg_sim': avg_sim, 'prefix_found': prefix_match_found}
+
+
+def find_best_matches(vuln_product_name: str, ppts_df: pd.DataFrame, config: Any) -> List[Dict[str, Any]]:
+    results = []
+
+    s = config['Settings']
+    settings = {
+        'min_word_length': s.getint('min_word_length', 3),
+        'prefix_threshold_short': s.getint('prefix_threshold_short', 100),
+        'prefix_threshold_medium': s.getint('prefix_threshold_medium', 90),
+        'prefix_threshold_long': s.getint('prefix_threshold_long', 80),
+        'fuzz_ratio_threshold': s.getint('fuzz_ratio_threshold', 60),
+        'min_matched_words': s.getint('min_matched_words', 2),
+        'index1_results_limit': s.getint('index1_results_limit', 5)
+    }
+
+    vendor_str, product_str = _split_vuln_product(vuln_product_name)
+    vuln_vendor_words = _prepare_words(vendor_str, settings['min_word_length'])
+    vuln_product_words = _prepare_words(product_str, settings['min_word_length'])
+
+    for row in ppts_df.itertuples(index=False):
+        ppts_words = _prepare_words(f"{row.vendor} {row.name}", settings['min_word_length'])
+        if not ppts_words:
+            continue
+
+        vendor_res = _compare_word_sets(vuln_vendor_words, ppts_words, settings)
+        product_res = _compare_word_sets(vuln_product_words, ppts_words, settings)
+        total_matches = vendor_res['count'] + product_res['count']
+        if total_matches == 0:
+            continue
+
+        avg_similarity = (vendor_res['avg_sim'] * vendor_res['count'] + product_res['avg_sim'] * product_res[
+            'count']) / total_matches
+
+        index = 0
+        if vendor_res['prefix_found'] and product_res['prefix_found']:
+            index = 3
+        elif vendor_res['prefix_found'] or product_res['prefix_found']:
+            index = 2
+        elif total_matches > 0:
+            index = 1
+
+        if index >= 1 and total_matches >= settings['min_matched_words']:
+            results.append({
+                'id_ppts': row.id_ppts, 'name': row.name, 'vendor': row.vendor, 'source': row.source,
+                'index': index, 'matched_words_count': total_matches, 'avg_similarity': round(avg_similarity),
+                'vendor_matched': vendor_res['count'], 'product_matched': product_res['count']
+            })
+
+    results.sort(key=lambda x: (-x['index'], -x['matched_words_count'], -x['avg_similarity']))
+    index1_results = [r for r in results if r['index'] == 1]
+    other_results = [r for r in results if r['index'] > 1]
+    final_results = other_results + index1_results[:settings['index1_results_limit']]
+    final_results.sort(key=lambda x: (-x['index'], -x['matched_words_count'], -x['avg_similarity']))
+    return final_results
+
+
+# --- status_logic ---
+
+def _check_config_rules(
+        product_name: str, config_rules: Dict[str, List[Dict]], priority_only: bool
+) -> Optional[Dict[str, str]]:
+    product_lower = product_name.lower()
+    rule_order = [('NOT', 'НЕТ'), ('DA', 'ДА'), ('LINUX', 'Linux'), ('Uslovno', 'УСЛОВНО')]
+
+    for section_name, status in rule_order:
+        for rule in config_rules.get(section_name, []):
+            if priority_only and rule.get('priority', 0) != 1:
+                continue
+
+            vendor_lower = rule.get('vendor', '').lower()
+            prod_lower = rule.get('product', '').lower()
+            vendor_match = vendor_lower and vendor_lower in product_lower
+
+            if vendor_match:
+                if not prod_lower or prod_lower in product_lower:
+                    if status == 'НЕТ':
+                        return {'status': status, 'id_ppts': ID_NOT}
+                    if status == 'УСЛОВНО':
+                        return {'status': status, 'id_ppts': ID_USLOVNO}
+                    if status == 'ДА':
+                        return {'status': status, 'id_ppts': rule.get('id_ppts', '')}
+                    if status == 'Linux':
+                        return {'status': status, 'id_ppts': rule.get('id_ppts') or ID_LINUX_DEFAULT}
+
+    return None
+
+
+def determine_status(
+        vuln_data: Dict, journal_matches: List, ppts_matches: List, config_rules: Dict[str, List[Dict]]
+) -> Dict[str, str]:
+    product_name = vuln_data.get('product', '')
+
+    if journal_matches:
+        return {'status': 'ПОВТОР', 'id_ppts': ''}
+
+    priority_match = _check_config_rules(product_name, config_rules, priority_only=True)
+    if priority_match:
+        return priority_match
+
+    if ppts_matches:
+        return {'status': '', 'id_ppts': ''}
+
+    non_priority_match = _check_config_rules(product_name, config_rules, priority_only=False)
+    if non_priority_match:
+        return non_priority_match
+
+    return {'status': 'НЕТ', 'id_ppts': ID_NOT}
+
+
+# --- gui.run_analysis ---
+
+def analyze(vulns_df: pd.DataFrame, ppts_df: pd.DataFrame, journal_df: pd.DataFrame, config: Any) -> List[Dict[str, Any]]:
+    """
+    Цикл исходного анализа по строкам ТСУ.
+
+    Returns:
+        По строке ТСУ: 'source_data', 'final_status', 'final_id', 'journal_matches', 'ppts_matches'.
+    """
+    config_rules = {section: parse_rules(config, section) for section in RULE_SECTIONS}
+    all_results = []
+    for row in vulns_df.itertuples():
+        vuln_data = {'product': row.product, 'cve': row.cve}
+        journal_matches = find_cve_in_journal(vuln_data['cve'], journal_df)
+        ppts_matches = find_best_matches(vuln_data['product'], ppts_df, config)
+        status_info = determine_status(vuln_data, journal_matches, ppts_matches, config_rules)
+        all_results.append({
+            'source_data': row._asdict(), 'final_status': status_info['status'],
+            'final_id': status_info['id_ppts'], 'journal_matches': journal_matches, 'ppts_matches': ppts_matches,
+        })
+    return all_results
+
+
+if __name__ == '__main__':
+    from configparser import ConfigParser
+
+    mock_config = ConfigParser()
+    mock_config.read_dict({
+        'Settings': {'min_word_length': '3', 'min_matched_words': '2', 'fuzz_ratio_threshold': '60'},
+        'NOT': {'wordpress': 'WordPress;;1'},
+        'DA': {'my': 'МойВендор;МойПродукт;ID-DA-123;0'},
+    })
+    mock_vulns = pd.DataFrame({
+        'id_num': [1, 2, 3, 4, 5], 'cve': ['CVE-1', 'CVE-2', 'CVE-3', 'CVE-4', 'CVE-5'], 'cvss': [5.0] * 5,
+        'product': ['Microsoft - Windows 10 Enterprise', 'WordPress - Contact Form 7', 'Apache - Tomcat Server',
+                    'МойВендор - МойПродукт', 'Неизвестный - продукт'],
+        'source_url': [''] * 5,
+    })
+    mock_ppts = pd.DataFrame({
+        'id_ppts': ['ID-001', 'ID-002', 'ID-003'], 'vendor': ['Microsoft', 'Apache', 'Google'],
+        'name': ['Windows Server 2019', 'Tomcat', 'Chrome Browser'], 'source': ['local', 'general', 'local'],
+    })
+    mock_journal = pd.DataFrame({'cve': [' CVE-3 '], 'status': ['ДА'], 'id_ppts': ['ID-002'], 'product': ['Tomcat']})
+
+    results = analyze(mock_vulns, mock_ppts, mock_journal, mock_config)
+    statuses = [(r['final_status'], r['final_id']) for r in results]
+    assert statuses == [('', ''), ('НЕТ', ID_NOT), ('ПОВТОР', ''), ('ДА', 'ID-DA-123'), ('НЕТ', ID_NOT)], statuses
+    assert [m['id_ppts'] for m in results[0]['ppts_matches']] == ['ID-001']
+    print("Исходный алгоритм: ЖП, правила priority=1 и обычные, совпадения в ППТС и НЕТ работают.")
@@ -3,10 +3,12 @@
 # ==================================================================================
 
 import pandas as pd
-from typing import List, Dict, Any, Set
+from typing import List, Dict, Any, Optional, Set
 from datetime import datetime
 import re
 
+from src.result_records import ResultRecord
+
 
 def _define_formats(workbook: Any) -> Dict[str, Any]:
     """Создает и возвращает словарь с форматами ячеек для xlsxwriter."""
@@ -70,121 +72,155 @@ def _format_rich_text_match(
     return rich_string_parts
 
 
+MAIN_SHEET_NAME = 'Основная таблица'
+DETAIL_SHEET_NAME = 'Детальный анализ'
+
+MAIN_HEADER = ['№', 'Дата обработки', 'Ответственный', 'Публикация', 'Статус', 'ID ППТС',
+               'CVE', 'CVSS', 'Продукт', 'Источник']
+MAIN_WIDTHS = {'A': 5, 'B': 15, 'C': 20, 'D': 15, 'E': 12, 'F': 20, 'G': 20, 'H': 15, 'I': 60, 'J': 40}
+
+DETAIL_HEADER = [
+    "№", "CVE", "CVSS", "Продукт", "Источник", "Статус (решение)", "ID ППТС (решение)",
+    "Источник совпадения", "Совпадение: Имя", "Совпадение: Индекс", "Совпадение: ID ППТС",
+    "Совпадение: Ответственный", "Совпадение: Статус",
+]
+DETAIL_WIDTHS = [5, 18, 10, 50, 25, 15, 18, 20, 50, 12, 18, 20, 12]
+
+
+def _main_row(item: ResultRecord, today_date: str, responsible_person: str, publication_source: str) -> list:
+    """Значения строки листа 'Основная таблица' в порядке MAIN_HEADER."""
+    return [item.id_num, today_date, responsible_person, publication_source, item.final_status, item.final_id,
+            item.cve, item.cvss, item.product, item.source_url]
+
+
+def _format_main_sheet(worksheet: Any, formats: Dict, responsible_person: str, last_row: int):
+    """Выделение ответственного и ширина колонок листа 'Основная таблица'."""
+    if responsible_person:
+        worksheet.conditional_format(f'C2:C{last_row}', {'type': 'no_blanks', 'format': formats['bold_text']})
+    for col, width in MAIN_WIDTHS.items():
+        worksheet.set_column(f'{col}:{col}', width)
+
+
 def _create_main_sheet(
-        writer: pd.ExcelWriter, processed_data: List[Dict], formats: Dict, responsible_person: str,
-        publication_source: str
+        writer: pd.ExcelWriter, processed_data: List[ResultRecord], formats: Dict, responsible_person: str,
+        publication_source: str, row_publications: Optional[List[str]] = None
 ):
     """Создает лист 'Основная таблица'."""
-    sheet_name = 'Основная таблица'
     today_date = datetime.now().strftime("%d.%m.%Y")
 
     main_data = []
-    for item in processed_data:
-        main_data.append({
-            '№': item['source_data'].get('id_num', ''), 'Дата обработки': today_date,
-            'Ответственный': responsible_person, 'Публикация': publication_source,
-            'Статус': item.get('final_status', ''), 'ID ППТС': item.get('final_id', ''),
-            'CVE': item['source_data'].get('cve', ''), 'CVSS': item['source_data'].get('cvss', ''),
-            'Продукт': item['source_data'].get('product', ''), 'Источник': item['source_data'].get('source_url', '')
-        })
+    for i, item in enumerate(processed_data):
+        publication = row_publications[i] if row_publications is not None else publication_source
+        main_data.append(dict(zip(MAIN_HEADER, _main_row(item, today_date, responsible_person, publication))))
 
     df = pd.DataFrame(main_data)
-    df.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=1)
-
-    worksheet = writer.sheets[sheet_name]
-    worksheet.write_row('A1', list(df.columns), formats['header'])
-
-    if responsible_person:
-        worksheet.conditional_format(f'C2:C{len(df) + 1}', {'type': 'no_blanks', 'format': formats['bold_text']})
-
-    widths = {'A': 5, 'B': 15, 'C': 20, 'D': 15, 'E': 12, 'F': 20, 'G': 20, 'H': 15, 'I': 60, 'J': 40}
-    for col, width in widths.items():
-        worksheet.set_column(f'{col}:{col}', width)
+    df.to_excel(writer, sheet_name=MAIN_SHEET_NAME, index=False, header=False, startrow=1)
+    writer.sheets[MAIN_SHEET_NAME].write_row('A1', MAIN_HEADER, formats['header'])
+    _format_main_sheet(writer.sheets[MAIN_SHEET_NAME], formats, responsible_person, len(df) + 1)
 
 
-def _create_detailed_sheet(writer: pd.ExcelWriter, processed_data: List[Dict], formats: Dict, config: Any):
+def _create_detailed_sheet(writer: pd.ExcelWriter, processed_data: List[ResultRecord], formats: Dict, config: Any):
     """Создает лист 'Детальный анализ' с объединением ячеек для группировки."""
-    sheet_name = 'Детальный анализ'
-    worksheet = writer.book.add_worksheet(sheet_name)
+    worksheet = writer.book.add_worksheet(DETAIL_SHEET_NAME)
     min_word_len = config.getint('Settings', 'min_word_length', fallback=3)
-
-    header = [
-        "№", "CVE", "CVSS", "Продукт", "Источник", "Статус (решение)", "ID ППТС (решение)",
-        "Источник совпадения", "Совпадение: Имя", "Совпадение: Индекс", "Совпадение: ID ППТС",
-        "Совпадение: Ответственный", "Совпадение: Статус",
-    ]
-    worksheet.write_row('A1', header, formats['header'])
+    worksheet.write_row('A1', DETAIL_HEADER, formats['header'])
 
     row_cursor = 1
     for item in processed_data:
-        all_matches = []
-        if item.get('status_source') == 'config':
-            all_matches.append({'type': 'config', 'data': item['matched_rule']})
-        all_matches.extend([{'type': 'journal', 'data': m} for m in item['journal_matches']])
-        all_matches.extend([{'type': 'ppts', 'data': m} for m in item['ppts_matches']])
-
-        num_matches = len(all_matches)
-
-        is_decided = bool(item['final_status'])
-        # Выбираем два типа формата: один для основных (левых) колонок, второй для колонок с совпадениями
-        main_cell_format = formats['green_vcenter_border'] if is_decided else formats['gray_vcenter_border']
-        match_cell_format = formats['green_wrap_border'] if is_decided else formats['gray_wrap_border']
-
-        # Основная информация об уязвимости
-        main_info = [
-            item['source_data'].get('id_num', ''), item['source_data'].get('cve', ''),
-            item['source_data'].get('cvss', ''), item['source_data'].get('product', ''),
-            item['source_data'].get('source_url', ''), item.get('final_status', 'РУЧНОЙ АНАЛИЗ'),
-            item.get('final_id', '')
-        ]
-
-        if num_matches == 0:
-            worksheet.write_row(row_cursor, 0, main_info, main_cell_format)
-            # Заполняем правую часть прочерками
-            for i in range(7, len(header)):
-                worksheet.write(row_cursor, i, '-', main_cell_format)
-            row_cursor += 1
-        elif num_matches == 1:
-            # ИСПРАВЛЕНИЕ: Если совпадение одно, не объединяем, а просто пишем одну полную строку
-            full_row = main_info + _get_match_row_data(all_matches[0], item, formats, min_word_len)
-
-            # Записываем все ячейки с нужными форматами
-            for col_idx, cell_data in enumerate(full_row):
-                fmt = main_cell_format if col_idx < 7 else match_cell_format
-                if isinstance(cell_data, list):  # Это наш rich_text
-                    worksheet.write_blank(row_cursor, col_idx, None, fmt)
-                    worksheet.write_rich_string(row_cursor, col_idx, *cell_data)
-                else:
-                    worksheet.write(row_cursor, col_idx, cell_data, fmt)
-            row_cursor += 1
-        else:  # num_matches > 1
-            # ИСПРАВЛЕНИЕ: Объединяем ячейки только если строк больше одной
-            start_row = row_cursor
-            end_row = row_cursor + num_matches - 1
+        row_cursor = _write_detail_item(worksheet, row_cursor, item, formats, min_word_len)
+
+    _set_detail_widths(worksheet)
 
-            for col_idx, data in enumerate(main_info):
-                worksheet.merge_range(start_row, col_idx, end_row, col_idx, data, main_cell_format)
 
-            for match_info in all_matches:
-                match_row_data = _get_match_row_data(match_info, item, formats, min_word_len)
-                for col_idx_offset, cell_data in enumerate(match_row_data):
-                    col_idx_abs = 7 + col_idx_offset
-                    if isinstance(cell_data, list):
-                        worksheet.write_blank(row_cursor, col_idx_abs, None, match_cell_format)
-                        worksheet.write_rich_string(row_cursor, col_idx_abs, *cell_data)
-                    else:
-                        worksheet.write(row_cursor, col_idx_abs, cell_data, match_cell_format)
-                row_cursor += 1
-
-    # Настройка ширины
-    widths = {'A': 5, 'B': 18, 'C': 10, 'D': 50, 'E': 25, 'F': 15, 'G': 18, 'H': 20, 'I': 50, 'J': 12, 'K': 18, 'L': 20,
-              'M': 12}
-    for i, width in enumerate(widths.values()):
+def _set_detail_widths(worksheet: Any):
+    for i, width in enumerate(DETAIL_WIDTHS):
         col_letter = chr(ord('A') + i)
         worksheet.set_column(f'{col_letter}:{col_letter}', width)
 
 
-def _get_match_row_data(match_info: Dict, item: Dict, formats: Dict, min_word_len: int) -> list:
+def _write_detail_item(
+        worksheet: Any, row_cursor: int, item: ResultRecord, formats: Dict, min_word_len: int,
+        merge_cells: bool = True
+) -> int:
+    """
+    Пишет строки одной уязвимости на лист 'Детальный анализ' начиная с row_cursor.
+    merge_cells=False - без объединения ячеек (потоковый отчет): данные уязвимости только
+    в первой строке группы, остальные ячейки группы - пустые с тем же форматом.
+
+    Returns:
+        Номер следующей свободной строки.
+    """
+    all_matches = []
+    if item.status_source == 'config':
+        all_matches.append({'type': 'config', 'data': item.matched_rule})
+    all_matches.extend([{'type': 'journal', 'data': m} for m in item.journal_matches])
+    if item.learned_match is not None:
+        all_matches.append({'type': 'learned', 'data': item.learned_match})
+    all_matches.extend([{'type': 'ppts', 'data': m} for m in item.ppts_matches])
+
+    num_matches = len(all_matches)
+    # Слова продукта для подсветки нужны только при совпадениях в ППТС
+    vuln_words = item.vuln_words(min_word_len) if item.ppts_matches else set()
+
+    is_decided = bool(item.final_status)
+    # Выбираем два типа формата: один для основных (левых) колонок, второй для колонок с совпадениями
+    main_cell_format = formats['green_vcenter_border'] if is_decided else formats['gray_vcenter_border']
+    match_cell_format = formats['green_wrap_border'] if is_decided else formats['gray_wrap_border']
+
+    # Основная информация об уязвимости
+    main_info = [
+        item.id_num, item.cve, item.cvss, item.product, item.source_url, item.final_status, item.final_id
+    ]
+
+    if num_matches == 0:
+        worksheet.write_row(row_cursor, 0, main_info, main_cell_format)
+        # Заполняем правую часть прочерками
+        for i in range(7, len(DETAIL_HEADER)):
+            worksheet.write(row_cursor, i, '-', main_cell_format)
+        row_cursor += 1
+    elif num_matches == 1:
+        # ИСПРАВЛЕНИЕ: Если совпадение одно, не объединяем, а просто пишем одну полную строку
+        full_row = main_info + _get_match_row_data(all_matches[0], vuln_words, formats, min_word_len)
+
+        # Записываем все ячейки с нужными форматами
+        for col_idx, cell_data in enumerate(full_row):
+            fmt = main_cell_format if col_idx < 7 else match_cell_format
+            if isinstance(cell_data, list):  # Это наш rich_text
+                worksheet.write_blank(row_cursor, col_idx, None, fmt)
+                worksheet.write_rich_string(row_cursor, col_idx, *cell_data)
+            else:
+                worksheet.write(row_cursor, col_idx, cell_data, fmt)
+        row_cursor += 1
+    else:  # num_matches > 1
+        # ИСПРАВЛЕНИЕ: Объединяем ячейки только если строк больше одной
+        start_row = row_cursor
+        end_row = row_cursor + num_matches - 1
+
+        if merge_cells:
+            for col_idx, data in enumerate(main_info):
+                worksheet.merge_range(start_row, col_idx, end_row, col_idx, data, main_cell_format)
+
+        for match_info in all_matches:
+            if not merge_cells:
+                # Строки пишутся строго по порядку: левые колонки группы - в той же строке, что и совпадение
+                if row_cursor == start_row:
+                    worksheet.write_row(row_cursor, 0, main_info, main_cell_format)
+                else:
+                    for col_idx in range(len(main_info)):
+                        worksheet.write_blank(row_cursor, col_idx, None, main_cell_format)
+            match_row_data = _get_match_row_data(match_info, vuln_words, formats, min_word_len)
+            for col_idx_offset, cell_data in enumerate(match_row_data):
+                col_idx_abs = 7 + col_idx_offset
+                if isinstance(cell_data, list):
+                    worksheet.write_blank(row_cursor, col_idx_abs, None, match_cell_format)
+                    worksheet.write_rich_string(row_cursor, col_idx_abs, *cell_data)
+                else:
+                    worksheet.write(row_cursor, col_idx_abs, cell_data, match_cell_format)
+            row_cursor += 1
+    return row_cursor
+
+
+def _get_match_row_data(match_info: Dict, vuln_words: Set[str], formats: Dict, min_word_len: int) -> list:
     """Вспомогательная функция для получения данных для правых колонок таблицы."""
     match_type = match_info['type']
     match_data = match_info['data']
@@ -194,24 +230,34 @@ def _get_match_row_data(match_info: Dict, item: Dict, formats: Dict, min_word_le
     elif match_type == 'journal':
         return ['Журнал Публикаций', match_data['product'], 'N/A', match_data['id_ppts'], match_data['responsible'],
                 match_data['status']]
+    elif match_type == 'learned':
+        # Решение ЖП по тому же (или похожему) продукту - кандидат без сопоставления с ППТС
+        label = 'ЖП: решение по продукту' + (' (точно)' if match_data['match'] == 'exact' else ' (похоже)')
+        return [label, match_data['product'], 'N/A', match_data['id_ppts'], match_data['responsible'],
+                match_data['status']]
     elif match_type == 'ppts':
-        full_ppts_name = f"{match_data['vendor']} - {match_data['name']}"
-        rich_text = _format_rich_text_match(full_ppts_name, item.get('vuln_words_set', set()), min_word_len, formats)
-        return ['ППТС', rich_text, match_data['index'], match_data['id_ppts'], '', '']
+        full_ppts_name = f"{match_data.vendor} - {match_data.name}"
+        rich_text = _format_rich_text_match(full_ppts_name, vuln_words, min_word_len, formats)
+        return ['ППТС', rich_text, match_data.index, match_data.id_ppts, '', '']
     return ['' for _ in range(6)]  # Возвращаем пустые ячейки на всякий случай
 
 
 def generate_report(
-        processed_data_list: List[Dict], output_path: str, config: Any,
-        responsible_person: str = "", publication_source: str = ""
+        processed_data_list: List[ResultRecord], output_path: str, config: Any,
+        responsible_person: str = "", publication_source: str = "",
+        row_publications: Optional[List[str]] = None
 ):
-    """Основная функция (Версия 5, финальная)."""
+    """
+    Основная функция (Версия 5, финальная).
+    row_publications - источник публикации для каждой строки (сводный отчет пакетного запуска).
+    """
     try:
         with pd.ExcelWriter(output_path, engine='xlsxwriter') as writer:
             workbook = writer.book
             formats = _define_formats(workbook)
 
-            _create_main_sheet(writer, processed_data_list, formats, responsible_person, publication_source)
+            _create_main_sheet(writer, processed_data_list, formats, responsible_person, publication_source,
+                               row_publications)
             _create_detailed_sheet(writer, processed_data_list, formats, config)
 
         print(f"Отчет успешно сохранен в: {output_path}")
@@ -219,6 +265,49 @@ def generate_report(
         print(f"ОШИБКА: Не удалось создать отчет. Проверьте, что файл не открыт в другой программе. Ошибка: {e}")
 
 
+class StreamingReport:
+    """
+    Отчет для режима полного каталога (catalog_run): строки пишутся сразу по мере получения
+    результатов, а xlsxwriter в режиме constant_memory сбрасывает каждую законченную строку
+    на диск - память не растет с числом строк. Листы те же, что у generate_report, но на листе
+    'Детальный анализ' ячейки не объединяются (constant_memory этого не поддерживает).
+    """
+
+    def __init__(self, output_path: str, config: Any, responsible_person: str = "", publication_source: str = ""):
+        import xlsxwriter
+
+        self.output_path = output_path
+        self.responsible_person = responsible_person
+        self.publication_source = publication_source
+        self.today_date = datetime.now().strftime("%d.%m.%Y")
+        self.min_word_len = config.getint('Settings', 'min_word_length', fallback=3)
+
+        self.workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+        self.formats = _define_formats(self.workbook)
+        self.main_sheet = self.workbook.add_worksheet(MAIN_SHEET_NAME)
+        self.detail_sheet = self.workbook.add_worksheet(DETAIL_SHEET_NAME)
+        # В constant_memory строки пишутся только по порядку: заголовки - сразу
+        self.main_sheet.write_row('A1', MAIN_HEADER, self.formats['header'])
+        self.detail_sheet.write_row('A1', DETAIL_HEADER, self.formats['header'])
+        _set_detail_widths(self.detail_sheet)
+        self.main_row = 1
+        self.detail_row = 1
+
+    def write(self, items: List[ResultRecord]):
+        """Дописывает порцию результатов в оба листа."""
+        for item in items:
+            row = _main_row(item, self.today_date, self.responsible_person, self.publication_source)
+            # Пустые ячейки ТСУ (NaN) пишутся пустыми, как при to_excel
+            self.main_sheet.write_row(self.main_row, 0, [None if value != value else value for value in row])
+            self.main_row += 1
+            self.detail_row = _write_detail_item(self.detail_sheet, self.detail_row, item, self.formats,
+                                                 self.min_word_len, merge_cells=False)
+
+    def close(self):
+        _format_main_sheet(self.main_sheet, self.formats, self.responsible_person, self.main_row)
+        self.workbook.close()
+
+
 if __name__ == '__main__':
     from configparser import ConfigParser
 
@@ -226,35 +315,43 @@ if __name__ == '__main__':
     mock_config.add_section('Settings')
     mock_config.set('Settings', 'min_word_length', '3')
 
+    from src.result_records import PptsMatch
+
     # Тестовые данные, в точности повторяющие ваш случай
     mock_processed_data = [
-        {
-            'source_data': {'id_num': 1, 'cve': 'CVE-2025-0001', 'product': 'Microsoft - Windows 10 and Windows 11',
-                            'cvss': '8.8 High'},
-            'final_status': '', 'final_id': '', 'journal_matches': [],
-            'ppts_matches': [
-                {'index': 3, 'id_ppts': 'WIN-11', 'vendor': 'Microsoft', 'name': 'Windows 11 Pro'},
-                {'index': 2, 'id_ppts': 'WIN-SRV', 'vendor': 'Microsoft', 'name': 'Windows Server'}
-            ],
-            'vuln_words_set': {'microsoft', 'windows', '10', '11'}, 'status_source': 'ppts_match'
-        },
-        {
-            'source_data': {'id_num': 2, 'cve': 'CVE-2025-0002', 'product': 'Super Old Java Vulnerability',
-                            'cvss': '7.5 High'},
-            'final_status': 'ПОВТОР', 'final_id': '', 'ppts_matches': [],
-            'journal_matches': [
-                {'status': 'ДА', 'id_ppts': 'JAVA-ID', 'product': 'Oracle Java SE', 'responsible': 'Иванов И.И.'}],
-            'vuln_words_set': {'super', 'old', 'java', 'vulnerability'}, 'status_source': 'journal'
-        },
-        {
-            'source_data': {'id_num': 3, 'cve': 'CVE-2025-0003', 'product': 'WordPress Plugin XYZ',
-                            'cvss': '9.8 Critical'},
-            'final_status': 'НЕТ', 'final_id': '-----------', 'journal_matches': [],
-            'ppts_matches': [
-                {'index': 1, 'id_ppts': 'WP-PLUGIN-GENERIC', 'vendor': '', 'name': 'Generic WordPress Plugin'}],
-            'vuln_words_set': {'wordpress', 'plugin', 'xyz'}, 'status_source': 'config',
-            'matched_rule': {'raw': 'WordPress;;1', 'id': 'wordpresspriorityrule'}
-        }
+        ResultRecord(
+            id_num=1, cve='CVE-2025-0001', cvss='8.8 High', product='Microsoft - Windows 10 and Windows 11',
+            source_url='', final_status='', final_id='', status_source='ppts_match', matched_rule=None,
+            journal_matches=(),
+            ppts_matches=(
+                PptsMatch(('WIN-11', 'Windows 11 Pro', 'Microsoft', 'local'), 3, 2, 100, 1, 1),
+                PptsMatch(('WIN-SRV', 'Windows Server', 'Microsoft', 'general'), 2, 2, 100, 1, 1),
+            ),
+            raw_scores=None, learned_match=None
+        ),
+        ResultRecord(
+            id_num=2, cve='CVE-2025-0002', cvss='7.5 High', product='Super Old Java Vulnerability',
+            source_url='', final_status='ПОВТОР', final_id='', status_source='journal', matched_rule=None,
+            journal_matches=(
+                {'status': 'ДА', 'id_ppts': 'JAVA-ID', 'product': 'Oracle Java SE', 'responsible': 'Иванов И.И.'},
+            ),
+            ppts_matches=(), raw_scores=None, learned_match=None
+        ),
+        ResultRecord(
+            id_num=3, cve='CVE-2025-0003', cvss='9.8 Critical', product='WordPress Plugin XYZ',
+            source_url='', final_status='НЕТ', final_id='-----------', status_source='config',
+            matched_rule={'raw': 'WordPress;;1', 'id': 'wordpresspriorityrule'}, journal_matches=(),
+            ppts_matches=(PptsMatch(('WP-PLUGIN-GENERIC', 'Generic WordPress Plugin', '', 'local'), 1, 2, 80, 0, 2),),
+            raw_scores=None, learned_match=None
+        ),
+        ResultRecord(
+            id_num=4, cve='CVE-2025-0004', cvss='5.3 Medium', product='Google Inc - Kubernetes 1.30',
+            source_url='', final_status='', final_id='', status_source='journal_learned', matched_rule=None,
+            journal_matches=(), ppts_matches=(), raw_scores=None,
+            learned_match={'status': 'ДА', 'id_ppts': 'COM-7303', 'product': 'Google Inc, Kubernetes 1.20',
+                           'responsible': 'Иванов И.И.', 'cve': 'CVE-2021-1', 'count': 2, 'total': 2,
+                           'match': 'exact'}
+        ),
     ]
 
     print("--- Тестирование модуля report_generator (v5) ---")
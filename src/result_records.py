@@ -0,0 +1,117 @@
+# ==================================================================================
+# МОДУЛЬ 20: КОМПАКТНЫЕ ЗАПИСИ РЕЗУЛЬТАТОВ
+# all_results хранит по одной ResultRecord на строку ТСУ вместо словаря словарей:
+#   - поля строки ТСУ лежат прямо в записи (без копии row._asdict());
+#   - совпадения в ППТС - PptsMatch: ссылка на общий кортеж строки ППТС из индекса
+#     (id_ppts, name, vendor, source) и несколько чисел, без копий строк вендора/имени;
+#   - множество слов продукта не хранится, а считается при формировании отчета;
+#   - learned_match - решение ЖП по тому же продукту (journal_learned) или None.
+# Классы со __slots__ не создают словарь атрибутов на каждый объект.
+# Модуль легкий (без pandas/fuzzywuzzy): его читают и отчет, и вкладка "Результаты".
+# ==================================================================================
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+
+# Порядок полей строки ТСУ (как в data_loader.load_vulnerabilities)
+SOURCE_FIELDS = ('id_num', 'cve', 'cvss', 'product', 'source_url')
+
+
+@dataclass
+class PptsMatch:
+    """Совпадение в ППТС: ссылка на строку индекса ППТС и оценки движка."""
+    __slots__ = ('row', 'index', 'matched_words_count', 'avg_similarity', 'vendor_matched', 'product_matched')
+
+    row: Tuple[Any, Any, Any, Any]
+    index: int
+    matched_words_count: int
+    avg_similarity: int
+    vendor_matched: int
+    product_matched: int
+
+    @property
+    def id_ppts(self) -> Any:
+        return self.row[0]
+
+    @property
+    def name(self) -> Any:
+        return self.row[1]
+
+    @property
+    def vendor(self) -> Any:
+        return self.row[2]
+
+    @property
+    def source(self) -> Any:
+        return self.row[3]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Словарь в прежнем формате find_best_matches."""
+        return {
+            'id_ppts': self.id_ppts, 'name': self.name, 'vendor': self.vendor, 'source': self.source,
+            'index': self.index, 'matched_words_count': self.matched_words_count,
+            'avg_similarity': self.avg_similarity,
+            'vendor_matched': self.vendor_matched, 'product_matched': self.product_matched
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PptsMatch':
+        return cls((data['id_ppts'], data['name'], data['vendor'], data['source']), data['index'],
+                   data['matched_words_count'], data['avg_similarity'],
+                   data['vendor_matched'], data['product_matched'])
+
+
+@dataclass
+class ResultRecord:
+    """Одна строка all_results: данные ТСУ, найденные совпадения и принятое решение."""
+    __slots__ = SOURCE_FIELDS + ('final_status', 'final_id', 'status_source', 'matched_rule',
+                                 'journal_matches', 'ppts_matches', 'raw_scores', 'learned_match')
+
+    id_num: Any
+    cve: Any
+    cvss: Any
+    product: Any
+    source_url: Any
+    final_status: str
+    final_id: str
+    status_source: str
+    matched_rule: Optional[Dict[str, Any]]
+    journal_matches: Tuple[Dict[str, Any], ...]
+    ppts_matches: Tuple[PptsMatch, ...]
+    raw_scores: Optional[Dict[str, Any]]
+    learned_match: Optional[Dict[str, Any]]
+
+    def vuln_words(self, min_word_length: int) -> Set[str]:
+        """Слова продукта уязвимости (вендор + продукт), как их видит движок сравнения."""
+        from src import comparison_engine
+
+        vendor_str, product_str = comparison_engine._split_vuln_product(self.product)
+        return comparison_engine._prepare_words(f"{vendor_str} {product_str}", min_word_length)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Представление для передачи в JSON (служба analysis_service)."""
+        data = {field: getattr(self, field) for field in SOURCE_FIELDS}
+        data.update({
+            'final_status': self.final_status, 'final_id': self.final_id,
+            'status_source': self.status_source, 'matched_rule': self.matched_rule,
+            'journal_matches': list(self.journal_matches),
+            'ppts_matches': [m.to_dict() for m in self.ppts_matches],
+            'raw_scores': self.raw_scores, 'learned_match': self.learned_match,
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ResultRecord':
+        raw_scores = data.get('raw_scores')
+        if raw_scores is not None:
+            # После JSON кортежи стали списками - возвращаем кортежи (строка ППТС, оценки слов)
+            raw_scores = dict(raw_scores, rows=[
+                (row_id, tuple(ppts_row), tuple(map(tuple, vendor_scores)), tuple(map(tuple, product_scores)))
+                for row_id, ppts_row, vendor_scores, product_scores in raw_scores['rows']
+            ])
+        return cls(
+            *(data.get(field) for field in SOURCE_FIELDS),
+            data['final_status'], data['final_id'], data['status_source'], data.get('matched_rule'),
+            tuple(data['journal_matches']), tuple(PptsMatch.from_dict(m) for m in data['ppts_matches']),
+            raw_scores, data.get('learned_match')
+        )
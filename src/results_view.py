@@ -0,0 +1,93 @@
+# ==================================================================================
+# МОДУЛЬ 14: ДАННЫЕ ДЛЯ ВКЛАДКИ "РЕЗУЛЬТАТЫ"
+# Фильтрация, постраничная разбивка и форматирование all_results для просмотра
+# прямо в окне, без формирования и открытия res_tmp_report.xlsx.
+# Модуль не зависит от customtkinter: окно только отображает готовые строки.
+# ==================================================================================
+
+from typing import List, Optional, Tuple
+
+from src.result_records import ResultRecord
+
+PAGE_SIZE = 50
+
+ALL_LABEL = "Все"
+MANUAL_LABEL = "РУЧНОЙ АНАЛИЗ"
+NO_MATCHES_LABEL = "Без совпадений"
+
+STATUS_FILTER_VALUES = [ALL_LABEL, MANUAL_LABEL, "ПОВТОР", "ДА", "УСЛОВНО", "Linux", "НЕТ"]
+INDEX_FILTER_VALUES = [ALL_LABEL, "3", "2", "1", NO_MATCHES_LABEL]
+
+COLUMNS = [("№", 50), ("CVE", 130), ("Продукт", 300), ("Статус", 110), ("ID ППТС", 110), ("Индекс", 60)]
+
+
+def status_label(item: ResultRecord) -> str:
+    return item.final_status or MANUAL_LABEL
+
+
+def top_index(item: ResultRecord) -> Optional[int]:
+    """Индекс лучшего совпадения в ППТС (совпадения уже отсортированы движком)."""
+    matches = item.ppts_matches
+    return matches[0].index if matches else None
+
+
+def filter_results(results: List[ResultRecord], status: str = ALL_LABEL, index: str = ALL_LABEL) -> List[int]:
+    """Возвращает позиции строк all_results, подходящих под фильтры статуса и индекса."""
+    positions = []
+    for pos, item in enumerate(results):
+        if status != ALL_LABEL and status_label(item) != status:
+            continue
+        if index != ALL_LABEL:
+            item_index = top_index(item)
+            if index == NO_MATCHES_LABEL:
+                if item_index is not None:
+                    continue
+            elif item_index is None or str(item_index) != index:
+                continue
+        positions.append(pos)
+    return positions
+
+
+def page_bounds(total: int, page: int, page_size: int = PAGE_SIZE) -> Tuple[int, int, int]:
+    """Границы страницы (start, end) и количество страниц; page приводится к допустимому."""
+    pages = max(1, (total + page_size - 1) // page_size)
+    page = min(max(page, 0), pages - 1)
+    start = page * page_size
+    return start, min(start + page_size, total), pages
+
+
+def format_row(item: ResultRecord) -> List[str]:
+    """Значения колонок COLUMNS для одной строки таблицы."""
+    index = top_index(item)
+    return [
+        str(item.id_num), str(item.cve), str(item.product),
+        status_label(item), str(item.final_id), '-' if index is None else str(index)
+    ]
+
+
+def format_details(item: ResultRecord) -> str:
+    """Подробности по строке (то же, что правая часть листа 'Детальный анализ'), строятся по запросу."""
+    lines = [
+        f"{item.cve}: {item.product}",
+        f"Решение: {status_label(item)}  ID ППТС: {item.final_id or '-'}",
+        f"CVSS: {item.cvss}  Источник: {item.source_url}",
+        "",
+    ]
+
+    journal_matches = item.journal_matches
+    if journal_matches:
+        lines.append(f"Журнал Публикаций ({len(journal_matches)}):")
+        for m in journal_matches:
+            lines.append(f"  {m.get('status', '')} | {m.get('id_ppts', '')} | {m.get('responsible', '')} | "
+                         f"{m.get('product', '')}")
+
+    ppts_matches = item.ppts_matches
+    if ppts_matches:
+        lines.append(f"Совпадения в ППТС ({len(ppts_matches)}):")
+        for m in ppts_matches:
+            lines.append(f"  Индекс {m.index} | {m.id_ppts} | {m.vendor} - {m.name} | "
+                         f"слов {m.matched_words_count}, схожесть {m.avg_similarity}%")
+
+    if not journal_matches and not ppts_matches:
+        lines.append("Совпадений нет.")
+    return "\n".join(lines)
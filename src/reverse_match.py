@@ -0,0 +1,311 @@
+# ==================================================================================
+# МОДУЛЬ 27: ОБРАТНОЕ СОПОСТАВЛЕНИЕ (НОВЫЕ СТРОКИ ППТС -> ИСТОРИЯ)
+# Когда в ППТС добавляют продукты, нужно узнать, какие уже опубликованные уязвимости
+# (продукты из ЖП и, по желанию, из прошлых ТСУ) теперь с ними совпадают, не запуская
+# весь анализ заново:
+#   python main.py reverse --previous-ppts-local ppts_local_old.xlsx [--history tsu.xlsx]
+#   - новые и измененные строки ППТС - строки текущего ППТС, которых нет в прежней версии;
+#   - по истории строится словарь слов продуктов "слово -> продукты";
+#   - для каждого слова новых строк ППТС отбираются слова истории, которые могут дать
+#     совпадение (префикс или fuzz.ratio не ниже fuzz_ratio_threshold), и только
+#     продукты с этими словами проверяются как в прямом анализе: _compare_word_sets
+#     по словам вендора и продукта и тот же расчет Индекса (_match_from_metrics).
+# Объем работы зависит от числа новых строк ППТС и словаря истории, а не от числа
+# строк ЖП. Ограничение index1_results_limit не применяется: оно относится к списку
+# совпадений одной уязвимости со всем ППТС, а здесь проверяются только новые строки.
+# Результат - reverse_matches.csv в папке отчетов.
+# ==================================================================================
+
+import csv
+import os
+import time
+from typing import Any, Callable, Dict, List, Set
+
+REVERSE_FILE_NAME = "reverse_matches.csv"
+
+ORIGIN_JOURNAL = 'ЖП'
+ORIGIN_TSU = 'ТСУ'
+
+# Сколько CVE продукта показывать в строке результата (остальные - только числом)
+MAX_LISTED_CVES = 10
+
+
+def changed_ppts_rows(ppts_df: Any, previous_df: Any) -> Any:
+    """Строки ppts_df, которых нет в прежней версии ППТС (новые и измененные)."""
+    from src import ppts_update
+
+    if previous_df is None or previous_df.empty:
+        return ppts_df
+    columns = ppts_update.PPTS_COLUMNS
+    previous = {ppts_update.row_key(row) for row in previous_df[columns].itertuples(index=False, name=None)}
+    mask = [ppts_update.row_key(row) not in previous for row in ppts_df[columns].itertuples(index=False, name=None)]
+    return ppts_df[mask]
+
+
+def build_history_index(history: List[Dict[str, Any]], min_word_length: int) -> Dict[str, Any]:
+    """
+    Индекс исторических продуктов.
+
+    Args:
+        history: Записи с ключами 'product', 'origin' (ЖП/ТСУ), 'cve' и, для ЖП, 'status', 'id_ppts'.
+
+    Returns:
+        Словарь 'min_word_length', 'products' (по одному на уникальную строку продукта: слова вендора
+        и продукта как в прямом анализе, источники, CVE и статусы ЖП) и 'word_products'
+        (слово -> номера продуктов, где оно есть в вендоре или продукте).
+    """
+    from src import comparison_engine
+
+    products: List[Dict[str, Any]] = []
+    by_product: Dict[str, int] = {}
+    word_products: Dict[str, Set[int]] = {}
+    for record in history:
+        product = record.get('product')
+        if not isinstance(product, str) or not product.strip():
+            continue
+        product_id = by_product.get(product)
+        if product_id is None:
+            vendor_str, product_str = comparison_engine._split_vuln_product(product)
+            entry = {
+                'product': product,
+                'vendor_words': comparison_engine._prepare_words(vendor_str, min_word_length),
+                'product_words': comparison_engine._prepare_words(product_str, min_word_length),
+                'origins': set(), 'cves': [], 'statuses': set(),
+            }
+            if not entry['vendor_words'] and not entry['product_words']:
+                continue
+            product_id = by_product[product] = len(products)
+            products.append(entry)
+            for word in entry['vendor_words'] | entry['product_words']:
+                word_products.setdefault(word, set()).add(product_id)
+        entry = products[product_id]
+        entry['origins'].add(record.get('origin', ORIGIN_JOURNAL))
+        cve = record.get('cve')
+        if isinstance(cve, str) and cve.strip() and cve.strip() not in entry['cves']:
+            entry['cves'].append(cve.strip())
+        status = record.get('status')
+        if isinstance(status, str) and status.strip():
+            entry['statuses'].add(status.strip())
+    return {'min_word_length': min_word_length, 'products': products, 'word_products': word_products}
+
+
+def history_records(journal_df: Any, tsu_frames: List[Any] = ()) -> List[Dict[str, Any]]:
+    """Записи истории из ЖП и прошлых ТСУ для build_history_index."""
+    records = []
+    if journal_df is not None and not journal_df.empty:
+        for record in journal_df.to_dict('records'):
+            records.append({'product': record.get('product'), 'cve': record.get('cve'), 'status': record.get('status'),
+                            'origin': ORIGIN_JOURNAL})
+    for df in tsu_frames:
+        if df is not None and not df.empty:
+            for record in df.to_dict('records'):
+                records.append({'product': record.get('product'), 'cve': record.get('cve'), 'origin': ORIGIN_TSU})
+    return records
+
+
+def _candidate_history_words(p_word: str, vocabulary: List[str], settings: Dict[str, int],
+                             stats: Dict[str, int]) -> List[str]:
+    """
+    Слова истории, которые в _compare_word_sets могут совпасть со словом ППТС p_word:
+    p_word начинается с них при пороге префикса 100 или fuzz.ratio не ниже fuzz_ratio_threshold.
+    """
+    from src import comparison_engine, scorers
+
+    stats['fuzz_comparisons'] += len(vocabulary)
+    threshold = settings['fuzz_ratio_threshold']
+    candidates = []
+    # fuzz.ratio симметричен: оценки слова ППТС против всего словаря истории - одним вызовом
+    for v_word, ratio in zip(vocabulary, scorers.ratios(p_word, vocabulary)):
+        if p_word.startswith(v_word) and comparison_engine._prefix_threshold(len(v_word), settings) == 100:
+            candidates.append(v_word)
+        elif ratio >= threshold:
+            candidates.append(v_word)
+    return candidates
+
+
+def reverse_matches(new_ppts_df: Any, history_index: Dict[str, Any], settings: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Совпадения новых строк ППТС с историческими продуктами.
+
+    Returns:
+        Словарь 'matches' - список (строка_ППТС, продукт_истории, PptsMatch), по каждой строке ППТС
+        в порядке Индекса/слов/схожести, и 'stats' - счетчики работы.
+    """
+    from src import comparison_engine
+
+    min_word_length = history_index['min_word_length']
+    vocabulary = list(history_index['word_products'])
+    word_cache: Dict[str, List[str]] = {}
+    stats = {'ppts_rows': 0, 'candidates': 0, 'fuzz_comparisons': 0, 'matches': 0}
+    matches = []
+
+    for row in new_ppts_df.itertuples(index=False):
+        stats['ppts_rows'] += 1
+        ppts_row = (row.id_ppts, row.name, row.vendor, row.source)
+        ppts_words = comparison_engine._prepare_words(f"{row.vendor} {row.name}", min_word_length)
+        candidates: Set[int] = set()
+        for p_word in ppts_words:
+            history_words = word_cache.get(p_word)
+            if history_words is None:
+                history_words = word_cache[p_word] = _candidate_history_words(p_word, vocabulary, settings, stats)
+            for v_word in history_words:
+                candidates.update(history_index['word_products'][v_word])
+        stats['candidates'] += len(candidates)
+
+        row_matches = []
+        for product_id in sorted(candidates):
+            entry = history_index['products'][product_id]
+            match = comparison_engine._match_from_metrics(
+                ppts_row,
+                comparison_engine._compare_word_sets(entry['vendor_words'], ppts_words, settings),
+                comparison_engine._compare_word_sets(entry['product_words'], ppts_words, settings),
+                settings
+            )
+            if match is not None:
+                row_matches.append((ppts_row, entry, match))
+        row_matches.sort(key=lambda x: (-x[2].index, -x[2].matched_words_count, -x[2].avg_similarity))
+        matches.extend(row_matches)
+    stats['matches'] = len(matches)
+    return {'matches': matches, 'stats': stats}
+
+
+def result_rows(matches: List[tuple]) -> List[Dict[str, Any]]:
+    """Строки reverse_matches.csv."""
+    rows = []
+    for (id_ppts, name, vendor, source), entry, match in matches:
+        cves = entry['cves']
+        listed = ", ".join(cves[:MAX_LISTED_CVES])
+        if len(cves) > MAX_LISTED_CVES:
+            listed += f" и еще {len(cves) - MAX_LISTED_CVES}"
+        rows.append({
+            'id_ppts': id_ppts, 'ppts_vendor': vendor, 'ppts_name': name, 'ppts_source': source,
+            'product': entry['product'], 'origin': ", ".join(sorted(entry['origins'])),
+            'cve_count': len(cves), 'cves': listed, 'journal_statuses': ", ".join(sorted(entry['statuses'])),
+            'index': match.index, 'matched_words_count': match.matched_words_count,
+            'avg_similarity': match.avg_similarity,
+        })
+    return rows
+
+
+def write_rows(rows: List[Dict[str, Any]], path: str):
+    """Сохраняет результат в CSV (разделитель ';' - открывается в Excel)."""
+    fieldnames = ['id_ppts', 'ppts_vendor', 'ppts_name', 'ppts_source', 'product', 'origin', 'cve_count', 'cves',
+                  'journal_statuses', 'index', 'matched_words_count', 'avg_similarity']
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=';')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_reverse(
+        paths: Dict[str, str], config: Any, previous_paths: Dict[str, str],
+        history_paths: List[str] = (), log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Сценарий команды 'reverse'.
+
+    Args:
+        previous_paths: Прежние версии ППТС ('ppts_local', 'ppts_general'); не указанный файл
+            считается неизменным (берется текущий).
+        history_paths: Прошлые ТСУ, продукты которых проверяются вместе с продуктами ЖП.
+
+    Returns:
+        Сводка: 'ok', 'output_path', 'counts', 'timings' и 'results' (строки CSV).
+    """
+    from src import comparison_engine, data_loader, scorers
+
+    summary: Dict[str, Any] = {'ok': False, 'output_path': None, 'counts': {}, 'timings': {}, 'results': []}
+    if not all(paths.get(key) for key in ['ppts_local', 'ppts_general', 'journal', 'output_folder']):
+        log("Ошибка: Укажите пути к ППТС, ЖП и папке отчетов.")
+        summary['error'] = 'missing_paths'
+        return summary
+    if not any(previous_paths.get(key) for key in ('ppts_local', 'ppts_general')):
+        log("Ошибка: Укажите прежнюю версию локального и/или общего ППТС.")
+        summary['error'] = 'missing_previous_ppts'
+        return summary
+
+    started = time.perf_counter()
+    settings = comparison_engine._load_settings(config)
+    scorers.configure(config, log)
+    ppts_df = data_loader.load_ppts(paths['ppts_local'], paths['ppts_general'])
+    previous_df = data_loader.load_ppts(previous_paths.get('ppts_local') or paths['ppts_local'],
+                                        previous_paths.get('ppts_general') or paths['ppts_general'])
+    journal_df = data_loader.load_journal(paths['journal'])
+    tsu_frames = [data_loader.load_vulnerabilities(path) for path in history_paths]
+    summary['timings']['load'] = time.perf_counter() - started
+    if ppts_df.empty:
+        log("Ошибка: Не удалось загрузить ППТС.")
+        summary['error'] = 'empty_ppts'
+        return summary
+
+    stage_start = time.perf_counter()
+    new_df = changed_ppts_rows(ppts_df, previous_df)
+    history_index = build_history_index(history_records(journal_df, tsu_frames), settings['min_word_length'])
+    summary['timings']['index'] = time.perf_counter() - stage_start
+    log(f"Обратное сопоставление: новых/измененных строк ППТС {len(new_df)} из {len(ppts_df)}, "
+        f"продуктов в истории {len(history_index['products'])}, слов {len(history_index['word_products'])}.")
+
+    stage_start = time.perf_counter()
+    found = reverse_matches(new_df, history_index, settings)
+    summary['timings']['match'] = time.perf_counter() - stage_start
+
+    rows = result_rows(found['matches'])
+    output_path = os.path.join(paths['output_folder'], REVERSE_FILE_NAME)
+    write_rows(rows, output_path)
+    affected = {row['product'] for row in rows}
+    log(f"Обратное сопоставление: совпадений {len(rows)}, затронуто исторических продуктов {len(affected)}. "
+        f"Результат сохранен в {output_path}")
+
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {
+        'ppts': len(ppts_df), 'new_ppts': len(new_df), 'journal': len(journal_df),
+        'history_tsu': sum(len(df) for df in tsu_frames), 'history_products': len(history_index['products']),
+        'affected_products': len(affected), 'matches': len(rows),
+        'affected_cves': len({cve for row in found['matches'] for cve in row[1]['cves']}),
+    }
+    summary.update({'ok': True, 'output_path': output_path, 'engine': found['stats'], 'results': rows})
+    return summary
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from configparser import ConfigParser
+    from src import comparison_engine
+
+    mock_config = ConfigParser()
+    mock_config.read_dict({'Settings': {'min_word_length': '3', 'min_matched_words': '2',
+                                        'fuzz_ratio_threshold': '60', 'index1_results_limit': '100'}})
+    settings = comparison_engine._load_settings(mock_config)
+    previous_ppts = pd.DataFrame({
+        'id_ppts': ['ID-001', 'ID-002'], 'name': ['Windows Server 2019', 'Tomcat'],
+        'vendor': ['Microsoft', 'Apache'], 'source': ['local', 'general'],
+    })
+    ppts = pd.DataFrame({
+        'id_ppts': ['ID-001', 'ID-002', 'ID-003', 'ID-004'],
+        'name': ['Windows Server 2019', 'Tomcat Server', 'Chrome Browser', 'PostgreSQL Database'],
+        'vendor': ['Microsoft', 'Apache', 'Google', 'PostgreSQL Global Development Group'],
+        'source': ['local', 'general', 'local', 'local'],
+    })
+    journal = pd.DataFrame({
+        'product': ['Apache Software Foundation - Tomcat 9', 'Google Inc - Chrome 120', 'Microsoft - Windows 10',
+                    'Google LLC - Chromium', 'PostgreSQL - PostgreSQL 15', float('nan')],
+        'cve': ['CVE-1', 'CVE-2', 'CVE-3', 'CVE-4', 'CVE-5', 'CVE-6'],
+        'status': ['НЕТ', 'НЕТ', 'ДА', 'НЕТ', 'НЕТ', 'НЕТ'],
+    })
+
+    new_df = changed_ppts_rows(ppts, previous_ppts)
+    assert list(new_df['id_ppts']) == ['ID-002', 'ID-003', 'ID-004'], "измененная и новые строки"
+    history_index = build_history_index(history_records(journal), settings['min_word_length'])
+    found = reverse_matches(new_df, history_index, settings)
+
+    # Те же пары (продукт, строка ППТС), что дает прямой анализ каждого продукта истории по всему ППТС
+    reverse_pairs = {(entry['product'], match.id_ppts) for _, entry, match in found['matches']}
+    new_ids = set(new_df['id_ppts'])
+    forward_pairs = {(product, m['id_ppts']) for product in journal['product'].dropna()
+                     for m in comparison_engine.find_best_matches(product, ppts, mock_config) if m['id_ppts'] in new_ids}
+    assert reverse_pairs == forward_pairs, (reverse_pairs, forward_pairs)
+    for row in result_rows(found['matches']):
+        print(f"{row['id_ppts']} {row['ppts_vendor']} {row['ppts_name']} <- {row['product']} "
+              f"({row['cves']}; Индекс {row['index']}, слов {row['matched_words_count']})")
+    print(f"Обратное сопоставление совпадает с прямым: пар {len(reverse_pairs)}, "
+          f"сравнений fuzz.ratio {found['stats']['fuzz_comparisons']}.")
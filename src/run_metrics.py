@@ -0,0 +1,158 @@
+# ==================================================================================
+# МОДУЛЬ 19: МЕТРИКИ ЗАПУСКОВ
+# После каждого анализа и обновления ЖП формирует запись метрик: строки в секунду,
+# уникальные продукты, сравнения fuzz.ratio (выполненные и отсеченные индексом),
+# попадания в кэш оценок слов, количество по статусам, размеры и время загрузки файлов.
+# Запись дописывается строкой JSON в metrics.jsonl (папка отчетов) и, если задана
+# [Metrics] prometheus_textfile_dir, сохраняется в формате textfile collector
+# node_exporter: vuln_analyzer_<запуск>.prom.
+# ==================================================================================
+
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+METRICS_FILE_NAME = "metrics.jsonl"
+PROMETHEUS_PREFIX = "vuln_analyzer"
+
+# Пустой статус (ручной анализ) в метках Prometheus
+MANUAL_STATUS_LABEL = "manual"
+
+
+def file_sizes(paths: Dict[str, str], file_groups: Dict[str, List[str]]) -> Dict[str, Optional[int]]:
+    """Размер входных данных по группам (например, 'ppts' - локальный и общий ППТС вместе)."""
+    sizes: Dict[str, Optional[int]] = {}
+    for name, keys in file_groups.items():
+        try:
+            sizes[name] = sum(os.path.getsize(paths[key]) for key in keys)
+        except (OSError, KeyError, TypeError):
+            sizes[name] = None
+    return sizes
+
+
+def engine_delta(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, Any]:
+    """Счетчики движка за запуск (разница снимков comparison_engine.engine_stats) и производные доли."""
+    delta = {key: after[key] - before.get(key, 0) for key in after}
+    lookups = delta['word_lookups']
+    delta['fuzz_comparisons_pruned'] = max(0, delta['naive_comparisons'] - delta['fuzz_comparisons'])
+    delta['word_cache_hit_rate'] = delta['word_cache_hits'] / lookups if lookups else 0.0
+    return delta
+
+
+def build_record(
+        run: str, summary: Dict[str, Any], paths: Dict[str, str], file_groups: Dict[str, List[str]],
+        load_seconds: Optional[Dict[str, float]] = None, rows: int = 0,
+        distinct_products: Optional[int] = None, engine: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Собирает запись метрик по сводке запуска pipeline.run_analysis / run_update.
+
+    Args:
+        file_groups: Имя в метриках -> ключи путей, например {'ppts': ['ppts_local', 'ppts_general']}.
+        load_seconds: Время загрузки по тем же именам.
+    """
+    timings = summary.get('timings', {})
+    total = timings.get('total') or 0.0
+    load_seconds = load_seconds or {}
+    sizes = file_sizes(paths, file_groups)
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'unix_time': time.time(),
+        'run': run,
+        'ok': bool(summary.get('ok')),
+        'backend': summary.get('backend', 'local'),
+        'rows': rows,
+        'rows_per_second': rows / total if total else 0.0,
+        'distinct_products': distinct_products,
+        'statuses': summary.get('counts', {}).get('statuses', {}),
+        'files': {key: {'bytes': sizes[key], 'load_seconds': load_seconds.get(key)} for key in file_groups},
+        'stage_seconds': {k: v for k, v in timings.items() if k != 'total'},
+        'total_seconds': total,
+    }
+    if summary.get('matching'):
+        record['matching'] = summary['matching']
+    if engine is not None:
+        record['engine'] = engine
+    return record
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus(record: Dict[str, Any]) -> str:
+    """Текст в формате Prometheus exposition (для textfile collector node_exporter)."""
+    run = _label_value(record['run'])
+    lines: List[str] = []
+
+    def metric(name: str, help_text: str, samples: List[tuple]):
+        full_name = f"{PROMETHEUS_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} gauge")
+        for labels, value in samples:
+            if value is None:
+                continue
+            label_text = ",".join(f'{k}="{_label_value(v)}"' for k, v in [('run', run)] + labels)
+            lines.append(f"{full_name}{{{label_text}}} {float(value)!r}")
+
+    metric('last_run_timestamp_seconds', "Время завершения последнего запуска.", [([], record['unix_time'])])
+    metric('last_run_success', "1, если последний запуск завершился успешно.", [([], int(record['ok']))])
+    metric('rows', "Строк обработано в последнем запуске.", [([], record['rows'])])
+    metric('rows_per_second', "Пропускная способность последнего запуска.", [([], record['rows_per_second'])])
+    metric('duration_seconds', "Общее время последнего запуска.", [([], record['total_seconds'])])
+    if record.get('distinct_products') is not None:
+        metric('distinct_products', "Уникальных продуктов в ТСУ.", [([], record['distinct_products'])])
+    metric('status_rows', "Строк по итоговому статусу.",
+           [([('status', status or MANUAL_STATUS_LABEL)], count) for status, count in record['statuses'].items()])
+    metric('stage_seconds', "Время этапа последнего запуска.",
+           [([('stage', stage)], seconds) for stage, seconds in record['stage_seconds'].items()])
+    metric('file_bytes', "Размер входного файла.",
+           [([('file', key)], info['bytes']) for key, info in record['files'].items()])
+    metric('file_load_seconds', "Время загрузки входного файла.",
+           [([('file', key)], info['load_seconds']) for key, info in record['files'].items()])
+
+    matching = record.get('matching')
+    if matching:
+        metric('rows_decided_before_matching', "Строк, решенных ЖП или правилом priority=1 до сопоставления с ППТС.",
+               [([], matching['decided_before_matching'])])
+        metric('rows_learned', "Строк с кандидатом из решений ЖП по продукту (без сопоставления с ППТС).",
+               [([], matching.get('learned_rows', 0))])
+        metric('rows_reused', "Строк ТСУ, взятых из прошлого запуска без повторного анализа.",
+               [([], matching.get('reused_rows', 0))])
+
+    engine = record.get('engine')
+    if engine:
+        metric('fuzz_comparisons', "Выполнено сравнений fuzz.ratio.", [([], engine['fuzz_comparisons'])])
+        metric('fuzz_comparisons_pruned', "Сравнений, которых избежали индекс и кэш ППТС.",
+               [([], engine['fuzz_comparisons_pruned'])])
+        metric('word_cache_hit_ratio', "Доля попаданий в кэш оценок слов.", [([], engine['word_cache_hit_rate'])])
+    return "\n".join(lines) + "\n"
+
+
+def emit(record: Dict[str, Any], config: Any, output_folder: str, log: Callable[[str], None] = print):
+    """
+    Пишет запись в metrics.jsonl и, при настройке, в .prom-файл.
+    Ошибки записи только логируются: метрики не должны ломать сам анализ.
+    """
+    if config is not None and not config.getboolean('Metrics', 'enabled', fallback=True):
+        return
+
+    jsonl_path = (config.get('Metrics', 'jsonl_path', fallback='') if config is not None else '') or \
+        os.path.join(output_folder, METRICS_FILE_NAME)
+    try:
+        with open(jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        log(f"Не удалось записать метрики в {jsonl_path}: {e}")
+
+    textfile_dir = config.get('Metrics', 'prometheus_textfile_dir', fallback='') if config is not None else ''
+    if textfile_dir:
+        # node_exporter может прочитать файл в любой момент - пишем во временный и переименовываем
+        prom_path = os.path.join(textfile_dir, f"{PROMETHEUS_PREFIX}_{record['run']}.prom")
+        try:
+            with open(prom_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(format_prometheus(record))
+            os.replace(prom_path + '.tmp', prom_path)
+        except OSError as e:
+            log(f"Не удалось записать метрики Prometheus в {prom_path}: {e}")
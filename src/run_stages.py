@@ -0,0 +1,179 @@
+# ==================================================================================
+# МОДУЛЬ 16: ЗАМЕРЫ ЭТАПОВ ЗАПУСКА
+# Конвейер (pipeline.py) выполняет анализ явными этапами:
+#   загрузка -> индексы -> проверка ЖП -> сопоставление с ППТС -> статусы -> отчет.
+# Для каждого этапа фиксируются время (настенное и процессорное), количество строк
+# и пиковая память процесса. Сводка пишется в лог и в JSON рядом с отчетом.
+# Замер дешевый (несколько системных вызовов на этап), поэтому включен всегда.
+# Профилирование (cProfile + tracemalloc) включается отдельно: переменной окружения
+# VULN_ANALYZER_PROFILE=1 или настройкой [Diagnostics] profile = 1. Тогда для каждого
+# этапа в папку отчетов пишется <префикс>_<этап>.prof (смотреть snakeviz/pstats),
+# а в <префикс>_allocations.txt - самые крупные выделения памяти по этапам.
+# ==================================================================================
+
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+PROFILE_ENV_VAR = "VULN_ANALYZER_PROFILE"
+
+# Сколько строк с крупнейшими выделениями памяти выводить на этап и глубина стека tracemalloc
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 5
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Пиковый объем памяти процесса (peak RSS / PeakWorkingSetSize) или None, если узнать нельзя."""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return None
+            return int(counters.PeakWorkingSetSize)
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux отдает килобайты, macOS - байты
+        return int(peak if sys.platform == 'darwin' else peak * 1024)
+    except Exception:
+        return None
+
+
+def _mb(value: Optional[int]) -> Optional[float]:
+    return None if value is None else round(value / (1024 * 1024), 1)
+
+
+def profiling_enabled(config: Any = None) -> bool:
+    """Профилирование включено переменной окружения или настройкой [Diagnostics] profile."""
+    if os.environ.get(PROFILE_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes', 'on'):
+        return True
+    return config is not None and config.getboolean('Diagnostics', 'profile', fallback=False)
+
+
+def profile_prefix(config: Any, output_folder: str, run_name: str) -> Optional[str]:
+    """Префикс файлов профилирования в папке отчетов или None, если профилирование выключено."""
+    if not profiling_enabled(config) or not output_folder:
+        return None
+    return os.path.join(output_folder, f"profile_{run_name}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+
+class StageRecorder:
+    """
+    Собирает замеры этапов одного запуска:
+
+        recorder = StageRecorder()
+        with recorder.stage('match') as record:
+            ...
+            record['rows'] = len(rows)
+    """
+
+    def __init__(self, profile_prefix: Optional[str] = None):
+        """
+        Args:
+            profile_prefix: Путь-префикс для файлов профилирования (см. profile_prefix);
+                None - профилирование выключено.
+        """
+        self.stages: List[Dict[str, Any]] = []
+        self.profile_prefix = profile_prefix
+        self._allocation_lines: List[str] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        record: Dict[str, Any] = {'name': name, 'rows': rows}
+        profiler = self._start_profiling() if self.profile_prefix else None
+        peak_before = peak_rss_bytes()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = time.process_time() - cpu_start
+            if profiler is not None:
+                self._finish_profiling(name, record, *profiler)
+            peak_after = peak_rss_bytes()
+            record['peak_rss_mb'] = _mb(peak_after)
+            record['peak_rss_growth_mb'] = (_mb(peak_after - peak_before)
+                                            if peak_after is not None and peak_before is not None else None)
+            self.stages.append(record)
+
+    def _start_profiling(self):
+        import cProfile
+        import tracemalloc
+
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, started_tracing
+
+    def _finish_profiling(self, name: str, record: Dict[str, Any], profiler: Any, started_tracing: bool):
+        """Сохраняет .prof этапа и дописывает крупнейшие выделения памяти в отчет."""
+        import tracemalloc
+
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        record['traced_peak_mb'] = _mb(tracemalloc.get_traced_memory()[1])
+        if started_tracing:
+            tracemalloc.stop()
+
+        prof_path = f"{self.profile_prefix}_{name}.prof"
+        record['profile_path'] = prof_path
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        self._allocation_lines.append(
+            f"=== {name}: пик отслеживаемой памяти {record['traced_peak_mb']:.1f} МБ, "
+            f"крупнейшие живые выделения на конец этапа ==="
+        )
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            frame = stat.traceback[0]
+            self._allocation_lines.append(
+                f"{stat.size / 1024:10.1f} КБ  {stat.count:8d} блоков  {frame.filename}:{frame.lineno}"
+            )
+        self._allocation_lines.append("")
+        try:
+            profiler.dump_stats(prof_path)
+            with open(f"{self.profile_prefix}_allocations.txt", 'w', encoding='utf-8') as f:
+                f.write("\n".join(self._allocation_lines))
+        except OSError as e:
+            record['profile_error'] = str(e)
+
+    def timings(self) -> Dict[str, float]:
+        """Настенное время по этапам в формате summary['timings']."""
+        return {record['name']: record['wall_seconds'] for record in self.stages}
+
+    def format_lines(self) -> List[str]:
+        """Строки для лога: по одной на этап."""
+        lines = []
+        for r in self.stages:
+            rows = '' if r['rows'] is None else f", строк {r['rows']}"
+            memory = '' if r['peak_rss_mb'] is None else \
+                f", пик памяти {r['peak_rss_mb']:.1f} МБ (+{r['peak_rss_growth_mb']:.1f})"
+            lines.append(f"  {r['name']}: {r['wall_seconds']:.3f} с (ЦП {r['cpu_seconds']:.3f} с){rows}{memory}")
+        if self.profile_prefix:
+            lines.append(f"  профили этапов: {self.profile_prefix}_<этап>.prof, "
+                         f"выделения памяти: {self.profile_prefix}_allocations.txt")
+        return lines
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None):
+        """Сохраняет сводку этапов (и дополнительные поля, например счетчики) в JSON."""
+        record = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'stages': self.stages}
+        record.update(extra or {})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, indent=1, default=str)
@@ -0,0 +1,247 @@
+# ==================================================================================
+# МОДУЛЬ 29: РЕАЛИЗАЦИИ FUZZ.RATIO
+# Движок сравнения и соседние модули считают схожесть слов через этот модуль, а не
+# напрямую через fuzzywuzzy. Реализации (все дают одно и то же целое fuzz.ratio -
+# 100 * (1 - indel-расстояние / сумма длин), округление как в fuzzywuzzy):
+#   - rapidfuzz  - слово против всего списка слов одним вызовом process.cdist (C++);
+#   - fuzzywuzzy - fuzz.ratio по одной паре (с python-Levenshtein, как в requirements.txt;
+#                  без него fuzzywuzzy считает через difflib другие числа и не предлагается);
+#   - python     - чистый Python (LCS битовыми масками), если нет ни того, ни другого.
+# Выбор - настройка [Performance] scorer: auto (первая доступная в порядке выше) или имя.
+# Одинаковость оценок проверяет python -m src.scorers на большом наборе пар слов, так что
+# смена реализации влияет только на скорость.
+# ==================================================================================
+
+import random
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+AUTO = 'auto'
+BACKEND_ORDER = ('rapidfuzz', 'fuzzywuzzy', 'python')
+
+# Выбранная реализация процесса: {'name', 'ratio', 'ratios'}
+_active: Dict[str, Any] = {}
+
+
+def _ratio_from_distance(distance: int, length_sum: int) -> int:
+    """Та же арифметика, что в Levenshtein.ratio + fuzzywuzzy.utils.intr."""
+    return int(round(100 * (1.0 - distance / length_sum)))
+
+
+def _rapidfuzz_backend() -> Dict[str, Any]:
+    import numpy as np
+    from rapidfuzz import process
+    from rapidfuzz.distance import Indel
+
+    def ratio(s1: str, s2: str) -> int:
+        if s1 == s2:
+            return 100
+        if not s1 or not s2:
+            return 0
+        return _ratio_from_distance(Indel.distance(s1, s2), len(s1) + len(s2))
+
+    def ratios(word: str, choices: Sequence[str]) -> List[int]:
+        if not word or not len(choices):
+            return [100 if choice == word else 0 for choice in choices]
+        distances = process.cdist([word], choices, scorer=Indel.distance, dtype=np.int32, workers=1)[0]
+        length_sums = np.fromiter(map(len, choices), dtype=np.int64, count=len(choices)) + len(word)
+        # Пустые слова списка: расстояние = длине слова, оценка 0, как у fuzzywuzzy
+        return np.rint(100 * (1.0 - distances / length_sums)).astype(np.int64).tolist()
+
+    return {'name': 'rapidfuzz', 'ratio': ratio, 'ratios': ratios}
+
+
+def _fuzzywuzzy_backend() -> Dict[str, Any]:
+    from fuzzywuzzy import fuzz
+
+    if fuzz.SequenceMatcher.__module__ != 'fuzzywuzzy.StringMatcher':
+        raise ImportError("fuzzywuzzy без python-Levenshtein")
+
+    def ratios(word: str, choices: Sequence[str]) -> List[int]:
+        return [fuzz.ratio(word, choice) for choice in choices]
+
+    return {'name': 'fuzzywuzzy', 'ratio': fuzz.ratio, 'ratios': ratios}
+
+
+def _char_masks(word: str) -> Dict[str, int]:
+    masks: Dict[str, int] = {}
+    for position, char in enumerate(word):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+
+def _lcs_length(masks: Dict[str, int], length: int, other: str) -> int:
+    """Длина наибольшей общей подпоследовательности (битовый алгоритм Хиерре)."""
+    full = (1 << length) - 1
+    v = full
+    for char in other:
+        u = v & masks.get(char, 0)
+        v = ((v + u) | (v - u)) & full
+    return length - v.bit_count()
+
+
+def _python_backend() -> Dict[str, Any]:
+    def ratios(word: str, choices: Sequence[str]) -> List[int]:
+        masks = _char_masks(word)
+        length = len(word)
+        scores = []
+        for choice in choices:
+            if choice == word:
+                scores.append(100)
+            elif not word or not choice:
+                scores.append(0)
+            else:
+                length_sum = length + len(choice)
+                scores.append(_ratio_from_distance(length_sum - 2 * _lcs_length(masks, length, choice), length_sum))
+        return scores
+
+    def ratio(s1: str, s2: str) -> int:
+        return ratios(s1, (s2,))[0]
+
+    return {'name': 'python', 'ratio': ratio, 'ratios': ratios}
+
+
+_FACTORIES: Dict[str, Callable[[], Dict[str, Any]]] = {
+    'rapidfuzz': _rapidfuzz_backend, 'fuzzywuzzy': _fuzzywuzzy_backend, 'python': _python_backend,
+}
+
+
+def load_backend(name: str) -> Optional[Dict[str, Any]]:
+    """Реализация по имени или None, если для нее нет библиотеки."""
+    try:
+        return _FACTORIES[name]()
+    except ImportError:
+        return None
+
+
+def available() -> List[str]:
+    return [name for name in BACKEND_ORDER if load_backend(name) is not None]
+
+
+def select(name: str = AUTO) -> str:
+    """
+    Делает реализацию name текущей для процесса. auto или недоступная реализация -
+    первая доступная по BACKEND_ORDER. Возвращает имя выбранной.
+    """
+    name = (name or AUTO).strip().lower()
+    if name != AUTO and name not in _FACTORIES:
+        raise ValueError(f"Неизвестная реализация fuzz.ratio: {name} (доступны: auto, {', '.join(BACKEND_ORDER)})")
+    backend = load_backend(name) if name != AUTO else None
+    for candidate in BACKEND_ORDER:
+        if backend is not None:
+            break
+        backend = load_backend(candidate)
+    _active.clear()
+    _active.update(backend)
+    return backend['name']
+
+
+def configure(config: Any, log: Callable[[str], None] = print) -> str:
+    """Выбор реализации по [Performance] scorer (один раз на процесс, пока настройка не изменилась)."""
+    requested = config.get('Performance', 'scorer', fallback=AUTO) if config is not None else AUTO
+    requested = (requested or AUTO).strip().lower()
+    if _active.get('requested') == requested:
+        return _active['name']
+    name = select(requested)
+    _active['requested'] = requested
+    if requested not in (AUTO, name):
+        log(f"Реализация fuzz.ratio '{requested}' недоступна, используется {name}.")
+    return name
+
+
+def _backend() -> Dict[str, Any]:
+    if not _active:
+        select(AUTO)
+    return _active
+
+
+def active_name() -> str:
+    return _backend()['name']
+
+
+def ratio(s1: str, s2: str) -> int:
+    """fuzz.ratio(s1, s2) текущей реализацией."""
+    return _backend()['ratio'](s1, s2)
+
+
+def ratios(word: str, choices: Sequence[str]) -> List[int]:
+    """[fuzz.ratio(word, c) for c in choices] текущей реализацией (rapidfuzz - одним вызовом)."""
+    return _backend()['ratios'](word, choices)
+
+
+def word_pair_corpus(pairs: int, seed: int = 0) -> List[tuple]:
+    """
+    Пары слов для проверки одинаковости реализаций: случайные слова (латиница, кириллица,
+    цифры, пустые) и их опечатки - вставки, удаления, замены, - чтобы покрыть все уровни
+    схожести, включая оценки с дробной частью ровно .5.
+    """
+    rng = random.Random(seed)
+    alphabet = 'abcdeilmnorst' + 'абвгдеклмнорст' + '0123_'
+
+    def word() -> str:
+        return ''.join(rng.choice(alphabet) for _ in range(rng.choice((0, 1, 2, 3, 4, 5, 6, 8, 10, 13, 20, 40))))
+
+    def typo(text: str) -> str:
+        chars = list(text)
+        for _ in range(rng.randint(0, 4)):
+            position = rng.randint(0, len(chars))
+            action = rng.random()
+            if action < 0.4 or not chars:
+                chars.insert(position, rng.choice(alphabet))
+            elif position < len(chars):
+                if action < 0.7:
+                    del chars[position]
+                else:
+                    chars[position] = rng.choice(alphabet)
+        return ''.join(chars)
+
+    corpus = []
+    for _ in range(pairs):
+        first = word()
+        corpus.append((first, typo(first) if rng.random() < 0.7 else word()))
+    return corpus
+
+
+def conformance(corpus: List[tuple], reference: str) -> Dict[str, int]:
+    """
+    Сравнивает доступные реализации с reference на парах corpus: и по одной паре (ratio),
+    и списком (ratios - слово против всех вторых слов с тем же первым).
+    Returns: имя реализации -> число расхождений.
+    """
+    expected_backend = load_backend(reference)
+    expected = [expected_backend['ratio'](s1, s2) for s1, s2 in corpus]
+    by_word: Dict[str, List[int]] = {}
+    for position, (s1, _) in enumerate(corpus):
+        by_word.setdefault(s1, []).append(position)
+
+    mismatches = {}
+    for name in available():
+        backend = load_backend(name)
+        wrong = sum(backend['ratio'](s1, s2) != score for (s1, s2), score in zip(corpus, expected))
+        for word, positions in by_word.items():
+            scores = backend['ratios'](word, [corpus[position][1] for position in positions])
+            wrong += sum(score != expected[position] for score, position in zip(scores, positions))
+        mismatches[name] = wrong
+    return mismatches
+
+
+if __name__ == '__main__':
+    import time
+
+    names = available()
+    reference_name = 'fuzzywuzzy' if 'fuzzywuzzy' in names else 'python'
+    corpus = word_pair_corpus(60000)
+    # Опечатки в длинных словах и оценки, округляемые от .5 (суммы длин 8, 24, 40, ...)
+    corpus += [('a' * 4, 'a' * 3 + 'b'), ('abcdefghijkl', 'abcdefghijkm'), ('x' * 20, 'x' * 19 + 'y'), ('', '')]
+    result = conformance(corpus, reference_name)
+    assert all(wrong == 0 for wrong in result.values()), result
+    assert ratio('kubernetes', 'kubernets') == 95 and ratios('tomcat', ['tomcat', '', 'tomcats']) == [100, 0, 92]
+
+    vocabulary = [s2 for _, s2 in corpus[:20000]]
+    for name in names:
+        select(name)
+        started = time.perf_counter()
+        for word in ('kubernetes', 'tomcat', 'сервер'):
+            ratios(word, vocabulary)
+        print(f"  {name}: {(time.perf_counter() - started) / 3 * 1000:.1f} мс на слово против {len(vocabulary)} слов")
+    print(f"Реализации {', '.join(names)} дают одинаковые оценки на {len(corpus)} парах слов "
+          f"(эталон {reference_name}).")
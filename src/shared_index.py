@@ -0,0 +1,362 @@
+# ==================================================================================
+# МОДУЛЬ 21: ИНДЕКС ППТС В ОБЩЕЙ ПАМЯТИ
+# Индекс ППТС (comparison_engine.build_ppts_index) раскладывается в плоские массивы
+# NumPy внутри одного блока multiprocessing.shared_memory:
+#   vocab_blob / vocab_offsets       - словарь ППТС (UTF-8 подряд + смещения слов);
+#   postings / postings_offsets      - номера строк по каждому слову (CSR);
+#   row_blob / row_offsets / row_kinds - поля строк (id_ppts, name, vendor, source).
+# Процессы-исполнители подключаются к блоку по имени и ничего не копируют: строки ППТС
+# и списки строк по словам читаются из общего буфера при обращении. Один раз на процесс
+# декодируется только словарь - его целиком перебирает каждое новое слово уязвимости.
+# Представление index_from_arrays совместимо с comparison_engine: движок считает оценки
+# прямо по этим буферам.
+# Параллельное сопоставление включается настройкой [Performance] match_workers.
+# ==================================================================================
+
+import sys
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from src import scorers
+
+# Выравнивание массивов внутри блока (байты)
+ALIGNMENT = 8
+
+# Сколько порций строк ТСУ приходится на один процесс: меньшие порции ровнее делят работу
+CHUNKS_PER_WORKER = 4
+
+# Меньше строк ТСУ сопоставляются в одном процессе: запуск исполнителей обошелся бы дороже
+PARALLEL_MIN_ROWS = 200
+
+# Тип значения поля строки ППТС в row_kinds
+KIND_STR, KIND_MISSING, KIND_INT, KIND_FLOAT = 0, 1, 2, 3
+
+ARRAY_DTYPES = {
+    'vocab_blob': np.uint8, 'vocab_offsets': np.int64,
+    'postings': np.int32, 'postings_offsets': np.int64,
+    'row_blob': np.uint8, 'row_offsets': np.int64, 'row_kinds': np.uint8,
+}
+
+ROW_FIELDS = 4
+
+
+def _encode_value(value: Any) -> Tuple[int, bytes]:
+    """Поле строки ППТС -> (тип, байты). Прочие типы (даты и т.п.) сохраняются строкой."""
+    if value is None or (isinstance(value, float) and value != value):
+        return KIND_MISSING, b''
+    if isinstance(value, bool):
+        return KIND_STR, str(value).encode('utf-8')
+    if isinstance(value, int):
+        return KIND_INT, str(value).encode('utf-8')
+    if isinstance(value, float):
+        return KIND_FLOAT, repr(value).encode('utf-8')
+    return KIND_STR, str(value).encode('utf-8')
+
+
+def _decode_value(kind: int, data: bytes) -> Any:
+    if kind == KIND_MISSING:
+        return float('nan')
+    text = data.decode('utf-8')
+    if kind == KIND_INT:
+        return int(text)
+    if kind == KIND_FLOAT:
+        return float(text)
+    return text
+
+
+def _blob(chunks: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return np.frombuffer(b''.join(chunks), dtype=np.uint8), offsets
+
+
+def pack_index(ppts_index: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Раскладывает индекс ППТС в плоские массивы (см. ARRAY_DTYPES)."""
+    vocab_blob, vocab_offsets = _blob([w.encode('utf-8') for w in ppts_index['words']])
+
+    postings_offsets = np.zeros(len(ppts_index['postings']) + 1, dtype=np.int64)
+    np.cumsum([len(p) for p in ppts_index['postings']], out=postings_offsets[1:])
+    postings = np.fromiter((row_id for p in ppts_index['postings'] for row_id in p),
+                           dtype=np.int32, count=int(postings_offsets[-1]))
+
+    kinds, chunks = [], []
+    for row in ppts_index['rows']:
+        for value in row:
+            kind, data = _encode_value(value)
+            kinds.append(kind)
+            chunks.append(data)
+    row_blob, row_offsets = _blob(chunks)
+
+    return {
+        'vocab_blob': vocab_blob, 'vocab_offsets': vocab_offsets,
+        'postings': postings, 'postings_offsets': postings_offsets,
+        'row_blob': row_blob, 'row_offsets': row_offsets, 'row_kinds': np.array(kinds, dtype=np.uint8),
+    }
+
+
+def array_layout(arrays: Dict[str, np.ndarray]) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    """Размещение массивов в одном буфере: имя -> (смещение, длина), и общий размер в байтах."""
+    layout, offset = {}, 0
+    for name in ARRAY_DTYPES:
+        array = arrays[name]
+        layout[name] = (offset, len(array))
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    return layout, max(offset, 1)
+
+
+def write_arrays(buffer: Any, arrays: Dict[str, np.ndarray], layout: Dict[str, Tuple[int, int]]):
+    for name, (offset, length) in layout.items():
+        np.frombuffer(buffer, dtype=ARRAY_DTYPES[name], count=length, offset=offset)[:] = arrays[name]
+
+
+def read_arrays(buffer: Any, layout: Dict[str, Tuple[int, int]]) -> Dict[str, np.ndarray]:
+    """Массивы-представления поверх буфера (без копирования)."""
+    return {name: np.frombuffer(buffer, dtype=ARRAY_DTYPES[name], count=length, offset=offset)
+            for name, (offset, length) in layout.items()}
+
+
+class PackedRows(Sequence):
+    """
+    Строки ППТС (id_ppts, name, vendor, source), читаемые из общего буфера при обращении.
+    Прочитанная строка запоминается: совпадения с ней ссылаются на один и тот же кортеж.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, kinds: np.ndarray):
+        self._blob, self._offsets, self._kinds = blob, offsets, kinds
+        self._decoded: Dict[int, Tuple[Any, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._kinds) // ROW_FIELDS
+
+    def __getitem__(self, row_id: int) -> Tuple[Any, ...]:
+        row = self._decoded.get(row_id)
+        if row is None:
+            if not 0 <= row_id < len(self):
+                raise IndexError(row_id)
+            start = row_id * ROW_FIELDS
+            bounds = self._offsets[start:start + ROW_FIELDS + 1].tolist()
+            kinds = self._kinds[start:start + ROW_FIELDS].tolist()
+            row = tuple(_decode_value(kinds[i], self._blob[bounds[i]:bounds[i + 1]].tobytes())
+                        for i in range(ROW_FIELDS))
+            self._decoded[row_id] = row
+        return row
+
+    def tolist(self) -> List[Tuple[Any, ...]]:
+        """Все строки сразу: один проход по буферу вместо обращения к каждой строке."""
+        blob, offsets, kinds = self._blob.tobytes(), self._offsets.tolist(), self._kinds.tolist()
+        values = [_decode_value(kinds[i], blob[offsets[i]:offsets[i + 1]]) for i in range(len(kinds))]
+        return [tuple(values[i:i + ROW_FIELDS]) for i in range(0, len(values), ROW_FIELDS)]
+
+
+class PackedPostings(Sequence):
+    """Номера строк ППТС по слову словаря, читаемые из общего буфера при обращении."""
+
+    def __init__(self, postings: np.ndarray, offsets: np.ndarray):
+        self._postings, self._offsets = postings, offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, word_id: int) -> List[int]:
+        if not 0 <= word_id < len(self):
+            raise IndexError(word_id)
+        return self._postings[self._offsets[word_id]:self._offsets[word_id + 1]].tolist()
+
+
+def index_from_arrays(arrays: Dict[str, np.ndarray], min_word_length: int) -> Dict[str, Any]:
+    """Индекс ППТС в формате comparison_engine.build_ppts_index поверх плоских массивов."""
+    blob, offsets = arrays['vocab_blob'], arrays['vocab_offsets'].tolist()
+    raw_vocab = blob.tobytes()
+    words = [raw_vocab[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+    return {
+        'min_word_length': min_word_length,
+        'rows': PackedRows(arrays['row_blob'], arrays['row_offsets'], arrays['row_kinds']),
+        'words': words,
+        'word_ids': {word: word_id for word_id, word in enumerate(words)},
+        'postings': PackedPostings(arrays['postings'], arrays['postings_offsets']),
+        'word_cache': {},
+        'word_occurrences': len(arrays['postings']),
+        'stats': {'word_lookups': 0, 'word_cache_hits': 0, 'fuzz_comparisons': 0, 'naive_comparisons': 0}
+    }
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """
+    Подключается к блоку по имени. Исполнители - дочерние процессы владельца и делят с ним
+    resource_tracker, поэтому повторная регистрация блока ничего не меняет; удаляет блок владелец.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedPptsIndex:
+    """
+    Владелец блока общей памяти с индексом ППТС:
+
+        with SharedPptsIndex(ppts_index) as shared:
+            ... передать shared.handle исполнителям, там attach(handle) ...
+    """
+
+    def __init__(self, ppts_index: Dict[str, Any]):
+        arrays = pack_index(ppts_index)
+        layout, size = array_layout(arrays)
+        self.block = shared_memory.SharedMemory(create=True, size=size)
+        write_arrays(self.block.buf, arrays, layout)
+        # Исполнители считают оценки той же реализацией fuzz.ratio, что и владелец (при spawn
+        # модуль scorers в них загружается заново)
+        self.handle = {'name': self.block.name, 'layout': layout, 'min_word_length': ppts_index['min_word_length'],
+                       'scorer': scorers.active_name()}
+        self.size = size
+
+    def close(self):
+        if self.block is not None:
+            self.block.close()
+            self.block.unlink()
+            self.block = None
+
+    def __enter__(self) -> 'SharedPptsIndex':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(handle: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """Подключение исполнителя: (блок - держать открытым, пока нужен индекс; индекс для движка)."""
+    block = _attach_block(handle['name'])
+    return block, index_from_arrays(read_arrays(block.buf, handle['layout']), handle['min_word_length'])
+
+
+# --- Параллельное сопоставление ---
+
+# Состояние процесса-исполнителя: подключенный блок и индекс поверх него
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(handle: Dict[str, Any]):
+    scorers.select(handle.get('scorer', scorers.AUTO))
+    _worker_state['block'], _worker_state['index'] = attach(handle)
+
+
+def _collect_chunk(products: List[str], floor: int) -> Tuple[List[Tuple[int, list]], Dict[str, int]]:
+    """
+    Собирает "сырые" оценки для порции продуктов. Вместо кортежей строк ППТС возвращает
+    их номера - главный процесс подставляет свои строки индекса, поэтому результаты не копируют их.
+    """
+    from src import comparison_engine
+
+    ppts_index = _worker_state['index']
+    stats_before = dict(ppts_index['stats'])
+    chunk = []
+    for product in products:
+        raw = comparison_engine.collect_raw_scores(product, ppts_index, floor)
+        chunk.append([(row_id, vendor_scores, product_scores)
+                      for row_id, _, vendor_scores, product_scores in raw['rows']])
+    stats = {key: value - stats_before[key] for key, value in ppts_index['stats'].items()}
+    return chunk, stats
+
+
+class MatchPool:
+    """
+    Процессы-исполнители с подключенным индексом ППТС, которые живут между вызовами raw_scores:
+    так режим полного каталога (catalog_run) не создает процессы и общую память на каждую порцию,
+    а кэш оценок слов в исполнителях накапливается от порции к порции.
+    """
+
+    def __init__(self, ppts_index: Dict[str, Any], workers: int):
+        self.ppts_index = ppts_index
+        self.workers = workers
+        self._shared = None
+        self._pool = None
+
+    def __enter__(self) -> 'MatchPool':
+        self._shared = SharedPptsIndex(self.ppts_index).__enter__()
+        try:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self._shared.handle,))
+        except Exception:
+            self._shared.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        self._pool.shutdown()
+        self._shared.__exit__(*exc_info)
+
+    def raw_scores(
+            self, products: List[str], floor: int, progress: Callable[[int], None] = lambda i: None
+    ) -> List[Dict[str, Any]]:
+        """collect_raw_scores для каждого продукта в процессах-исполнителях (порядок сохраняется)."""
+        chunk_size = max(1, -(-len(products) // (self.workers * CHUNKS_PER_WORKER)))
+        chunks = [products[i:i + chunk_size] for i in range(0, len(products), chunk_size)]
+        rows, stats = self.ppts_index['rows'], self.ppts_index['stats']
+        results: List[Dict[str, Any]] = []
+        for chunk, chunk_stats in self._pool.map(_collect_chunk, chunks, [floor] * len(chunks)):
+            for scored_rows in chunk:
+                results.append({
+                    'floor': floor, 'min_word_length': self.ppts_index['min_word_length'],
+                    'rows': [(row_id, rows[row_id], vendor_scores, product_scores)
+                             for row_id, vendor_scores, product_scores in scored_rows]
+                })
+            for key, value in chunk_stats.items():
+                stats[key] += value
+            progress(len(results) - 1)
+        return results
+
+
+def parallel_raw_scores(
+        products: List[str], ppts_index: Dict[str, Any], floor: int, workers: int,
+        progress: Callable[[int], None] = lambda i: None
+) -> List[Dict[str, Any]]:
+    """
+    collect_raw_scores для каждого продукта в workers процессах, которые читают индекс ППТС
+    из общей памяти. Результат тот же, что при последовательном вызове; счетчики движка
+    исполнителей добавляются в ppts_index['stats'].
+    """
+    with MatchPool(ppts_index, workers) as pool:
+        return pool.raw_scores(products, floor, progress)
+
+
+def worker_count(config: Any) -> int:
+    """[Performance] match_workers: 1 - без процессов-исполнителей, 0 - по числу ядер."""
+    import os
+
+    workers = config.getint('Performance', 'match_workers', fallback=1) if config is not None else 1
+    return (os.cpu_count() or 1) if workers <= 0 else workers
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from src import comparison_engine
+
+    mock_ppts_df = pd.DataFrame({
+        'id_ppts': ['ID-001', 1002, float('nan'), 'ID-004'],
+        'name': ['Windows 11 Pro', 'Office 2021', 'Tomcat Server', 'Выпуск Astra Linux'],
+        'vendor': ['Microsoft', 'Microsoft', 'Apache', 'РусБИТех'],
+        'source': ['local', 'local', 'general', 'general'],
+    })
+    index = comparison_engine.build_ppts_index(mock_ppts_df, 3)
+    products = ['Microsoft - Windows 11', 'Apache Tomcat', 'Astra Linux', 'Microsoft Office 2021']
+    sequential = [comparison_engine.collect_raw_scores(p, index, 60) for p in products]
+
+    with SharedPptsIndex(index) as shared:
+        block, view = attach(shared.handle)
+        assert list(view['words']) == index['words']
+        assert [view['postings'][i] for i in range(len(view['postings']))] == index['postings']
+        assert [view['rows'][i][:2] for i in (0, 1, 3)] == [r[:2] for r in (index['rows'][i] for i in (0, 1, 3))]
+        assert view['rows'][2][0] != view['rows'][2][0], "NaN в id_ppts должен остаться NaN"
+        from_view = [comparison_engine.collect_raw_scores(p, view, 60) for p in products]
+        # Строки сравниваются без кортежа строки ППТС: NaN не равен сам себе после декодирования
+        assert [[(r[0], r[2], r[3]) for r in raw['rows']] for raw in from_view] == \
+            [[(r[0], r[2], r[3]) for r in raw['rows']] for raw in sequential]
+        del view
+        block.close()
+        print(f"Индекс в общей памяти: {shared.size} байт, словарь {len(index['words'])} слов.")
+
+    assert parallel_raw_scores(products, index, 60, workers=2) == sequential
+    print("Параллельный сбор оценок по общей памяти совпадает с последовательным.")
@@ -0,0 +1,158 @@
+# ==================================================================================
+# МОДУЛЬ 11: ПРОФИЛЬ ЗАПУСКА
+# Замеряет время импортов при старте (аналог "python -X importtime", но работает
+# и в собранном PyInstaller .exe) и время до готовности окна.
+# Результат выводится в лог на вкладке "Анализ".
+# ==================================================================================
+
+import builtins
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Бюджет на открытие окна: от запуска main.py до первой отрисовки
+STARTUP_BUDGET_SECONDS = 1.5
+
+# Модули, которые НЕ должны загружаться до первого запуска анализа/обновления
+HEAVY_MODULES = ['pandas', 'openpyxl', 'fuzzywuzzy', 'rapidfuzz', 'xlsxwriter']
+
+_state: Dict[str, Any] = {
+    'started': None,
+    'window_ready': None,
+    'original_import': None,
+    'records': [],
+    'stack': [],
+}
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    """Обертка над builtins.__import__: учитывает только импорты, загрузившие новые модули."""
+    original = _state['original_import']
+    if level == 0 and name in sys.modules and not fromlist:
+        return original(name, globals, locals, fromlist, level)
+
+    modules_before = len(sys.modules)
+    stack = _state['stack']
+    stack.append(0.0)  # Сюда дочерние импорты допишут свое время
+    start = time.perf_counter()
+    try:
+        return original(name, globals, locals, fromlist, level)
+    finally:
+        cumulative = time.perf_counter() - start
+        children = stack.pop()
+        if stack:
+            stack[-1] += cumulative
+        if len(sys.modules) > modules_before:
+            label = '.' * level + name
+            if fromlist and fromlist != ('*',):
+                label += f".{{{', '.join(fromlist)}}}"
+            _state['records'].append({
+                'module': label, 'depth': len(stack),
+                'self_us': int((cumulative - children) * 1_000_000), 'cumulative_us': int(cumulative * 1_000_000)
+            })
+
+
+def install():
+    """Начинает отсчет времени запуска и включает замер импортов."""
+    if _state['original_import'] is not None:
+        return
+    _state['started'] = time.perf_counter()
+    _state['original_import'] = builtins.__import__
+    builtins.__import__ = _timed_import
+
+
+def uninstall():
+    """Отключает замер импортов (после готовности окна он больше не нужен)."""
+    if _state['original_import'] is None:
+        return
+    builtins.__import__ = _state['original_import']
+    _state['original_import'] = None
+    _state['stack'].clear()
+
+
+def mark_window_ready() -> Optional[float]:
+    """Фиксирует момент готовности окна. Возвращает время запуска в секундах."""
+    if _state['started'] is None:
+        return None
+    _state['window_ready'] = time.perf_counter()
+    uninstall()
+    return _state['window_ready'] - _state['started']
+
+
+def window_ready_seconds() -> Optional[float]:
+    if _state['started'] is None or _state['window_ready'] is None:
+        return None
+    return _state['window_ready'] - _state['started']
+
+
+def format_import_profile(limit: int = 15) -> List[str]:
+    """
+    Формирует строки профиля в формате -X importtime
+    (self [us] | cumulative | imported package), самые долгие сверху.
+    """
+    records = sorted(_state['records'], key=lambda r: -r['cumulative_us'])[:limit]
+    lines = ["import time: self [us] | cumulative | imported package"]
+    for r in records:
+        lines.append(f"import time: {r['self_us']:>9} | {r['cumulative_us']:>10} | {'  ' * r['depth']}{r['module']}")
+    return lines
+
+
+def format_startup_summary() -> List[str]:
+    """Строки для лога: время до готовности окна, бюджет и профиль импортов."""
+    ready = window_ready_seconds()
+    if ready is None:
+        return []
+    loaded_heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+    lines = [f"Окно готово через {ready * 1000:.0f} мс (бюджет {STARTUP_BUDGET_SECONDS * 1000:.0f} мс)."]
+    if ready > STARTUP_BUDGET_SECONDS:
+        lines.append("ВНИМАНИЕ: время запуска превышает бюджет.")
+    if loaded_heavy:
+        lines.append(f"ВНИМАНИЕ: при запуске загружены тяжелые модули: {', '.join(loaded_heavy)}")
+    lines.extend(format_import_profile())
+    return lines
+
+
+# --- Проверка бюджета запуска (для тестирования модуля) ---
+if __name__ == '__main__':
+    import os
+    import subprocess
+
+    # Запускаем чистый интерпретатор, чтобы кэш модулей текущего процесса не искажал замер
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = (
+        "import sys, json\n"
+        "from src import startup_profile\n"
+        "startup_profile.install()\n"
+        "ready = None\n"
+        "try:\n"
+        "    from src.gui import VulnerabilityAnalyzerApp\n"
+        "    app = VulnerabilityAnalyzerApp(sys.argv[1])\n"
+        "    app.update()\n"
+        "    ready = startup_profile.mark_window_ready()\n"
+        "    app.destroy()\n"
+        "except Exception as e:\n"
+        "    print('Окно не создано (нет дисплея или customtkinter?):', e, file=sys.stderr)\n"
+        "print(json.dumps({'ready': ready, 'heavy': [m for m in startup_profile.HEAVY_MODULES if m in sys.modules]}))\n"
+    )
+
+    print("--- Тестирование модуля startup_profile ---")
+    import json
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        completed = subprocess.run(
+            [sys.executable, '-c', probe, tmp_dir], cwd=project_root, capture_output=True, text=True
+        )
+    print(completed.stderr.strip())
+    output_lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not output_lines:
+        sys.exit(f"Проба запуска завершилась с кодом {completed.returncode} без результата.")
+    result = json.loads(output_lines[-1])
+
+    assert not result['heavy'], "Тяжелые модули должны импортироваться только при первом анализе"
+    if result['ready'] is None:
+        print("\n--- Окно не создано: проверка бюджета запуска пропущена. ---")
+        sys.exit(0)
+    print(f"  -> Окно готово через {result['ready']:.3f} с, тяжелые модули при старте: {result['heavy']}")
+    assert result['ready'] < STARTUP_BUDGET_SECONDS, "Время запуска превышает бюджет"
+    print("\n--- Бюджет запуска соблюден! ---")
@@ -62,11 +62,32 @@ def _check_config_rules(
     return None
 
 
+def decide_before_matching(
+        vuln_data: Dict,
+        journal_matches: List,
+        config_rules: Dict[str, List[Dict]]
+) -> Optional[Dict[str, str]]:
+    """
+    Дешевые проверки, которые решают статус независимо от совпадений в ППТС:
+    Журнал Публикаций и безоговорочные правила конфига (priority=1).
+
+    Returns:
+        Словарь с финальным статусом и ID ППТС или None, если для решения нужно сопоставление с ППТС.
+    """
+    # 1. ПРОВЕРКА №1: Журнал Публикаций (высший приоритет)
+    if journal_matches:
+        return {'status': 'ПОВТОР', 'id_ppts': ''}
+
+    # 2. ПРОВЕРКА №2: Безоговорочные правила из конфига (priority=1)
+    return _check_config_rules(vuln_data.get('product', ''), config_rules, priority_only=True)
+
+
 def determine_status(
         vuln_data: Dict,
         journal_matches: List,
         ppts_matches: List,
-        config_rules: Dict[str, List[Dict]]
+        config_rules: Dict[str, List[Dict]],
+        learned_match: Optional[Dict] = None
 ) -> Dict[str, str]:
     """
     Определяет статус на основе всех имеющихся данных, следуя четкому приоритету.
@@ -76,23 +97,20 @@ def determine_status(
         journal_matches: Результат от journal_sync.
         ppts_matches: Результат от comparison_engine.
         config_rules: Словарь с распарсенными правилами из конфига.
+        learned_match: Решение ЖП по тому же продукту (journal_learned) - кандидат, как совпадение в ППТС.
 
     Returns:
         Словарь с финальным статусом и ID ППТС.
     """
     product_name = vuln_data.get('product', '')
 
-    # 1. ПРОВЕРКА №1: Журнал Публикаций (высший приоритет)
-    if journal_matches:
-        return {'status': 'ПОВТОР', 'id_ppts': ''}
-
-    # 2. ПРОВЕРКА №2: Безоговорочные правила из конфига (priority=1)
-    priority_match = _check_config_rules(product_name, config_rules, priority_only=True)
-    if priority_match:
-        return priority_match
+    # 1-2. ПРОВЕРКИ №1 и №2: Журнал Публикаций и безоговорочные правила (priority=1)
+    early_decision = decide_before_matching(vuln_data, journal_matches, config_rules)
+    if early_decision:
+        return early_decision
 
     # 3. ПРОВЕРКА №3: Результаты интеллектуального поиска
-    if ppts_matches:
+    if ppts_matches or learned_match:
         # Найдены потенциальные совпадения, но нет уверенности - отдаем на ручной анализ
         return {'status': '', 'id_ppts': ''}
 
@@ -169,4 +187,16 @@ if __name__ == '__main__':
     print(f"  -> Результат: {result}")
     assert result['status'] == 'НЕТ'
 
+    # Тест 6: Совпадений в ППТС нет, но продукт уже решен в ЖП -> Ручной анализ с кандидатом
+    print("\n[Тест 6]: Продукт уже решен в ЖП")
+    result = determine_status(
+        {'product': 'Google Kubernetes'},
+        journal_matches=[],
+        ppts_matches=[],
+        config_rules=mock_config_rules,
+        learned_match={'status': 'НЕТ', 'id_ppts': ID_NOT}
+    )
+    print(f"  -> Результат: {result}")
+    assert result['status'] == ''
+
     print("\n--- Все тесты пройдены успешно! ---")
\ No newline at end of file
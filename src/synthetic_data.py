@@ -0,0 +1,246 @@
+# ==================================================================================
+# МОДУЛЬ 17: ГЕНЕРАТОР СИНТЕТИЧЕСКИХ ДАННЫХ
+# Создает ТСУ, локальный/общий ППТС и Журнал Публикаций заданного размера
+# в тех же колонках, которые читает data_loader, - для замеров производительности
+# (benchmark.py) без реальных файлов аналитиков.
+# Словарь вендоров/продуктов похож на реальный: версии, редакции, разные
+# варианты записи одного и того же продукта в ТСУ и ППТС.
+# ==================================================================================
+
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+VENDOR_PRODUCTS = {
+    'Microsoft Corporation': ['Windows Server', 'Windows 10', 'Windows 11', 'Exchange Server', 'SharePoint Server',
+                              'SQL Server', 'Office', 'Edge', 'Visual Studio', '.NET Framework'],
+    'Apache Software Foundation': ['HTTP Server', 'Tomcat', 'Struts', 'Kafka', 'ActiveMQ', 'Log4j'],
+    'Google LLC': ['Chrome', 'Android'],
+    'Oracle Corporation': ['Java SE', 'MySQL', 'WebLogic Server', 'Database Server', 'VirtualBox'],
+    'Cisco Systems Inc.': ['IOS XE', 'Adaptive Security Appliance', 'Firepower Threat Defense', 'Webex Meetings'],
+    'Mozilla Foundation': ['Firefox', 'Firefox ESR', 'Thunderbird'],
+    'Adobe Inc.': ['Acrobat Reader', 'Photoshop'],
+    'IBM Corporation': ['WebSphere Application Server', 'Db2'],
+    'SAP SE': ['NetWeaver', 'HANA'],
+    'VMware Inc.': ['ESXi', 'vCenter Server', 'Workstation'],
+    'Red Hat Inc.': ['Enterprise Linux', 'OpenShift'],
+    'Canonical Ltd.': ['Ubuntu'],
+    'Fortinet Inc.': ['FortiOS', 'FortiGate'],
+    'Juniper Networks': ['Junos OS'],
+    'Palo Alto Networks': ['PAN-OS'],
+    'Atlassian': ['Confluence Server', 'Jira Server'],
+    'GitLab Inc.': ['GitLab'],
+    'Jenkins Project': ['Jenkins'],
+    'PostgreSQL Global Development Group': ['PostgreSQL'],
+    'MariaDB Foundation': ['MariaDB'],
+    'Elastic NV': ['Elasticsearch', 'Kibana'],
+    'Zabbix SIA': ['Zabbix Server'],
+    'Nginx Inc.': ['nginx'],
+    'OpenSSL Project': ['OpenSSL'],
+    'Python Software Foundation': ['Python'],
+    'Node.js Foundation': ['Node.js'],
+    'Docker Inc.': ['Docker Engine'],
+    'Kubernetes': ['Kubernetes'],
+    'WordPress': ['WordPress', 'Plugin Contact Form'],
+    'Drupal': ['Drupal Core'],
+    'Joomla': ['Joomla CMS'],
+    '1C': ['Enterprise'],
+    'Kaspersky Lab': ['Anti-Virus', 'Endpoint Security'],
+    'Positive Technologies': ['MaxPatrol'],
+    'Astra Linux': ['Special Edition'],
+    'ALT Linux': ['Workstation Linux'],
+    'Linux': ['Kernel'],
+    'Debian': ['Debian GNU/Linux'],
+    'SUSE': ['Linux Enterprise Server'],
+    'Huawei Technologies': ['EulerOS'],
+    'Hewlett Packard Enterprise': ['Integrated Lights-Out'],
+    'Dell Inc.': ['iDRAC', 'BIOS'],
+    'Siemens AG': ['SIMATIC S7'],
+    'Schneider Electric': ['EcoStruxure'],
+    'Zoom Video Communications': ['Zoom Client'],
+    'Citrix Systems': ['NetScaler ADC'],
+    'Grafana Labs': ['Grafana'],
+    'HashiCorp': ['Vault'],
+    'JetBrains': ['TeamCity', 'YouTrack'],
+    'Qualcomm': ['Snapdragon'],
+    'Intel Corporation': ['Management Engine', 'Graphics Driver'],
+    'NVIDIA Corporation': ['GPU Display Driver'],
+    'Samsung': ['Exynos'],
+}
+
+EDITIONS = ['', '', '', 'Enterprise', 'Professional', 'Standard', 'Community', 'Server', 'x64']
+
+STATUSES = [('НЕТ', 0.55), ('ДА', 0.2), ('ПОВТОР', 0.1), ('УСЛОВНО', 0.1), ('Linux', 0.05)]
+
+RESPONSIBLE = ['Иванов И.И.', 'Петров П.П.', 'Сидорова А.А.', 'Шейчук Я.И.']
+
+# Колонки, которые читает data_loader (номер колонки с нуля) и общая ширина листа
+LOCAL_PPTS_LAYOUT = ((14, 16, 19), 20)    # O, Q, T
+GENERAL_PPTS_LAYOUT = ((12, 14, 17), 18)  # M, O, R
+
+FILE_NAMES = {
+    'vulnerabilities': 'vulnerabilities.xlsx',
+    'ppts_local': 'ppts_local.xlsx',
+    'ppts_general': 'ppts_general.xlsx',
+    'journal': 'Журнал публикаций уязвимостей 01.01.2025.xlsx',
+}
+
+
+def _version(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.4:
+        return f"{rng.randint(1, 25)}.{rng.randint(0, 9)}"
+    if kind < 0.7:
+        return f"{rng.randint(1, 12)}.{rng.randint(0, 9)}.{rng.randint(0, 30)}"
+    if kind < 0.85:
+        return str(rng.choice([2012, 2016, 2019, 2022, 2024, 1809, 21, 22]))
+    return ''
+
+
+def _catalog(rng: random.Random, size: int) -> List[Tuple[str, str]]:
+    """Пары (вендор, продукт с версией/редакцией) - общий словарь для всех файлов."""
+    vendors = sorted(VENDOR_PRODUCTS)
+    catalog = []
+    for _ in range(size):
+        vendor = rng.choice(vendors)
+        name = " ".join(part for part in (rng.choice(VENDOR_PRODUCTS[vendor]), rng.choice(EDITIONS), _version(rng))
+                        if part)
+        catalog.append((vendor, name))
+    return catalog
+
+
+def _tsu_product(rng: random.Random, vendor: str, name: str) -> str:
+    """Продукт в ТСУ записывается по-разному: 'Вендор - Продукт', 'Вендор, Продукт' или 'Продукт Вендор'."""
+    style = rng.random()
+    if style < 0.6:
+        return f"{vendor} - {name}"
+    if style < 0.85:
+        return f"{vendor}, {name}"
+    return f"{name} {vendor}"
+
+
+def _cve(i: int) -> str:
+    return f"CVE-{2020 + i % 6}-{10000 + i}"
+
+
+def _cvss(rng: random.Random) -> str:
+    score = round(rng.uniform(2.0, 10.0), 1)
+    level = 'Критический' if score >= 9 else 'Высокий' if score >= 7 else 'Средний' if score >= 4 else 'Низкий'
+    return f"{score} {level}"
+
+
+def _weighted_status(rng: random.Random) -> str:
+    roll, acc = rng.random(), 0.0
+    for status, weight in STATUSES:
+        acc += weight
+        if roll < acc:
+            return status
+    return STATUSES[0][0]
+
+
+def generate_frames(
+        vulnerabilities: int, ppts: int = None, journal: int = None, seed: int = 1
+) -> Dict[str, Any]:
+    """
+    Строит DataFrame'ы в "сыром" виде листов Excel (первая строка - заголовок).
+
+    Args:
+        vulnerabilities: Количество строк ТСУ.
+        ppts: Количество строк ППТС (по умолчанию равно ТСУ); четверть - локальный ППТС.
+        journal: Количество строк ЖП (по умолчанию вдвое больше ТСУ).
+    """
+    import pandas as pd
+    from src import status_logic
+
+    rng = random.Random(seed)
+    ppts = vulnerabilities if ppts is None else ppts
+    journal = vulnerabilities * 2 if journal is None else journal
+    catalog = _catalog(rng, max(50, (ppts + vulnerabilities) // 3))
+
+    def sheet(width: int, columns: Tuple[int, ...], header: List[str], rows: List[Tuple]) -> Any:
+        data = [[''] * width for _ in range(len(rows) + 1)]
+        for col, title in zip(columns, header):
+            data[0][col] = title
+        for r, values in enumerate(rows, start=1):
+            for col, value in zip(columns, values):
+                data[r][col] = value
+        return pd.DataFrame(data)
+
+    local_count = ppts // 4
+    ppts_rows = []
+    for i in range(ppts):
+        vendor, name = rng.choice(catalog)
+        prefix = 'Л' if i < local_count else 'О'
+        ppts_rows.append((f"ППТС-{prefix}{i + 1:06d}", name, vendor))
+    (local_cols, local_width), (general_cols, general_width) = LOCAL_PPTS_LAYOUT, GENERAL_PPTS_LAYOUT
+    ppts_header = ['ID ППТС', 'Наименование', 'Производитель']
+
+    vuln_rows = []
+    for i in range(vulnerabilities):
+        vendor, name = rng.choice(catalog)
+        vuln_rows.append((i + 1, _cve(i), _cvss(rng), _tsu_product(rng, vendor, name),
+                          f"https://bdu.fstec.ru/vul/2025-{i + 1:05d}"))
+
+    # Часть CVE из ТСУ уже есть в ЖП (статус ПОВТОР при анализе), остальное - прошлые публикации
+    journal_rows = []
+    for i in range(journal):
+        source = rng.randrange(vulnerabilities * 5)
+        if source < vulnerabilities and rng.random() < 0.5:
+            cve, product = vuln_rows[source][1], vuln_rows[source][3]
+        else:
+            vendor, name = rng.choice(catalog)
+            cve, product = _cve(vulnerabilities + source), _tsu_product(rng, vendor, name)
+        status = _weighted_status(rng)
+        # Как в реальном ЖП: у ДА/ПОВТОР - ID из ППТС, у остальных - прочерк из status_logic
+        id_ppts = rng.choice(ppts_rows)[0] if status in ('ДА', 'ПОВТОР') and ppts_rows else status_logic.ID_NOT
+        journal_rows.append((journal - i, f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024",
+                             rng.choice(RESPONSIBLE), 'БДУ ФСТЭК', status, id_ppts, cve, _cvss(rng), product,
+                             f"https://nvd.nist.gov/vuln/detail/{cve}"))
+
+    return {
+        'vulnerabilities': sheet(5, (0, 1, 2, 3, 4), ['№', 'CVE', 'CVSS', 'Продукт', 'Источник'], vuln_rows),
+        'ppts_local': sheet(local_width, local_cols, ppts_header, ppts_rows[:local_count]),
+        'ppts_general': sheet(general_width, general_cols, ppts_header, ppts_rows[local_count:]),
+        'journal': sheet(10, tuple(range(10)), ['№', 'Дата обработки', 'Ответственный', 'Публикация', 'Статус',
+                                               'ID ППТС', 'CVE', 'CVSS', 'Продукт', 'Источник'], journal_rows),
+    }
+
+
+def write_dataset(folder: str, vulnerabilities: int, ppts: int = None, journal: int = None,
+                  seed: int = 1) -> Dict[str, str]:
+    """
+    Генерирует набор файлов в папку и возвращает пути в формате [Paths]
+    (output_folder - подпапка 'out').
+    """
+    import pandas as pd
+
+    os.makedirs(folder, exist_ok=True)
+    frames = generate_frames(vulnerabilities, ppts, journal, seed)
+    paths = {}
+    for key, df in frames.items():
+        path = os.path.join(folder, FILE_NAMES[key])
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            df.to_excel(writer, header=False, index=False)
+        paths[key] = path
+    paths['output_folder'] = os.path.join(folder, 'out')
+    os.makedirs(paths['output_folder'], exist_ok=True)
+    return paths
+
+
+if __name__ == '__main__':
+    import tempfile
+    from src import data_loader
+
+    print("--- Тестирование модуля synthetic_data ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_dataset(tmp, vulnerabilities=200, ppts=120, journal=300)
+        vulns_df = data_loader.load_vulnerabilities(paths['vulnerabilities'])
+        ppts_df = data_loader.load_ppts(paths['ppts_local'], paths['ppts_general'])
+        journal_df = data_loader.load_journal(paths['journal'])
+        assert len(vulns_df) == 200 and len(ppts_df) == 120 and len(journal_df) == 300
+        assert set(ppts_df['source']) == {'local', 'general'}
+        assert ppts_df['id_ppts'].str.startswith('ППТС-').all()
+        assert set(journal_df['cve']) & set(vulns_df['cve']), "часть CVE из ТСУ должна быть в ЖП"
+        print(vulns_df.head(3).to_string())
+        print(ppts_df.head(3).to_string())
+        print("Файлы читаются data_loader без ошибок.")
@@ -0,0 +1,235 @@
+# ==================================================================================
+# МОДУЛЬ 15: ПОДБОР ПОРОГОВ (SWEEP)
+# Оценивает сразу много комбинаций настроек [Settings] на размеченных данных из ЖП:
+#   - строка ЖП со статусом "ДА" и ID ППТС - продукт ДОЛЖЕН найтись в ППТС с этим ID;
+#   - строка ЖП со статусом "НЕТ" - совпадений в ППТС быть НЕ должно.
+# Дорогая часть (fuzz.ratio) считается один раз на каждое значение min_word_length
+# (collect_raw_scores), а все комбинации порогов оцениваются по этим "сырым" оценкам
+# (rank_raw_scores). Результат - таблица точности/полноты/времени по комбинациям.
+#   python main.py sweep --grid fuzz_ratio_threshold=50,60,70 --grid min_matched_words=1,2
+# ==================================================================================
+
+import csv
+import itertools
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+SETTINGS_KEYS = ['min_word_length', 'prefix_threshold_short', 'prefix_threshold_medium',
+                 'prefix_threshold_long', 'fuzz_ratio_threshold', 'min_matched_words', 'index1_results_limit']
+
+SWEEP_FILE_NAME = "threshold_sweep.csv"
+
+
+def parse_grid(specs: List[str]) -> Dict[str, List[int]]:
+    """
+    Разбирает аргументы вида 'fuzz_ratio_threshold=50,60,70' в сетку значений.
+    ValueError - неизвестная настройка или нецелое значение.
+    """
+    grid: Dict[str, List[int]] = {}
+    for spec in specs:
+        key, _, values = spec.partition('=')
+        key = key.strip()
+        if key not in SETTINGS_KEYS:
+            raise ValueError(f"Неизвестная настройка для перебора: {key}")
+        try:
+            grid[key] = [int(v) for v in values.split(',') if v.strip()]
+        except ValueError:
+            raise ValueError(f"Значения {key} должны быть целыми числами через запятую: {values}") from None
+    return grid
+
+
+def grid_from_config(config: Any) -> Dict[str, List[int]]:
+    """Сетка из секции [Sweep] (те же ключи, что в [Settings], значения через запятую)."""
+    if not config.has_section('Sweep'):
+        return {}
+    return parse_grid([f"{key}={value}" for key, value in config.items('Sweep') if key in SETTINGS_KEYS])
+
+
+def expand_grid(base_settings: Dict[str, int], grid: Dict[str, List[int]]) -> List[Dict[str, int]]:
+    """Все комбинации сетки; не перебираемые настройки берутся из base_settings."""
+    keys = list(grid.keys())
+    combinations = []
+    for values in itertools.product(*(grid[k] for k in keys)):
+        settings = dict(base_settings)
+        settings.update(zip(keys, values))
+        combinations.append(settings)
+    return combinations or [dict(base_settings)]
+
+
+def build_ground_truth(journal_df: Any) -> List[Dict[str, Any]]:
+    """
+    Размеченные строки из ЖП: 'product' и 'expected_id' (ID ППТС для "ДА", None для "НЕТ").
+    Строки с другими статусами (ПОВТОР, УСЛОВНО, Linux) не несут информации о совпадении и пропускаются.
+    """
+    labelled = []
+    if journal_df.empty:
+        return labelled
+    for record in journal_df.to_dict('records'):
+        product, status, id_ppts = record.get('product'), record.get('status'), record.get('id_ppts')
+        if not isinstance(product, str) or not isinstance(status, str):
+            continue
+        status = status.strip().upper()
+        if status == 'ДА' and isinstance(id_ppts, str) and id_ppts.strip():
+            labelled.append({'product': product, 'expected_id': id_ppts.strip()})
+        elif status == 'НЕТ':
+            labelled.append({'product': product, 'expected_id': None})
+    return labelled
+
+
+def _evaluate(labelled: List[Dict[str, Any]], matches_by_product: Dict[str, List[Dict]]) -> Dict[str, Any]:
+    """Считает TP/FP/FN/TN, точность, полноту и среднее число кандидатов на строку."""
+    tp = fp = fn = tn = top1 = candidates = 0
+    positives = 0
+    for row in labelled:
+        matches = matches_by_product[row['product']]
+        candidates += len(matches)
+        ids = [str(m['id_ppts']).strip() for m in matches]
+        if row['expected_id'] is None:
+            if matches:
+                fp += 1
+            else:
+                tn += 1
+            continue
+        positives += 1
+        if row['expected_id'] in ids:
+            tp += 1
+            top1 += ids[0] == row['expected_id']
+        else:
+            fn += 1
+            if matches:
+                fp += 1  # Предложены кандидаты, но не тот продукт
+    predicted = tp + fp
+    return {
+        'tp': tp, 'fp': fp, 'fn': fn, 'tn': tn,
+        'precision': tp / predicted if predicted else 0.0,
+        'recall': tp / positives if positives else 0.0,
+        'top1_recall': top1 / positives if positives else 0.0,
+        'avg_candidates': candidates / len(labelled) if labelled else 0.0,
+    }
+
+
+def run_sweep(
+        ppts_df: Any, journal_df: Any, base_settings: Dict[str, int], grid: Dict[str, List[int]],
+        limit: Optional[int] = None, log: Callable[[str], None] = print
+) -> List[Dict[str, Any]]:
+    """
+    Оценивает все комбинации сетки.
+
+    Returns:
+        Строки таблицы: значения настроек + метрики + 'rank_seconds' (время оценки комбинации)
+        и 'scoring_seconds' (общее время сравнения для ее min_word_length, делится между комбинациями).
+    """
+    from src import comparison_engine
+
+    labelled = build_ground_truth(journal_df)
+    if limit:
+        labelled = labelled[:limit]
+    products = sorted({row['product'] for row in labelled})
+    combinations = expand_grid(base_settings, grid)
+    log(f"Подбор порогов: {len(labelled)} размеченных строк ЖП ({len(products)} уникальных продуктов), "
+        f"{len(combinations)} комбинаций настроек.")
+
+    table = []
+    for min_word_length in sorted({c['min_word_length'] for c in combinations}):
+        group = [c for c in combinations if c['min_word_length'] == min_word_length]
+        floor = min(c['fuzz_ratio_threshold'] for c in group)
+
+        # Общая для всей группы дорогая часть: индекс ППТС и fuzz.ratio
+        started = time.perf_counter()
+        ppts_index = comparison_engine.build_ppts_index(ppts_df, min_word_length)
+        raw_by_product = {p: comparison_engine.collect_raw_scores(p, ppts_index, floor) for p in products}
+        scoring_seconds = time.perf_counter() - started
+        log(f"  min_word_length={min_word_length}: сравнение выполнено за {scoring_seconds:.2f} с, "
+            f"оценка {len(group)} комбинаций...")
+
+        for settings in group:
+            started = time.perf_counter()
+            matches_by_product = {p: comparison_engine.rank_raw_scores(raw, settings)
+                                  for p, raw in raw_by_product.items()}
+            row = dict(settings)
+            row.update(_evaluate(labelled, matches_by_product))
+            row['rank_seconds'] = time.perf_counter() - started
+            row['scoring_seconds'] = scoring_seconds
+            table.append(row)
+
+    return table
+
+
+def format_table(table: List[Dict[str, Any]], grid_keys: List[str]) -> List[str]:
+    """Текстовая таблица для лога: перебираемые настройки и метрики, лучшие по F1 сверху."""
+    def f1(r):
+        p, rc = r['precision'], r['recall']
+        return 2 * p * rc / (p + rc) if p + rc else 0.0
+
+    keys = grid_keys or ['fuzz_ratio_threshold']
+    header = " | ".join(keys + ['precision', 'recall', 'top1', 'кандидатов', 'время, мс'])
+    lines = [header, "-" * len(header)]
+    for r in sorted(table, key=lambda r: -f1(r)):
+        values = [str(r[k]) for k in keys] + [
+            f"{r['precision']:.3f}", f"{r['recall']:.3f}", f"{r['top1_recall']:.3f}",
+            f"{r['avg_candidates']:.1f}", f"{r['rank_seconds'] * 1000:.1f}"
+        ]
+        lines.append(" | ".join(values))
+    return lines
+
+
+def write_table(table: List[Dict[str, Any]], path: str):
+    """Сохраняет таблицу результатов в CSV (разделитель ';' - открывается в Excel)."""
+    if not table:
+        return
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(table[0].keys()), delimiter=';')
+        writer.writeheader()
+        writer.writerows(table)
+
+
+def sweep(
+        paths: Dict[str, str], config: Any, grid: Dict[str, List[int]],
+        limit: Optional[int] = None, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Сценарий команды 'sweep': загрузка ППТС/ЖП, оценка сетки, таблица в лог и CSV в папку отчетов.
+
+    Returns:
+        Сводка: 'ok', 'output_path', 'counts', 'timings' и 'table' (строки таблицы).
+    """
+    from src import comparison_engine, data_loader, scorers
+
+    summary: Dict[str, Any] = {'ok': False, 'output_path': None, 'counts': {}, 'timings': {}, 'table': []}
+    if not all(paths.get(key) for key in ['ppts_local', 'ppts_general', 'journal', 'output_folder']):
+        log("Ошибка: Укажите пути к ППТС, ЖП и папке отчетов.")
+        summary['error'] = 'missing_paths'
+        return summary
+
+    try:
+        grid = grid or grid_from_config(config)
+    except ValueError as e:
+        log(f"Ошибка: [Sweep] {e}")
+        summary['error'] = 'bad_grid'
+        return summary
+
+    started = time.perf_counter()
+    ppts_df = data_loader.load_ppts(paths['ppts_local'], paths['ppts_general'])
+    journal_df = data_loader.load_journal(paths['journal'])
+    summary['timings']['load'] = time.perf_counter() - started
+
+    scorers.configure(config, log)
+    stage_start = time.perf_counter()
+    table = run_sweep(ppts_df, journal_df, comparison_engine._load_settings(config), grid, limit, log)
+    summary['timings']['sweep'] = time.perf_counter() - stage_start
+    if not table or not any(r['tp'] + r['fn'] + r['tn'] + r['fp'] for r in table):
+        log("Ошибка: В ЖП нет строк со статусом ДА (с ID ППТС) или НЕТ для оценки.")
+        summary['error'] = 'no_labelled_rows'
+        return summary
+
+    for line in format_table(table, list(grid.keys())):
+        log(line)
+    output_path = os.path.join(paths['output_folder'], SWEEP_FILE_NAME)
+    write_table(table, output_path)
+    log(f"Таблица подбора порогов сохранена в {output_path}")
+
+    summary['timings']['total'] = time.perf_counter() - started
+    summary['counts'] = {'ppts': len(ppts_df), 'journal': len(journal_df), 'combinations': len(table)}
+    summary.update({'ok': True, 'output_path': output_path, 'table': table})
+    return summary
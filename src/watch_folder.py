@@ -0,0 +1,196 @@
+# ==================================================================================
+# МОДУЛЬ 13: НАБЛЮДЕНИЕ ЗА ПАПКОЙ ВХОДЯЩИХ ТСУ
+# Режим python main.py watch: следит за папкой [Watch] inbox_folder, ставит каждый
+# новый .xlsx в очередь и анализирует его с уже загруженными ППТС/ЖП (WarmReference).
+# Отчет кладется в папку отчетов под уникальным именем
+# res_tmp_report_<имя файла>_<дата_время>.xlsx. В лог пишутся задержка по каждому
+# файлу и общая пропускная способность.
+# ==================================================================================
+
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_POLL_INTERVAL_SECONDS = 5.0
+
+# Журнал уже обработанных файлов (лежит в папке отчетов), чтобы не анализировать их повторно после перезапуска
+PROCESSED_LEDGER_NAME = "watch_processed.json"
+
+
+def _is_candidate(file_name: str) -> bool:
+    """Берем только .xlsx, пропуская временные файлы Excel (~$...)."""
+    return file_name.lower().endswith('.xlsx') and not file_name.startswith('~$')
+
+
+def unique_report_path(output_folder: str, source_path: str) -> str:
+    """Уникальное имя отчета для входящего файла: res_tmp_report_<имя>_<дата_время>[_N].xlsx"""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base = os.path.join(output_folder, f"res_tmp_report_{stem}_{timestamp}")
+    candidate = f"{base}.xlsx"
+    counter = 2
+    while os.path.exists(candidate):
+        candidate = f"{base}_{counter}.xlsx"
+        counter += 1
+    return candidate
+
+
+class InboxWatcher:
+    """
+    Периодически сканирует папку входящих и отдает файлы, размер и дата изменения
+    которых не менялись между двумя проходами (т.е. копирование уже завершено).
+    """
+
+    def __init__(self, inbox_folder: str, ledger_path: str):
+        self.inbox_folder = inbox_folder
+        self.ledger_path = ledger_path
+        self._pending: Dict[str, Tuple[float, int]] = {}
+        self._processed: Dict[str, Tuple[float, int]] = self._load_ledger()
+
+    def _load_ledger(self) -> Dict[str, Tuple[float, int]]:
+        try:
+            with open(self.ledger_path, encoding='utf-8') as f:
+                return {path: tuple(stamp) for path, stamp in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def mark_processed(self, path: str, stamp: Tuple[float, int]):
+        self._processed[path] = stamp
+        with open(self.ledger_path, 'w', encoding='utf-8') as f:
+            json.dump(self._processed, f, ensure_ascii=False, indent=1)
+
+    @property
+    def has_pending(self) -> bool:
+        return bool(self._pending)
+
+    def scan(self) -> list:
+        """Возвращает список (путь, отметка) файлов, готовых к анализу."""
+        ready = []
+        try:
+            names = sorted(os.listdir(self.inbox_folder))
+        except OSError:
+            return ready
+
+        for name in names:
+            if not _is_candidate(name):
+                continue
+            path = os.path.join(self.inbox_folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamp = (stat.st_mtime, stat.st_size)
+            if self._processed.get(path) == stamp:
+                continue
+            if self._pending.get(path) == stamp:
+                del self._pending[path]
+                ready.append((path, stamp))
+            else:
+                self._pending[path] = stamp
+        return ready
+
+
+def watch(
+        config_dir: str, path_overrides: Optional[Dict[str, str]] = None,
+        inbox_folder: Optional[str] = None, poll_interval: Optional[float] = None,
+        once: bool = False, log: Callable[[str], None] = print
+) -> Dict[str, Any]:
+    """
+    Основной цикл режима наблюдения.
+
+    Args:
+        once: Обработать файлы, которые уже лежат в папке, и завершиться.
+
+    Returns:
+        Сводка: количество файлов/строк, суммарное время и пропускная способность.
+    """
+    from src import pipeline
+    from src.analysis_service import WarmReference
+
+    warm = WarmReference(config_dir, path_overrides, log)
+    warm.reload()
+    config, paths, _ = warm.snapshot()
+
+    inbox_folder = inbox_folder or config.get('Watch', 'inbox_folder', fallback='')
+    poll_interval = poll_interval or config.getfloat('Watch', 'poll_interval', fallback=DEFAULT_POLL_INTERVAL_SECONDS)
+    output_folder = paths.get('output_folder', '')
+    if not inbox_folder or not os.path.isdir(inbox_folder) or not output_folder:
+        log("Ошибка: Укажите существующую папку входящих ([Watch] inbox_folder) и папку отчетов.")
+        return {'ok': False, 'error': 'missing_paths'}
+
+    watcher = InboxWatcher(inbox_folder, os.path.join(output_folder, PROCESSED_LEDGER_NAME))
+    tasks: "queue.Queue[Tuple[str, Tuple[float, int], float]]" = queue.Queue()
+    stop = threading.Event()
+
+    def scan_loop():
+        # В режиме once делаем два прохода подряд, чтобы файлы считались "стабильными"
+        while not stop.is_set():
+            for path, stamp in watcher.scan():
+                log(f"Наблюдение: новый файл в очереди: {os.path.basename(path)}")
+                tasks.put((path, stamp, time.perf_counter()))
+            if once and not watcher.has_pending:
+                break
+            stop.wait(0.5 if once else poll_interval)
+        tasks.put(None)
+
+    log(f"Наблюдение за папкой {inbox_folder} (интервал {poll_interval:g} с)...")
+    scanner = threading.Thread(target=scan_loop, daemon=True)
+    scanner.start()
+
+    totals = {'files': 0, 'failed': 0, 'rows': 0, 'busy_seconds': 0.0}
+    started = time.perf_counter()
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            path, stamp, queued_at = task
+            if warm.has_changed():
+                log("Наблюдение: ППТС/ЖП изменились, перезагрузка...")
+                warm.reload()
+            config, reference_paths, reference = warm.snapshot()
+
+            file_paths = dict(reference_paths, vulnerabilities=path)
+            report_path = unique_report_path(output_folder, path)
+            work_started = time.perf_counter()
+            try:
+                summary = pipeline.run_analysis(
+                    paths=file_paths, config=config, log=log, reference=reference,
+                    use_service=False, output_path=report_path
+                )
+            except Exception as e:
+                log(f"Наблюдение: ошибка при анализе {os.path.basename(path)}: {e}")
+                summary = {'ok': False, 'counts': {}}
+            finished = time.perf_counter()
+
+            watcher.mark_processed(path, stamp)
+            rows = summary['counts'].get('vulnerabilities', 0)
+            totals['busy_seconds'] += finished - work_started
+            if summary['ok']:
+                totals['files'] += 1
+                totals['rows'] += rows
+            else:
+                totals['failed'] += 1
+            rate = rows / (finished - work_started) if finished > work_started else 0.0
+            log(f"Наблюдение: {os.path.basename(path)} -> {os.path.basename(report_path)}: "
+                f"{rows} строк, задержка {finished - queued_at:.2f} с (из них ожидание в очереди "
+                f"{work_started - queued_at:.2f} с), {rate:.1f} строк/с")
+    except KeyboardInterrupt:
+        log("Наблюдение остановлено.")
+    finally:
+        stop.set()
+
+    elapsed = time.perf_counter() - started
+    busy = totals['busy_seconds']
+    totals.update({
+        'ok': True, 'elapsed_seconds': elapsed,
+        'files_per_hour': totals['files'] / elapsed * 3600 if elapsed else 0.0,
+        'rows_per_second': totals['rows'] / busy if busy else 0.0,
+    })
+    log(f"Наблюдение: обработано файлов {totals['files']} (ошибок {totals['failed']}), "
+        f"строк {totals['rows']}, {totals['rows_per_second']:.1f} строк/с.")
+    return totals